@@ -0,0 +1,119 @@
+"""메모리 예산 기반 요청 승인(admission control)
+
+요청마다 디코드된 크기로 최대 메모리 사용량을 추정해 예산(max_bytes)과 동시 실행 수(max_concurrent) 안에서만
+실행한다. 자리가 없으면 제한된 대기열(max_queue)에서 도착 순서대로 기다리고, 대기열이 가득 차거나
+queue_timeout 안에 자리가 나지 않으면 AdmissionRejected(→ 429 + Retry-After)로 바로 거절한다.
+예산은 프로세스별이므로 gunicorn 워커가 여러 개면 워커 수 × 예산이 전체 한도가 된다.
+"""
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class AdmissionRejected(Exception):
+    """승인 거절 (reason: queue_full / timeout / too_large, retry_after: 권장 재시도 초)"""
+
+    def __init__(self, message, reason, retry_after=None):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """메모리 예산 + 동시 실행 수 한도 + 제한된 FIFO 대기열 (max_bytes/max_concurrent 0이면 해당 한도 없음)"""
+
+    def __init__(self, max_bytes=0, max_concurrent=0, max_queue=16, queue_timeout=30):
+        self.max_bytes = int(max_bytes)
+        self.max_concurrent = int(max_concurrent)
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._waiters = deque()
+        self.active = 0
+        self.reserved_bytes = 0
+        self.peak_reserved_bytes = 0
+        self.admitted = 0
+        self.queued_total = 0
+        self.wait_seconds = 0.0
+        self.rejected = {'queue_full': 0, 'timeout': 0, 'too_large': 0}
+        # 승인 후 실행 시간 이동 평균 (Retry-After 추정용)
+        self._hold_seconds = 1.0
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def _fits(self, nbytes):
+        if self.max_concurrent and self.active >= self.max_concurrent:
+            return False
+        # 혼자서 예산을 넘는 요청은 애초에 거절되므로, 실행 중인 요청이 없으면 항상 승인
+        return not self.max_bytes or self.active == 0 or self.reserved_bytes + nbytes <= self.max_bytes
+
+    def retry_after(self):
+        """대기열이 빠지는 데 걸릴 시간 추정 (초, 1~60)"""
+        slots = self.max_concurrent or max(1, self.active)
+        return max(1, min(60, math.ceil(self._hold_seconds * (self.queued + 1) / slots)))
+
+    def _reject(self, reason, message):
+        self.rejected[reason] += 1
+        return AdmissionRejected(message, reason, self.retry_after())
+
+    @contextmanager
+    def admit(self, nbytes):
+        """추정 메모리 nbytes만큼 예약하고 실행 (자리가 날 때까지 대기열에서 대기, 거절 시 AdmissionRejected)"""
+        nbytes = max(0, int(nbytes))
+        with self._cond:
+            if self.max_bytes and nbytes > self.max_bytes:
+                raise self._reject('too_large', f'Request needs ~{nbytes // (1024 * 1024)}MB, '
+                                                f'over the {self.max_bytes // (1024 * 1024)}MB memory budget')
+            if self._waiters or not self._fits(nbytes):
+                if len(self._waiters) >= self.max_queue:
+                    raise self._reject('queue_full', f'Server busy ({len(self._waiters)} requests queued)')
+                ticket = object()
+                self._waiters.append(ticket)
+                self.queued_total += 1
+                start = time.monotonic()
+                deadline = start + self.queue_timeout
+                try:
+                    # 도착 순서 유지: 대기열 맨 앞 요청만 승인 대상 (큰 요청이 계속 밀려나지 않도록)
+                    while self._waiters[0] is not ticket or not self._fits(nbytes):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._reject('timeout', f'Server busy (waited {self.queue_timeout}s in queue)')
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiters.remove(ticket)
+                    self.wait_seconds += time.monotonic() - start
+                    self._cond.notify_all()
+            self.active += 1
+            self.reserved_bytes += nbytes
+            self.peak_reserved_bytes = max(self.peak_reserved_bytes, self.reserved_bytes)
+            self.admitted += 1
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active -= 1
+                self.reserved_bytes -= nbytes
+                self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (time.monotonic() - start)
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'active': self.active,
+                'queued': self.queued,
+                'reserved_mb': round(self.reserved_bytes / (1024 * 1024), 1),
+                'peak_reserved_mb': round(self.peak_reserved_bytes / (1024 * 1024), 1),
+                'admitted': self.admitted,
+                'queued_total': self.queued_total,
+                'rejected': dict(self.rejected),
+                'wait_seconds': round(self.wait_seconds, 3),
+                'max_mb': self.max_bytes // (1024 * 1024),
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+            }
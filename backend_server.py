@@ -1,18 +1,74 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 import os
+import re
 import tempfile
 import subprocess
-import shutil
+import threading
 import time
+import zipfile
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
+from conversion_jobs import JobQueue, QueueFullError
+from scratch import scratch_from_env, ScratchQuotaExceeded
+from result_cache import ResultCache, make_file_cache_key
+from warmup import probe_ffmpeg
+from metrics import MetricsRegistry, instrument_app
+from memory_profile import instrument_memory
 
 app = Flask(__name__)
 CORS(app)  # CORS 허용
 
+# /metrics (Prometheus): 포맷별 FFmpeg 실행 시간, 진행 중 요청 수, 업로드/응답 바이트
+metrics = instrument_app(app, MetricsRegistry())
+ffmpeg_seconds = metrics.histogram('ffmpeg_wall_seconds', 'FFmpeg wall time per conversion', ['format', 'mode'])
+ffmpeg_failures = metrics.counter('ffmpeg_failures_total', 'Failed FFmpeg conversions', ['format', 'mode'])
+
+# 요청별 메모리 프로파일링 (MEMORY_PROFILE=on|header, 기본 off): RSS 증가량, 할당 위치, FFmpeg 자식 프로세스 최대 RSS
+# 결과는 JSON 한 줄 로그 + GET /api/debug/memory
+instrument_memory(app)
+
+# 스크래치 공간 (SCRATCH_ROOT로 tmpfs 지정 가능). 업로드 스풀 파일도 같은 루트 사용
+scratch_space = scratch_from_env()
+app.request_class = scratch_space.request_class()
+
 # FFmpeg 경로 설정 (시스템 PATH에 있으면 'ffmpeg', 아니면 절대 경로)
 FFMPEG_PATH = os.environ.get('FFMPEG_PATH', 'ffmpeg')
 
+# FFmpeg 버전/인코더는 프로세스 시작 시 1회만 확인 (gunicorn --preload면 fork 전 master에서)
+ffmpeg_info = probe_ffmpeg(FFMPEG_PATH)
+
+# FFmpeg 동시 실행 제한 및 실행당 스레드 수. 동기 변환/렌디션/스트리밍/비동기 작업이 모두 같은 슬롯을 사용하므로
+# 워커 프로세스당 총 CPU 사용량 ≈ FFMPEG_MAX_CONCURRENT × FFMPEG_THREADS_PER_JOB (gunicorn 워커 수만큼 곱해짐)
+FFMPEG_MAX_CONCURRENT = int(os.environ.get('FFMPEG_MAX_CONCURRENT', 2))
+FFMPEG_THREADS_PER_JOB = int(os.environ.get(
+    'FFMPEG_THREADS_PER_JOB', max(1, (os.cpu_count() or 1) // FFMPEG_MAX_CONCURRENT)))
+# 동기 요청이 슬롯을 기다리는 최대 시간 (넘으면 503 + Retry-After, 비동기 작업은 제한 없이 대기)
+FFMPEG_SLOT_TIMEOUT = int(os.environ.get('FFMPEG_SLOT_TIMEOUT', 60))
+ffmpeg_slots = threading.BoundedSemaphore(FFMPEG_MAX_CONCURRENT)
+JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 20))
+JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', 600))
+
+# 변환 결과 디스크 캐시 (같은 입력 + 같은 설정이면 FFmpeg 재실행 생략)
+# CONVERT_CACHE_DIR을 빈 문자열로 지정하면 비활성화
+convert_cache = ResultCache(
+    max_memory_bytes=0,
+    disk_dir=os.environ.get('CONVERT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'image-editor-convert-cache')) or None,
+    max_disk_bytes=int(os.environ.get('CONVERT_CACHE_DISK_MB', 1024)) * 1024 * 1024,
+)
+
+# 멀티 렌디션 요청당 최대 출력 수 (format:width 조합)
+MAX_RENDITIONS = int(os.environ.get('MAX_RENDITIONS', 8))
+# 출력 최대 너비 (/api/convert 계열과 렌디션 공통, 넘으면 400)
+CONVERT_MAX_WIDTH = int(os.environ.get('CONVERT_MAX_WIDTH', 1920))
+
+# 스트리밍 변환 설정
+STREAM_CHUNK_SIZE = 64 * 1024
+# moov 위치 확인을 위해 최대 이만큼만 앞부분을 읽어봄 (넘으면 스풀)
+MP4_PROBE_LIMIT = 4 * 1024 * 1024
+MP4_TOP_LEVEL_BOXES = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pdin', b'uuid'}
+
 # 위치 좌표 매핑
 POSITION_COORDS = {
     "top-left": ("10", "10"),
@@ -27,61 +83,121 @@ POSITION_COORDS = {
                   "if(gte(text_h,(h-20)), 10, (h-text_h)-10)")
 }
 
+class FFmpegBusy(Exception):
+    """FFMPEG_SLOT_TIMEOUT 안에 FFmpeg 실행 슬롯을 얻지 못함"""
+
+def acquire_ffmpeg_slot(timeout=FFMPEG_SLOT_TIMEOUT):
+    """FFmpeg 실행 슬롯 획득 (timeout None이면 무제한 대기, 시간 초과 시 FFmpegBusy). 해제는 ffmpeg_slots.release()"""
+    if not ffmpeg_slots.acquire(timeout=timeout):
+        raise FFmpegBusy(f'All {FFMPEG_MAX_CONCURRENT} FFmpeg slots busy for {timeout}s')
+
+@contextmanager
+def ffmpeg_slot(timeout=FFMPEG_SLOT_TIMEOUT):
+    """FFmpeg 실행 슬롯을 잡고 실행하는 컨텍스트"""
+    acquire_ffmpeg_slot(timeout)
+    try:
+        yield
+    finally:
+        ffmpeg_slots.release()
+
 def escape_text(text):
     """FFmpeg drawtext 필터용 텍스트 이스케이프"""
     return text.replace('\\', '\\\\').replace(':', '\\:').replace("'", "\\'")
 
+def thread_args(settings):
+    """작업별 FFmpeg 스레드 제한 옵션 (settings['threads'] 없으면 FFmpeg 기본값)"""
+    threads = settings.get('threads')
+    return ['-threads', str(threads)] if threads else []
+
+def parse_timestamp(value):
+    """'HH:MM:SS(.ms)' / 'MM:SS' / 초 단위 문자열 → 초"""
+    seconds = 0.0
+    for part in str(value).strip().split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def clip_args(settings):
+    """부분 구간 입력 옵션: -i 앞에 두어 입력 단계에서 바로 탐색 (처음부터 디코드하지 않음)"""
+    if settings.get('videoLength', 'full') != 'partial':
+        return []
+    try:
+        start = parse_timestamp(settings.get('startTime', '00:00:00'))
+        end = parse_timestamp(settings.get('endTime', '00:00:05'))
+    except ValueError:
+        raise ValueError('startTime/endTime must be HH:MM:SS, MM:SS or seconds') from None
+    if end <= start:
+        raise ValueError('endTime must be after startTime')
+    return ['-ss', f'{start:.3f}', '-t', f'{end - start:.3f}']
+
+def build_drawtext_filter(settings):
+    """워터마크 drawtext 필터 (워터마크 없으면 None)"""
+    watermark_text = settings.get('watermarkText', '')
+    if not watermark_text:
+        return None
+    watermark_color = settings.get('watermarkColor', '#FFFFFF')
+    font_size = settings.get('fontSize', 24)
+    opacity = settings.get('opacity', 0.5)
+    position = settings.get('position', 'mid-center')
+    
+    x, y = POSITION_COORDS.get(position, POSITION_COORDS['mid-center'])
+    escaped_text = escape_text(watermark_text)
+    
+    # 색상 변환 (hex to RGB)
+    color_hex = watermark_color.lstrip('#')
+    r = int(color_hex[0:2], 16)
+    g = int(color_hex[2:4], 16)
+    b = int(color_hex[4:6], 16)
+    
+    return (
+        f"drawtext=text='{escaped_text}':"
+        f"fontsize={font_size}:"
+        f"fontcolor={r:02x}{g:02x}{b:02x}@{int(opacity * 255):02x}:"
+        f"x={x}:y={y}"
+    )
+
+# GIF 팔레트 전략: (palettegen stats_mode, paletteuse 옵션)
+# global: 전체 프레임 기준 단일 팔레트, diff: 움직이는 영역 우선, per-frame: 프레임마다 새 팔레트
+PALETTE_MODES = {
+    'global': ('full', ''),
+    'diff': ('diff', ''),
+    'per-frame': ('single', '=new=1'),
+}
+
+def build_webp_command(input_spec, output_spec, settings, stream=False):
+    """WEBP 변환 FFmpeg 명령어 (stream=True면 파이프 출력용)"""
+    width = settings.get('width', 600)
+    
+    # FFmpeg 명령어 구성 (부분 구간은 입력 단계 탐색)
+    cmd = [FFMPEG_PATH, *thread_args(settings), *clip_args(settings), '-i', input_spec]
+    
+    # 워터마크 추가
+    drawtext_filter = build_drawtext_filter(settings)
+    if drawtext_filter:
+        cmd.extend(['-vf', f"scale={width}:-1,{drawtext_filter}"])
+    else:
+        cmd.extend(['-vf', f"scale={width}:-1"])
+    
+    # 파이프 출력: webp muxer는 마지막에 RIFF 크기를 seek으로 기록하므로,
+    # 완성된 파일을 한 번에 내보내는 libwebp_anim 인코더 사용
+    if stream:
+        cmd.extend(['-c:v', 'libwebp_anim', '-f', 'webp'])
+    
+    # WEBP 출력 설정
+    cmd.extend([
+        '-loop', '0',
+        '-preset', 'default',
+        '-an',  # 오디오 제거
+        '-vsync', '0',
+        *thread_args(settings),
+        output_spec,
+        '-y'  # 덮어쓰기
+    ])
+    return cmd
+
 def convert_video_to_webp(input_path, output_path, settings):
     """MP4를 WEBP로 변환"""
     try:
-        width = settings.get('width', 600)
-        watermark_text = settings.get('watermarkText', '')
-        watermark_color = settings.get('watermarkColor', '#FFFFFF')
-        font_size = settings.get('fontSize', 24)
-        opacity = settings.get('opacity', 0.5)
-        position = settings.get('position', 'mid-center')
-        video_length = settings.get('videoLength', 'full')
-        start_time = settings.get('startTime', '00:00:00')
-        end_time = settings.get('endTime', '00:00:05')
-        
-        # FFmpeg 명령어 구성
-        cmd = [FFMPEG_PATH, '-i', input_path]
-        
-        # 시간 구간 설정
-        if video_length == 'partial':
-            cmd.extend(['-ss', start_time, '-t', end_time])
-        
-        # 워터마크 추가
-        if watermark_text:
-            x, y = POSITION_COORDS.get(position, POSITION_COORDS['mid-center'])
-            escaped_text = escape_text(watermark_text)
-            
-            # 색상 변환 (hex to RGB)
-            color_hex = watermark_color.lstrip('#')
-            r = int(color_hex[0:2], 16)
-            g = int(color_hex[2:4], 16)
-            b = int(color_hex[4:6], 16)
-            
-            # drawtext 필터
-            drawtext_filter = (
-                f"drawtext=text='{escaped_text}':"
-                f"fontsize={font_size}:"
-                f"fontcolor={r:02x}{g:02x}{b:02x}@{int(opacity * 255):02x}:"
-                f"x={x}:y={y}"
-            )
-            cmd.extend(['-vf', f"scale={width}:-1,{drawtext_filter}"])
-        else:
-            cmd.extend(['-vf', f"scale={width}:-1"])
-        
-        # WEBP 출력 설정
-        cmd.extend([
-            '-loop', '0',
-            '-preset', 'default',
-            '-an',  # 오디오 제거
-            '-vsync', '0',
-            output_path,
-            '-y'  # 덮어쓰기
-        ])
+        cmd = build_webp_command(input_path, output_path, settings)
         
         # FFmpeg 실행
         result = subprocess.run(
@@ -98,96 +214,270 @@ def convert_video_to_webp(input_path, output_path, settings):
     except Exception as e:
         raise Exception(f"WEBP conversion failed: {str(e)}")
 
+def gif_filter_chain(settings):
+    """GIF 공통 필터 체인: fps → 스케일 → (워터마크). 워터마크 색도 팔레트에 반영되도록 팔레트 생성 전에 적용"""
+    width = settings.get('width', 600)
+    chain = f"fps=12,scale={width}:-1:flags=lanczos"
+    drawtext_filter = build_drawtext_filter(settings)
+    if drawtext_filter:
+        chain += f",{drawtext_filter}"
+    return chain
+
+def build_gif_command(input_spec, output_spec, settings, stream=False):
+    """단일 실행 GIF 변환 FFmpeg 명령어 (stream=True면 파이프 출력용)"""
+    stats_mode, use_options = PALETTE_MODES.get(settings.get('paletteMode', 'global'), PALETTE_MODES['global'])
+    
+    # 디코드 1회: 같은 프레임을 split해서 팔레트 생성과 적용에 동시에 사용
+    cmd = [FFMPEG_PATH, *thread_args(settings), *clip_args(settings), '-i', input_spec]
+    cmd.extend([
+        '-filter_complex',
+        f"[0:v]{gif_filter_chain(settings)},split[a][b];"
+        f"[a]palettegen=stats_mode={stats_mode}[p];"
+        f"[b][p]paletteuse{use_options}",
+        '-an',
+        *thread_args(settings)
+    ])
+    if stream:
+        cmd.extend(['-f', 'gif'])
+    cmd.extend(['-y', output_spec])
+    return cmd
+
 def convert_video_to_gif(input_path, output_path, settings):
-    """MP4를 GIF로 변환"""
+    """MP4를 GIF로 변환 (기본: split + palettegen/paletteuse 단일 실행)"""
     try:
-        width = settings.get('width', 600)
-        watermark_text = settings.get('watermarkText', '')
-        watermark_color = settings.get('watermarkColor', '#FFFFFF')
-        font_size = settings.get('fontSize', 24)
-        opacity = settings.get('opacity', 0.5)
-        position = settings.get('position', 'mid-center')
-        video_length = settings.get('videoLength', 'full')
-        start_time = settings.get('startTime', '00:00:00')
-        end_time = settings.get('endTime', '00:00:05')
+        if settings.get('gifMode', 'single') == 'two-pass':
+            return convert_video_to_gif_two_pass(input_path, output_path, settings)
         
-        # 임시 디렉토리 생성
-        temp_dir = tempfile.mkdtemp()
-        palette_path = os.path.join(temp_dir, 'palette.png')
-        temp_gif_path = os.path.join(temp_dir, 'temp.gif')
+        cmd = build_gif_command(input_path, output_path, settings)
         
-        try:
-            # 1단계: 팔레트 생성
-            palette_cmd = [FFMPEG_PATH, '-i', input_path]
-            if video_length == 'partial':
-                palette_cmd.extend(['-ss', start_time, '-t', end_time])
-            palette_cmd.extend([
-                '-vf', f"fps=12,scale={width}:-1:flags=lanczos,palettegen",
-                '-y', palette_path
-            ])
-            
-            result = subprocess.run(palette_cmd, capture_output=True, text=True, timeout=300)
-            if result.returncode != 0:
-                raise Exception(f"Palette generation failed: {result.stderr}")
-            
-            # 2단계: GIF 생성
-            gif_cmd = [FFMPEG_PATH, '-i', input_path, '-i', palette_path]
-            if video_length == 'partial':
-                gif_cmd.extend(['-ss', start_time, '-t', end_time])
-            
-            # 워터마크 추가
-            if watermark_text:
-                x, y = POSITION_COORDS.get(position, POSITION_COORDS['mid-center'])
-                escaped_text = escape_text(watermark_text)
-                
-                color_hex = watermark_color.lstrip('#')
-                r = int(color_hex[0:2], 16)
-                g = int(color_hex[2:4], 16)
-                b = int(color_hex[4:6], 16)
-                
-                drawtext_filter = (
-                    f"drawtext=text='{escaped_text}':"
-                    f"fontsize={font_size}:"
-                    f"fontcolor={r:02x}{g:02x}{b:02x}@{int(opacity * 255):02x}:"
-                    f"x={x}:y={y}"
-                )
-                gif_cmd.extend([
-                    '-filter_complex',
-                    f"[0:v]fps=12,scale={width}:-1:flags=lanczos[scaled];"
-                    f"[scaled][1:v]paletteuse[pal];"
-                    f"[pal]{drawtext_filter}",
-                    '-y', temp_gif_path
-                ])
-            else:
-                gif_cmd.extend([
-                    '-filter_complex',
-                    f"[0:v]fps=12,scale={width}:-1:flags=lanczos[scaled];"
-                    f"[scaled][1:v]paletteuse",
-                    '-y', temp_gif_path
-                ])
-            
-            result = subprocess.run(gif_cmd, capture_output=True, text=True, timeout=300)
-            if result.returncode != 0:
-                raise Exception(f"GIF conversion failed: {result.stderr}")
-            
-            # 최종 파일로 이동
-            shutil.move(temp_gif_path, output_path)
-            return True
-            
-        finally:
-            # 임시 파일 정리
-            try:
-                if os.path.exists(palette_path):
-                    os.remove(palette_path)
-                if os.path.exists(temp_gif_path):
-                    os.remove(temp_gif_path)
-                os.rmdir(temp_dir)
-            except:
-                pass
-                
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        if result.returncode != 0:
+            raise Exception(f"FFmpeg error: {result.stderr}")
+        return True
     except Exception as e:
         raise Exception(f"GIF conversion failed: {str(e)}")
 
+def convert_video_to_gif_two_pass(input_path, output_path, settings):
+    """MP4를 GIF로 변환 (팔레트 파일을 따로 만드는 2회 실행 방식)"""
+    # 팔레트 파일 하나로는 프레임별 팔레트를 전달할 수 없으므로 per-frame은 global로 처리
+    palette_mode = settings.get('paletteMode', 'global')
+    if palette_mode == 'per-frame':
+        palette_mode = 'global'
+    stats_mode, use_options = PALETTE_MODES.get(palette_mode, PALETTE_MODES['global'])
+    chain = gif_filter_chain(settings)
+    
+    # 팔레트는 출력 파일과 같은 (작업별 스크래치) 디렉토리에 생성
+    palette_path = output_path + '.palette.png'
+    
+    try:
+        # 1단계: 팔레트 생성
+        palette_cmd = [FFMPEG_PATH, *thread_args(settings), *clip_args(settings), '-i', input_path]
+        palette_cmd.extend([
+            '-vf', f"{chain},palettegen=stats_mode={stats_mode}",
+            *thread_args(settings),
+            '-y', palette_path
+        ])
+        
+        result = subprocess.run(palette_cmd, capture_output=True, text=True, timeout=300)
+        if result.returncode != 0:
+            raise Exception(f"Palette generation failed: {result.stderr}")
+        
+        # 2단계: GIF 생성 (구간 옵션은 첫 번째 입력에만 적용)
+        gif_cmd = [FFMPEG_PATH, *thread_args(settings), *clip_args(settings), '-i', input_path, '-i', palette_path]
+        gif_cmd.extend([
+            '-filter_complex',
+            f"[0:v]{chain}[scaled];"
+            f"[scaled][1:v]paletteuse{use_options}",
+            *thread_args(settings),
+            '-y', output_path
+        ])
+        
+        result = subprocess.run(gif_cmd, capture_output=True, text=True, timeout=300)
+        if result.returncode != 0:
+            raise Exception(f"GIF conversion failed: {result.stderr}")
+        return True
+        
+    finally:
+        # 팔레트 파일 정리
+        if os.path.exists(palette_path):
+            os.remove(palette_path)
+
+def number_param(form, name, default, cast=int):
+    """숫자 폼 파라미터 (변환 실패 시 파라미터 이름이 담긴 ValueError)"""
+    value = form.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a number') from None
+
+def check_width(width):
+    """출력 너비 검증 (1 ~ CONVERT_MAX_WIDTH, 아니면 ValueError → 400)"""
+    if not 0 < width <= CONVERT_MAX_WIDTH:
+        raise ValueError(f'width must be between 1 and {CONVERT_MAX_WIDTH}')
+    return width
+
+def parse_convert_settings(form):
+    """요청 폼 → 변환 설정 dict (잘못된 값이면 ValueError → 400)"""
+    settings = {
+        'watermarkText': form.get('watermarkText', ''),
+        'watermarkColor': form.get('watermarkColor', '#FFFFFF'),
+        'fontSize': number_param(form, 'fontSize', 24),
+        'opacity': number_param(form, 'opacity', 0.5, float),
+        'position': form.get('position', 'mid-center'),
+        'videoLength': form.get('videoLength', 'full'),
+        'startTime': form.get('startTime', '00:00:00'),
+        'endTime': form.get('endTime', '00:00:05'),
+        'width': check_width(number_param(form, 'width', 600)),
+        'format': form.get('format', 'webp'),
+        'gifMode': form.get('gifMode', 'single'),
+        'paletteMode': form.get('paletteMode', 'global'),
+        # 실행당 FFmpeg 스레드 예산 (모든 엔드포인트 공통, 캐시 키에서는 제외)
+        'threads': FFMPEG_THREADS_PER_JOB
+    }
+    # 구간이 잘못됐으면 FFmpeg 실행 전에 거부
+    clip_args(settings)
+    return settings
+
+CONVERTERS = {
+    'webp': convert_video_to_webp,
+    'gif': convert_video_to_gif,
+}
+
+def parse_renditions(value):
+    """'gif:320,webp:640' → 중복 없는 [(format, width)] (요청 순서 유지)"""
+    renditions = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        output_format, _, width = item.partition(':')
+        if output_format not in CONVERTERS:
+            raise ValueError(f'Unsupported format: {output_format}')
+        if not width.isdigit():
+            raise ValueError(f'Invalid width: {item}')
+        check_width(int(width))
+        if (output_format, int(width)) not in renditions:
+            renditions.append((output_format, int(width)))
+    if not renditions:
+        raise ValueError('No renditions given (e.g. renditions=gif:320,webp:640)')
+    if len(renditions) > MAX_RENDITIONS:
+        raise ValueError(f'Too many renditions (max {MAX_RENDITIONS})')
+    return renditions
+
+def build_renditions_command(input_path, outputs, settings):
+    """렌디션 여러 개를 FFmpeg 1회 실행으로: 디코드 1회 → 큰 폭부터 단계적으로 스케일 → 폭별로 포맷 분기
+    
+    outputs: [(format, width, output_path)]. 작은 폭은 바로 위 폭의 스케일 결과에서 다시 줄이므로
+    원본 해상도 스케일은 한 번뿐이다. 워터마크는 폭별로 스케일 직후(포맷 분기 전) 적용한다.
+    WebP가 없으면 fps=12를 디코드 직후에 적용해 이후 모든 스케일을 GIF 프레임 수만큼만 수행한다.
+    """
+    stats_mode, use_options = PALETTE_MODES.get(settings.get('paletteMode', 'global'), PALETTE_MODES['global'])
+    drawtext_filter = build_drawtext_filter(settings)
+    gif_only = all(output_format == 'gif' for output_format, _, _ in outputs)
+    widths = sorted({width for _, width, _ in outputs}, reverse=True)
+    
+    graph = []
+    maps = []
+    source = '[0:v]'
+    for i, width in enumerate(widths):
+        targets = [(output_format, path) for output_format, w, path in outputs if w == width]
+        filters = ['fps=12'] if gif_only and i == 0 else []
+        filters.append(f'scale={width}:-1:flags=lanczos')
+        if i + 1 < len(widths):
+            # 스케일 결과를 다음(더 작은) 폭의 입력과 이 폭의 출력으로 나눔
+            graph.append(f"{source}{','.join(filters)},split[next{i}][w{i}]")
+            source, filters = f'[w{i}]', []
+        if drawtext_filter:
+            filters.append(drawtext_filter)
+        labels = [f'w{i}o{j}' for j in range(len(targets))]
+        if len(targets) > 1:
+            filters.append(f'split={len(targets)}')
+        graph.append(f"{source}{','.join(filters or ['null'])}{''.join(f'[{label}]' for label in labels)}")
+        
+        for label, (output_format, path) in zip(labels, targets):
+            if output_format == 'gif':
+                # 디코드 1회 GIF와 같은 split + palettegen/paletteuse
+                fps = '' if gif_only else 'fps=12,'
+                graph.append(f"[{label}]{fps}split[{label}a][{label}b];"
+                             f"[{label}a]palettegen=stats_mode={stats_mode}[{label}p];"
+                             f"[{label}b][{label}p]paletteuse{use_options}[{label}gif]")
+                maps.extend(['-map', f'[{label}gif]', '-an', path])
+            else:
+                maps.extend(['-map', f'[{label}]', '-loop', '0', '-preset', 'default', '-an', '-vsync', '0', path])
+        source = f'[next{i}]'
+    
+    return [FFMPEG_PATH, '-y', *thread_args(settings), *clip_args(settings), '-i', input_path,
+            '-filter_complex', ';'.join(graph), *thread_args(settings), *maps]
+
+def run_renditions(input_path, outputs, settings, scratch_job=None, slot_timeout=FFMPEG_SLOT_TIMEOUT):
+    """렌디션 변환 1회 실행 (결과 파일은 outputs의 경로에 생성)"""
+    cmd = build_renditions_command(input_path, outputs, settings)
+    with ffmpeg_slot(slot_timeout):
+        try:
+            with ffmpeg_seconds.time(format='renditions', mode='file'):
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+                if result.returncode != 0:
+                    raise Exception(f"FFmpeg error: {result.stderr}")
+        except Exception:
+            ffmpeg_failures.inc(format='renditions', mode='file')
+            raise
+    if scratch_job is not None:
+        scratch_job.account()
+
+def run_conversion(input_path, output_path, settings, scratch_job=None, slot_timeout=FFMPEG_SLOT_TIMEOUT):
+    """설정된 포맷으로 변환 실행 (FFmpeg 슬롯을 잡고 실행, scratch_job이 있으면 결과 크기까지 용량 한도에 반영)"""
+    converter = CONVERTERS.get(settings['format'])
+    if converter is None:
+        raise ValueError(f"Unsupported format: {settings['format']}")
+    with ffmpeg_slot(slot_timeout):
+        try:
+            with ffmpeg_seconds.time(format=settings['format'], mode='file'):
+                converter(input_path, output_path, settings)
+        except Exception:
+            ffmpeg_failures.inc(format=settings['format'], mode='file')
+            raise
+    if scratch_job is not None:
+        scratch_job.account()
+    return output_path
+
+def convert_cache_key(input_path, settings):
+    """입력 파일 해시 + 정규화된 설정으로 캐시 키 생성 (스레드 수는 결과와 무관하므로 제외)"""
+    params = tuple(sorted((k, v) for k, v in settings.items() if k != 'threads'))
+    return make_file_cache_key(input_path, *params)
+
+def busy_response(e):
+    """FFmpeg 슬롯/작업 대기열이 가득 찼을 때 응답"""
+    response = jsonify({'error': 'Server busy', 'message': str(e)})
+    response.headers['Retry-After'] = '10'
+    return response, 503
+
+def scratch_error_response(e):
+    """스크래치 용량 초과 응답"""
+    response = jsonify({'error': 'Insufficient scratch space', 'message': str(e)})
+    response.headers['Retry-After'] = '30'
+    return response, 503
+
+def write_with_quota(scratch_job, stream, path, prefix=b''):
+    """스트림을 파일로 복사하면서 실제로 쓴 바이트만큼 예약 (Content-Length 없는 chunked 업로드도 한도 적용)"""
+    written = 0
+    with open(path, 'wb') as f:
+        chunk = prefix or stream.read(STREAM_CHUNK_SIZE)
+        while chunk:
+            written += len(chunk)
+            scratch_job.charge(written)
+            f.write(chunk)
+            chunk = stream.read(STREAM_CHUNK_SIZE)
+    return written
+
+def save_upload(scratch_job, file):
+    """업로드를 작업 디렉토리에 저장 (요청 크기만큼 미리 예약, 모르면 쓰면서 예약)"""
+    scratch_job.reserve(request.content_length)
+    input_path = scratch_job.file(file.filename)
+    write_with_quota(scratch_job, file.stream, input_path)
+    return input_path
+
 @app.route('/api/convert', methods=['POST'])
 def convert_video():
     """비디오 변환 API"""
@@ -200,79 +490,425 @@ def convert_video():
             return jsonify({'error': 'No file selected'}), 400
         
         # 설정 가져오기
-        settings = {
-            'watermarkText': request.form.get('watermarkText', ''),
-            'watermarkColor': request.form.get('watermarkColor', '#FFFFFF'),
-            'fontSize': int(request.form.get('fontSize', 24)),
-            'opacity': float(request.form.get('opacity', 0.5)),
-            'position': request.form.get('position', 'mid-center'),
-            'videoLength': request.form.get('videoLength', 'full'),
-            'startTime': request.form.get('startTime', '00:00:00'),
-            'endTime': request.form.get('endTime', '00:00:05'),
-            'width': int(request.form.get('width', 600)),
-            'format': request.form.get('format', 'webp')
-        }
-        
-        # 임시 파일 저장
-        temp_dir = tempfile.mkdtemp()
-        input_path = os.path.join(temp_dir, file.filename)
-        file.save(input_path)
+        try:
+            settings = parse_convert_settings(request.form)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # 출력 파일 경로
         output_format = settings['format']
-        output_filename = os.path.splitext(file.filename)[0] + f'.{output_format}'
-        output_path = os.path.join(temp_dir, output_filename)
+        if output_format not in CONVERTERS:
+            return jsonify({'error': f'Unsupported format: {output_format}'}), 400
         
+        # 작업별 스크래치 디렉토리에 입력/출력 저장
+        scratch_job = scratch_space.job('convert')
         try:
-            # 변환 실행
-            if output_format == 'webp':
-                convert_video_to_webp(input_path, output_path, settings)
-            elif output_format == 'gif':
-                convert_video_to_gif(input_path, output_path, settings)
-            else:
-                return jsonify({'error': f'Unsupported format: {output_format}'}), 400
+            input_path = save_upload(scratch_job, file)
             
-            # 변환된 파일 반환
-            return send_file(
-                output_path,
-                as_attachment=True,
-                download_name=output_filename,
-                mimetype=f'image/{output_format}'
-            )
+            # 출력 파일 경로
+            output_filename = os.path.splitext(os.path.basename(file.filename))[0] + f'.{output_format}'
+            output_path = scratch_job.file(output_filename)
+            
+            # 캐시 조회 → 없으면 변환 실행 후 캐시에 저장
+            cache_key = convert_cache_key(input_path, settings)
+            cached_file = convert_cache.open_file(cache_key)
+            if cached_file is None:
+                run_conversion(input_path, output_path, settings, scratch_job)
+                convert_cache.put_file(cache_key, output_path)
             
+            # 결과 파일을 연 뒤 작업 디렉토리 삭제 (열린 핸들로 전송, 지연 정리 스레드 불필요)
+            output_file = cached_file or open(output_path, 'rb')
         finally:
-            # 임시 파일 정리 (약간의 지연 후)
-            def cleanup():
-                time.sleep(5)  # 파일 다운로드 대기
-                try:
-                    shutil.rmtree(temp_dir, ignore_errors=True)
-                except:
-                    pass
+            scratch_job.close()
+        
+        response = send_file(
+            output_file,
+            as_attachment=True,
+            download_name=output_filename,
+            mimetype=f'image/{output_format}'
+        )
+        response.content_length = os.fstat(output_file.fileno()).st_size
+        response.headers['X-Cache'] = 'HIT' if cached_file else 'MISS'
+        return response
+            
+    except FFmpegBusy as e:
+        return busy_response(e)
+    except ScratchQuotaExceeded as e:
+        return scratch_error_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/convert/renditions', methods=['POST'])
+def convert_renditions():
+    """멀티 렌디션 변환 API: renditions=gif:320,gif:640,webp:640 → FFmpeg 1회 실행 결과를 ZIP 하나로"""
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        try:
+            renditions = parse_renditions(request.form.get('renditions'))
+            # 워터마크/구간/팔레트 설정은 모든 렌디션에 공통 (format/width/gifMode는 renditions가 대신함)
+            settings = parse_convert_settings(request.form)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        for key in ('format', 'width', 'gifMode'):
+            settings.pop(key)
+        
+        scratch_job = scratch_space.job('renditions')
+        try:
+            input_path = save_upload(scratch_job, file)
+            stem = os.path.splitext(os.path.basename(file.filename))[0]
+            archive_name = f'{stem}_renditions.zip'
+            archive_path = scratch_job.file(archive_name)
             
-            import threading
-            threading.Thread(target=cleanup, daemon=True).start()
+            cache_key = convert_cache_key(input_path, {**settings, 'renditions': tuple(renditions)})
+            cached_file = convert_cache.open_file(cache_key)
+            if cached_file is None:
+                outputs = [(output_format, width, scratch_job.file(f'{stem}_{width}.{output_format}'))
+                           for output_format, width in renditions]
+                run_renditions(input_path, outputs, settings, scratch_job)
+                # GIF/WebP는 이미 압축되어 있으므로 ZIP은 무압축 저장
+                with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_STORED) as archive:
+                    for _, _, path in outputs:
+                        archive.write(path, os.path.basename(path))
+                scratch_job.account()
+                convert_cache.put_file(cache_key, archive_path)
             
+            output_file = cached_file or open(archive_path, 'rb')
+        finally:
+            scratch_job.close()
+        
+        response = send_file(
+            output_file,
+            as_attachment=True,
+            download_name=archive_name,
+            mimetype='application/zip'
+        )
+        response.content_length = os.fstat(output_file.fileno()).st_size
+        response.headers['X-Cache'] = 'HIT' if cached_file else 'MISS'
+        return response
+    
+    except FFmpegBusy as e:
+        return busy_response(e)
+    except ScratchQuotaExceeded as e:
+        return scratch_error_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    """서버 상태 확인"""
-    # FFmpeg 확인
+def job_state_path(job_id):
+    """작업 상태 파일 경로 (작업 디렉토리 안, 잘못된 ID면 None)"""
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        return None
+    return os.path.join(scratch_space.job_path('job', job_id), 'job.json')
+
+# 비동기 변환 작업 큐 (완료 후 TTL이 지나면 임시 디렉토리 삭제)
+# 작업 상태와 결과는 공유 스크래치 루트의 작업 디렉토리에 있으므로 어느 워커로 조회해도 된다
+# 완료된 작업은 heartbeat에서 빠지므로 JOB_TTL_SECONDS는 SCRATCH_STALE_SECONDS보다 짧아야 함
+job_queue = JobQueue(
+    max_workers=FFMPEG_MAX_CONCURRENT,
+    max_pending=JOB_MAX_PENDING,
+    ttl_seconds=JOB_TTL_SECONDS,
+    on_expire=lambda job: job['scratch'].close(),
+    on_finish=lambda job: job['scratch'].finish(),
+    state_path=job_state_path,
+    local_fields=('scratch',)
+)
+# 요청이 없어도 만료된 작업 정리 (scratch janitor 주기마다)
+scratch_space.add_janitor_task(job_queue.purge_expired)
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """비동기 변환 작업 등록 → job_id 반환 (변환은 워커 풀에서 실행)"""
     try:
-        result = subprocess.run(
-            [FFMPEG_PATH, '-version'],
-            capture_output=True,
-            text=True,
-            timeout=5
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        try:
+            settings = parse_convert_settings(request.form)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        output_format = settings['format']
+        if output_format not in CONVERTERS:
+            return jsonify({'error': f'Unsupported format: {output_format}'}), 400
+        scratch_job = scratch_space.job('job')
+        try:
+            input_path = save_upload(scratch_job, file)
+        except Exception:
+            scratch_job.close()
+            raise
+        output_filename = os.path.splitext(os.path.basename(file.filename))[0] + f'.{output_format}'
+        output_path = scratch_job.file(output_filename)
+        
+        try:
+            # 작업 큐 워커는 슬롯이 날 때까지 대기 (동기 요청과 같은 슬롯 공유)
+            job_id = job_queue.submit(
+                run_conversion, input_path, output_path, settings, scratch_job, None,
+                job_id=scratch_job.id,
+                scratch=scratch_job,
+                format=output_format,
+                filename=output_filename
+            )
+        except QueueFullError as e:
+            scratch_job.close()
+            return busy_response(e)
+        
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/api/jobs/{job_id}',
+            'result_url': f'/api/jobs/{job_id}/result'
+        }), 202
+        
+    except FFmpegBusy as e:
+        return busy_response(e)
+    except ScratchQuotaExceeded as e:
+        return scratch_error_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """작업 상태 조회"""
+    job_queue.purge_expired()
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    response = {
+        'job_id': job_id,
+        'status': job['status'],
+        'format': job['format'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at']
+    }
+    if job['status'] == 'failed':
+        response['error'] = job['error']
+    if job['status'] == 'done':
+        response['result_url'] = f'/api/jobs/{job_id}/result'
+    return jsonify(response)
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """완료된 작업 결과 다운로드"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == 'failed':
+        return jsonify({'error': job['error']}), 500
+    if job['status'] != 'done':
+        return jsonify({'error': 'Job not finished', 'status': job['status']}), 409
+    
+    try:
+        result_file = open(job['result'], 'rb')
+    except FileNotFoundError:
+        # 다른 워커가 TTL 만료로 이미 정리한 경우
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return send_file(
+        result_file,
+        as_attachment=True,
+        download_name=job['filename'],
+        mimetype=f"image/{job['format']}"
+    )
+
+def probe_mp4_layout(stream):
+    """입력 앞부분을 읽어 파이프 디코드 가능 여부 판단 → (읽은 prefix, 스풀 필요 여부)
+    
+    MP4/MOV는 moov가 mdat보다 앞에 있어야(faststart) stdin으로 디코드할 수 있다.
+    MP4가 아닌 컨테이너(WebM, MKV, TS 등)는 그대로 파이프로 넘긴다.
+    """
+    prefix = b''
+    offset = 0
+    while offset < MP4_PROBE_LIMIT:
+        # 박스 헤더 (size 4바이트 + type 4바이트, largesize면 8바이트 추가)
+        while len(prefix) < offset + 16:
+            chunk = stream.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            prefix += chunk
+        if len(prefix) < offset + 8:
+            return prefix, False
+        size = int.from_bytes(prefix[offset:offset + 4], 'big')
+        box_type = prefix[offset + 4:offset + 8]
+        if box_type not in MP4_TOP_LEVEL_BOXES:
+            # 첫 박스부터 MP4가 아니면 스트리밍 가능한 컨테이너, 중간이면 알 수 없는 박스 → 안전하게 스풀
+            return prefix, offset > 0
+        if box_type == b'moov':
+            return prefix, False
+        if box_type == b'mdat':
+            return prefix, True
+        if size == 1:
+            if len(prefix) < offset + 16:
+                return prefix, True
+            size = int.from_bytes(prefix[offset + 8:offset + 16], 'big')
+        if size < 8:
+            return prefix, True
+        offset += size
+    return prefix, True
+
+def _feed_stdin(proc, prefix, stream):
+    """요청 본문을 FFmpeg stdin으로 복사 (별도 스레드)"""
+    try:
+        proc.stdin.write(prefix)
+        while True:
+            chunk = stream.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            proc.stdin.write(chunk)
+    except (BrokenPipeError, OSError):
+        pass  # FFmpeg가 먼저 종료됨 (에러는 stderr로 확인)
+    finally:
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+
+def _drain_stderr(proc, tail):
+    """stderr 파이프가 가득 차서 멈추지 않도록 계속 읽고 마지막 부분만 보관"""
+    for line in iter(proc.stderr.readline, b''):
+        tail.append(line)
+
+STREAM_COMMANDS = {
+    'webp': build_webp_command,
+    'gif': build_gif_command,
+}
+
+# 스트리밍 경로가 쓰는 인코더 (시작 시 probe_ffmpeg로 확인한 목록에 없으면 503)
+STREAM_ENCODERS = {
+    'webp': 'libwebp_anim',
+    'gif': 'gif',
+}
+
+@app.route('/api/convert/stream', methods=['POST'])
+def convert_video_stream():
+    """스트리밍 변환 API: 요청 본문(비디오 바이트) → FFmpeg stdin, FFmpeg stdout → chunked 응답
+    
+    설정은 쿼리 스트링으로 전달 (/api/convert와 같은 이름). 임시 파일은 moov가 뒤에 있는
+    MP4처럼 seek이 필요한 입력에서만 사용한다.
+    GIF는 paletteMode=per-frame(프레임별 팔레트)일 때만 프레임 단위로 바로 내보낸다. global/diff는
+    palettegen이 입력을 끝까지 읽어야 팔레트가 나오므로 첫 바이트가 변환이 끝날 무렵에 나가고,
+    WEBP(libwebp_anim)도 완성된 파일을 한 번에 내보낸다. 이 경우에도 디스크 임시 파일은 쓰지 않는다.
+    """
+    spool_job = None
+    try:
+        try:
+            settings = parse_convert_settings(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        output_format = settings['format']
+        if output_format not in STREAM_COMMANDS:
+            return jsonify({'error': f'Streaming not supported for format: {output_format}'}), 400
+        encoder = STREAM_ENCODERS[output_format]
+        if encoder not in ffmpeg_info['encoders']:
+            # 응답 헤더를 보낸 뒤 실패하지 않도록 시작 전에 거부
+            return jsonify({'error': f'FFmpeg encoder not available: {encoder}'}), 503
+        
+        stream = request.stream
+        prefix, needs_spool = probe_mp4_layout(stream)
+        if not prefix:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        if needs_spool:
+            # seek이 필요한 입력만 스크래치 파일로 스풀
+            spool_job = scratch_space.job('spool')
+            spool_job.reserve(request.content_length)
+            input_spec = spool_job.file('input.mp4')
+            write_with_quota(spool_job, stream, input_spec, prefix)
+        else:
+            input_spec = 'pipe:0'
+        
+        cmd = STREAM_COMMANDS[output_format](input_spec, 'pipe:1', settings, stream=True)
+        # 슬롯은 FFmpeg가 끝날 때(cleanup)까지 유지
+        acquire_ffmpeg_slot()
+        started_at = time.perf_counter()
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL if needs_spool else subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        except Exception:
+            ffmpeg_slots.release()
+            raise
+        stderr_tail = deque(maxlen=50)
+        threading.Thread(target=_drain_stderr, args=(proc, stderr_tail), daemon=True).start()
+        if not needs_spool:
+            threading.Thread(target=_feed_stdin, args=(proc, prefix, stream), daemon=True).start()
+        # 5분 타임아웃
+        watchdog = threading.Timer(300, proc.kill)
+        watchdog.start()
+        
+        def cleanup():
+            watchdog.cancel()
+            if proc.poll() is None:
+                proc.kill()
+            if proc.wait() != 0:
+                ffmpeg_failures.inc(format=output_format, mode='stream')
+            ffmpeg_slots.release()
+            ffmpeg_seconds.observe(time.perf_counter() - started_at, format=output_format, mode='stream')
+            if spool_job:
+                spool_job.close()
+        
+        # 첫 청크가 나올 때까지 대기 (출력 전에 실패하면 JSON 에러 반환)
+        first_chunk = proc.stdout.read1(STREAM_CHUNK_SIZE)
+        if not first_chunk:
+            proc.wait()
+            cleanup()
+            stderr = b''.join(stderr_tail).decode('utf-8', errors='replace')
+            return jsonify({'error': f'FFmpeg error: {stderr}'}), 500
+        
+        def generate():
+            try:
+                yield first_chunk
+                while True:
+                    chunk = proc.stdout.read1(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+                if proc.wait() != 0:
+                    print(f"스트리밍 변환 실패: {b''.join(stderr_tail).decode('utf-8', errors='replace')}")
+            finally:
+                cleanup()
+        
+        output_filename = f'output.{output_format}'
+        return Response(
+            stream_with_context(generate()),
+            mimetype=f'image/{output_format}',
+            headers={'Content-Disposition': f'attachment; filename={output_filename}'}
         )
-        ffmpeg_available = result.returncode == 0
-    except:
-        ffmpeg_available = False
     
+    except FFmpegBusy as e:
+        if spool_job:
+            spool_job.close()
+        return busy_response(e)
+    except ScratchQuotaExceeded as e:
+        if spool_job:
+            spool_job.close()
+        return scratch_error_response(e)
+    except Exception as e:
+        if spool_job:
+            spool_job.close()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/health', methods=['GET'])
+def health_check():
+    """서버 상태 확인 (FFmpeg는 시작 시 확인한 결과 사용, 매 호출마다 실행하지 않음)"""
     return jsonify({
-        'status': 'ok',
-        'ffmpeg_available': ffmpeg_available
+        'status': 'ok' if ffmpeg_info['available'] else 'degraded',
+        'ffmpeg_available': ffmpeg_info['available'],
+        'ffmpeg': ffmpeg_info,
+        'jobs': job_queue.stats(),
+        'scratch': scratch_space.stats(),
+        'cache': convert_cache.stats()
     })
 
 if __name__ == '__main__':
@@ -280,8 +916,10 @@ if __name__ == '__main__':
     print("백엔드 서버 시작")
     print("=" * 50)
     print(f"FFmpeg 경로: {FFMPEG_PATH}")
+    print(f"FFmpeg 버전: {ffmpeg_info['version'] or '사용 불가'}")
     print("서버 주소: http://localhost:5000")
-    print("API 엔드포인트: /api/convert")
+    print("API 엔드포인트: /api/convert, /api/convert/renditions, /api/convert/stream, /api/jobs")
+    print(f"FFmpeg 동시 실행: {FFMPEG_MAX_CONCURRENT}개 (작업당 {FFMPEG_THREADS_PER_JOB} 스레드)")
     print("=" * 50)
     app.run(host='0.0.0.0', port=5000, debug=True)
 
@@ -1,69 +1,215 @@
+import argparse
 import logging
+import os
+import time
 import numpy as np
 from PIL import Image
-from io import BytesIO
-from rembg import remove, new_session
+from rembg import new_session
 import multiprocessing
+import threading
 import cv2
+from bg_pipeline import QUALITY_MODELS, open_image, predict_mask, naive_cutout, bounding_box
+from matting import refine_matte
+from session_pool import default_intra_op_threads
+from triage import TriageStats, fast_path_mask, triage
+from warmup import ModelWarmup
 
-# 전역에서 1회만 모델 세션 로딩
-u2net_session = new_session('u2net')
+# 모델 세션은 모델별로 첫 사용 시 1회만 로딩 (import가 모델 로딩으로 막히지 않도록)
+sessions = {}
+session_lock = threading.Lock()
 
-def is_mostly_white(image, threshold=220, ratio=0.9):
-    gray = image.convert("L")
-    np_img = np.array(gray)
-    white_pixels = np.sum(np_img > threshold)
-    total_pixels = np_img.size
-    return (white_pixels / total_pixels) > ratio
+def get_session(model_name='u2net', intra_op_threads=0):
+    session = sessions.get(model_name)
+    if session is None:
+        with session_lock:
+            session = sessions.get(model_name)
+            if session is None:
+                if intra_op_threads:
+                    # 여러 프로세스가 동시에 추론할 때 코어를 나눠 쓰도록 세션당 스레드 제한
+                    import onnxruntime as ort
+                    sess_opts = ort.SessionOptions()
+                    sess_opts.intra_op_num_threads = intra_op_threads
+                    session = sessions[model_name] = new_session(model_name, sess_opts=sess_opts)
+                else:
+                    session = sessions[model_name] = new_session(model_name)
+    return session
 
-def remove_background(image, bg_size):
+# 배치 작업 전에 model_warmup.warm()을 호출하면 첫 이미지의 로딩 지연 제거
+model_warmup = ModelWarmup(get_session)
+
+# 벌크 모드 입력 디코드 최대 해상도 (휴대폰 원본은 JPEG DCT 축소로 이 크기 근처까지만 디코드)
+BULK_MAX_DIMENSION = 2000
+
+# 트리아지 경로별 적중률 (이 프로세스에서 처리한 이미지 기준)
+triage_stats = TriageStats()
+
+def remove_background(image, bg_size, quality='best'):
+    """quality: fast(u2netp) / balanced(silueta) / best(u2net + 경계 띠 closed-form 매팅)"""
+    return remove_background_with_triage(image, bg_size, quality)[0]
+
+def remove_background_with_triage(image, bg_size, quality='best', raise_errors=False):
+    """remove_background + 사용한 트리아지 경로 → (결과 이미지, 경로)
+
+    기본은 실패 시 원본을 그대로 반환하고, raise_errors=True면 예외를 그대로 올린다 (벌크 모드: 재시도 대상으로 남김).
+    """
+    path = 'model'
     try:
-        if is_mostly_white(image):
-            logging.debug("이미지가 거의 흰색으로 구성되어 있어 배경제거 생략")
-            return image.convert("RGB")
-        img = image.convert("RGB")
-        buf = BytesIO()
-        img.save(buf, format="PNG")
-        input_bytes = buf.getvalue()
-        # 전역 세션 재사용
-        result_bytes = remove(
-            input_bytes,
-            session=u2net_session,
-            alpha_matting=False
-        )
-        result = Image.open(BytesIO(result_bytes)).convert("RGBA")
-        np_img = np.array(result)
-        alpha = np_img[..., 3]
-        # Trimap 생성 및 pymatting 적용
-        from skimage.morphology import dilation, disk
-        from pymatting import estimate_alpha_cf
-        def generate_trimap(alpha, fg_thresh=240, bg_thresh=10, kernel_size=10):
-            fg = alpha > fg_thresh
-            bg = alpha < bg_thresh
-            unknown = ~(fg | bg)
-            trimap = np.full(alpha.shape, 128, dtype=np.uint8)
-            trimap[fg] = 255
-            trimap[bg] = 0
-            trimap = dilation(trimap, disk(kernel_size))
-            return trimap
-        trimap = generate_trimap(alpha)
-        alpha_matted = estimate_alpha_cf(np_img[..., :3]/255.0, trimap/255.0)
-        alpha_matted_uint8 = (alpha_matted * 255).astype(np.uint8)
+        # 썸네일 트리아지: 알파가 이미 있거나 / 단색이거나 / 배경이 균일하면 모델 없이 처리
+        path, info = triage(image)
+        triage_stats.record(path)
+        rgb = np.asarray(image.convert("RGB"))
+        if path != 'model':
+            logging.debug(f"트리아지 빠른 경로({path}): 모델 추론 생략")
+            alpha = fast_path_mask(image, rgb, path, info)
+            return compose_on_white(rgb, alpha, bounding_box(alpha), bg_size), path
+        # PNG 왕복 없이 ndarray에서 직접 추론 (전역 세션 재사용)
+        alpha = predict_mask(rgb, get_session(QUALITY_MODELS[quality]))
+        if quality != 'best':
+            # fast/balanced: pymatting 생략, 모델 마스크로 바로 crop
+            return compose_on_white(rgb, alpha, bounding_box(alpha), bg_size), path
+        # 경계 띠 타일만 closed-form 매팅 (전체 프레임 대신 unknown 띠만 풀어서 메모리 절약)
+        alpha_matted = refine_matte(rgb, alpha, 'closed_form')
         # 객체만 crop
-        mask = alpha_matted_uint8 > 0
-        if not np.any(mask):
-            # 객체가 없으면 흰색 배경만 반환
-            return Image.new("RGB", bg_size, (255,255,255))
-        ys, xs = np.where(mask)
-        ymin, ymax = ys.min(), ys.max()
-        xmin, xmax = xs.min(), xs.max()
-        cropped = result.crop((xmin, ymin, xmax+1, ymax+1))
-        # 흰색 배경 생성 및 중앙에 붙여넣기
-        background = Image.new("RGB", bg_size, (255,255,255))
-        cw, ch = cropped.size
-        bx, by = (bg_size[0] - cw)//2, (bg_size[1] - ch)//2
-        background.paste(cropped.convert("RGB"), (bx, by), mask=cropped.split()[-1])
-        return background
+        box = bounding_box(alpha_matted)
+        return compose_on_white(rgb, alpha_matted, box, bg_size), path
     except Exception as e:
+        if raise_errors:
+            raise
         logging.error(f"배경제거 실패: {e}")
-        return image.convert("RGB")
+        return image.convert("RGB"), path
+
+def compose_on_white(rgb, alpha, box, bg_size):
+    """box 영역만 컷아웃해서 흰색 배경 중앙에 합성"""
+    if box is None:
+        # 객체가 없으면 흰색 배경만 반환
+        return Image.new("RGB", bg_size, (255,255,255))
+    xmin, ymin, xmax, ymax = box
+    region = (slice(ymin, ymax+1), slice(xmin, xmax+1))
+    cropped = Image.fromarray(naive_cutout(rgb[region], alpha[region]), "RGBA")
+    # 흰색 배경 생성 및 중앙에 붙여넣기
+    background = Image.new("RGB", bg_size, (255,255,255))
+    cw, ch = cropped.size
+    bx, by = (bg_size[0] - cw)//2, (bg_size[1] - ch)//2
+    background.paste(cropped.convert("RGB"), (bx, by), mask=cropped.split()[-1])
+    return background
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff')
+
+def collect_inputs(source):
+    """디렉터리(하위 폴더 포함) 또는 매니페스트(한 줄에 경로 하나, # 주석) → [(입력 경로, 출력 상대 경로 stem)]"""
+    if os.path.isdir(source):
+        inputs = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    inputs.append((path, os.path.splitext(os.path.relpath(path, source))[0]))
+        return inputs
+    # 매니페스트의 상대 경로는 매니페스트 위치 기준, 그 밖의 경로는 파일 이름만 사용
+    base = os.path.dirname(os.path.abspath(source))
+    inputs = []
+    with open(source, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            path = os.path.normpath(os.path.join(base, line))
+            relative = os.path.relpath(path, base)
+            if relative.startswith(os.pardir):
+                relative = os.path.basename(path)
+            inputs.append((path, os.path.splitext(relative)[0]))
+    return inputs
+
+def _init_bulk_worker(quality, intra_op_threads):
+    """벌크 워커 프로세스 초기화: 세션을 프로세스당 1회만 로딩"""
+    get_session(QUALITY_MODELS[quality], intra_op_threads)
+
+def _bulk_process_one(task):
+    """이미지 1장 처리 → 결과를 임시 파일에 쓰고 이름 변경 (중단돼도 반쯤 쓴 출력이 남지 않음)"""
+    input_path, output_path, bg_size, quality, image_format = task
+    start = time.perf_counter()
+    partial = f'{output_path}.{os.getpid()}.part'
+    try:
+        # 출력 크기보다 충분히 큰 해상도로만 축소 디코드 (EXIF 방향 적용)
+        image = open_image(input_path, max(BULK_MAX_DIMENSION, *bg_size))
+        # 실패하면 원본을 출력으로 저장하지 않고 error로 보고 (다음 실행에서 다시 처리)
+        result, path = remove_background_with_triage(image, bg_size, quality, raise_errors=True)
+        output_parent = os.path.dirname(output_path)
+        if output_parent:
+            os.makedirs(output_parent, exist_ok=True)
+        result.save(partial, format=image_format)
+        os.replace(partial, output_path)
+        return {'input': input_path, 'output': output_path, 'status': 'ok', 'triage': path,
+                'seconds': round(time.perf_counter() - start, 3)}
+    except Exception as e:
+        if os.path.exists(partial):
+            os.remove(partial)
+        return {'input': input_path, 'output': output_path, 'status': 'error', 'error': str(e)}
+
+def bulk_remove_background(source, output_dir, bg_size=(1000, 1000), quality='best', workers=None,
+                           image_format='png', overwrite=False):
+    """디렉터리/매니페스트의 이미지를 프로세스 풀로 처리하고, 끝나는 순서대로 결과 dict를 yield
+
+    출력이 이미 있는 이미지는 건너뛰므로(overwrite=False) 중단된 작업은 같은 명령으로 이어서 실행된다.
+    """
+    if quality not in QUALITY_MODELS:
+        raise ValueError(f"Invalid quality: {quality} (choose from {', '.join(QUALITY_MODELS)})")
+    extension = {'png': '.png', 'jpeg': '.jpg', 'webp': '.webp'}[image_format]
+    workers = workers or os.cpu_count() or 1
+    # 빈 문자열('')이면 현재 디렉터리 (워커는 절대 경로만 받음)
+    output_dir = os.path.abspath(output_dir or '.')
+
+    tasks = []
+    for input_path, stem in collect_inputs(source):
+        output_path = os.path.join(output_dir, stem + extension)
+        if not overwrite and os.path.exists(output_path):
+            yield {'input': input_path, 'output': output_path, 'status': 'skipped'}
+            continue
+        tasks.append((input_path, output_path, tuple(bg_size), quality, image_format))
+    if not tasks:
+        return
+
+    # onnxruntime 세션은 fork 이후 안전하지 않으므로 spawn으로 워커 생성
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(min(workers, len(tasks)), initializer=_init_bulk_worker,
+                      initargs=(quality, default_intra_op_threads(workers))) as pool:
+        for result in pool.imap_unordered(_bulk_process_one, tasks):
+            yield result
+
+def parse_size(value):
+    """'1000x1000' → (1000, 1000)"""
+    width, _, height = value.lower().partition('x')
+    return int(width), int(height or width)
+
+def main():
+    parser = argparse.ArgumentParser(description='배경 제거 일괄 처리 (흰색 배경 중앙 합성)')
+    parser.add_argument('source', help='이미지 디렉터리 또는 매니페스트 파일 (한 줄에 경로 하나)')
+    parser.add_argument('output_dir')
+    parser.add_argument('--size', type=parse_size, default=(1000, 1000), help='출력 크기 WxH (기본 1000x1000)')
+    parser.add_argument('--quality', choices=list(QUALITY_MODELS), default='best')
+    parser.add_argument('--workers', type=int, default=0, help='프로세스 수 (기본: CPU 코어 수)')
+    parser.add_argument('--format', choices=['png', 'jpeg', 'webp'], default='png')
+    parser.add_argument('--overwrite', action='store_true', help='이미 있는 출력도 다시 생성')
+    args = parser.parse_args()
+
+    counts = {'ok': 0, 'skipped': 0, 'error': 0}
+    # 워커 프로세스별 집계 대신 결과에 실린 경로로 전체 적중률 계산
+    run_triage_stats = TriageStats()
+    start = time.perf_counter()
+    for result in bulk_remove_background(args.source, args.output_dir, args.size, args.quality,
+                                         args.workers or None, args.format, args.overwrite):
+        counts[result['status']] += 1
+        if result['status'] == 'error':
+            print(f"실패: {result['input']} ({result['error']})")
+        elif result['status'] == 'ok':
+            run_triage_stats.record(result['triage'])
+            print(f"완료: {result['output']} ({result['seconds']}s, {result['triage']})")
+    elapsed = time.perf_counter() - start
+    print(f"처리 {counts['ok']}, 건너뜀 {counts['skipped']}, 실패 {counts['error']} ({elapsed:.1f}s)")
+    if counts['ok']:
+        print(f"트리아지 적중률: {run_triage_stats.stats()['hit_rates']}")
+    return 1 if counts['error'] else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
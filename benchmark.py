@@ -0,0 +1,793 @@
+"""배경 제거 / 비디오 변환 벤치마크 (네트워크 없이 실행)
+
+사용 예:
+    python benchmark.py batch --images 32 --batch-sizes 1,2,4,8,16
+    python benchmark.py pipeline --size 2000
+    python benchmark.py refine --components 0,100,1000
+    python benchmark.py matting --sizes 256,512,2000
+    python benchmark.py encode --canvas-sizes 600,1200
+    python benchmark.py decode --megapixels 12,24,50
+    python benchmark.py renditions --renditions gif:320,gif:640,webp:320,webp:640
+    python benchmark.py suite --sizes 500,1000,2000 --output before.json
+    python benchmark.py pool --pool-sizes 1,2,4 --concurrency 1,4,8
+
+suite는 네트워크 없이 실행된다 (u2net 모델 파일은 ~/.u2net에 미리 있어야 함, 비디오 변환은 FFmpeg 필요).
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import cv2
+import numpy as np
+from PIL import ExifTags, Image, ImageChops, ImageDraw, ImageOps
+
+
+def make_synthetic_image(size, seed=0):
+    """그라데이션 배경 + 타원 피사체로 구성된 합성 제품 이미지"""
+    w, h = size
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(200, 255, w, dtype=np.float32)[None, :, None]
+    background = np.broadcast_to(gradient, (h, w, 3)) + rng.normal(0, 3, (h, w, 3))
+    image = Image.fromarray(background.clip(0, 255).astype(np.uint8), 'RGB')
+    draw = ImageDraw.Draw(image)
+    color = tuple(int(c) for c in rng.integers(0, 160, 3))
+    draw.ellipse((w * 0.25, h * 0.2, w * 0.75, h * 0.85), fill=color)
+    return image
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def parse_str_list(value):
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
+def peak_rss_mb():
+    """프로세스 최대 RSS (MB). resource 모듈이 없는 플랫폼(Windows)은 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 바이트 단위
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def summarize(timings):
+    """지연 시간 목록 → p50/p95/평균/처리량"""
+    values = np.asarray(timings)
+    return {
+        'runs': len(timings),
+        'p50': round(float(np.percentile(values, 50)), 4),
+        'p95': round(float(np.percentile(values, 95)), 4),
+        'mean': round(float(values.mean()), 4),
+        'throughput_per_sec': round(len(timings) / float(values.sum()), 3),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def measure(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def make_test_clip(ffmpeg_path, path, duration, size, rate):
+    """FFmpeg testsrc로 합성 클립 생성 (네트워크/샘플 파일 불필요)"""
+    cmd = [
+        ffmpeg_path, '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc=duration={duration}:size={size}:rate={rate}',
+        '-pix_fmt', 'yuv420p', '-movflags', '+faststart', '-y', path
+    ]
+    subprocess.run(cmd, check=True, capture_output=True, timeout=120)
+    return path
+
+
+def bench_batch(args):
+    """배치 크기별 u2net 처리량 (images/sec) 측정"""
+    from image_bg_backend import get_session
+    from bg_pipeline import predict_masks
+
+    session = get_session()
+    images = [np.asarray(make_synthetic_image((args.size, args.size), seed=i)) for i in range(args.images)]
+
+    # 워밍업 (세션 초기화/메모리 할당 비용 제외)
+    predict_masks(images[:1], session, batch_size=1)
+
+    results = []
+    for batch_size in args.batch_sizes:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            predict_masks(images, session, batch_size=batch_size)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results.append({
+            'benchmark': 'batch',
+            'batch_size': batch_size,
+            'images': len(images),
+            'image_size': args.size,
+            'seconds': round(best, 4),
+            'images_per_sec': round(len(images) / best, 2),
+        })
+    return results
+
+
+def legacy_refine_alpha_mask(alpha):
+    """기존 refine_alpha_mask (라벨별 파이썬 루프 + 전체 프레임 스캔) - 비교 기준용"""
+    try:
+        alpha_uint8 = (alpha * 255).astype(np.uint8)
+        h, w = alpha_uint8.shape
+
+        # 1. Morphology로 노이즈 제거
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        alpha_cleaned = cv2.morphologyEx(alpha_uint8, cv2.MORPH_OPEN, kernel, iterations=1)
+        alpha_cleaned = cv2.morphologyEx(alpha_cleaned, cv2.MORPH_CLOSE, kernel, iterations=1)
+
+        # 2. Connected components로 상단 텍스트 제거 (메모리 효율적으로)
+        # 상단 22% 영역에서만 작은 컴포넌트 제거
+        top_region_height = int(h * 0.22)
+        if top_region_height > 0:
+            try:
+                # 이진 마스크 생성 (알파 > 128인 영역)
+                binary = (alpha_cleaned > 128).astype(np.uint8) * 255
+
+                # Connected components 분석 (최소 면적만 계산)
+                num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(binary, connectivity=8)
+
+                if num_labels > 1:  # 배경(0) 외에 컴포넌트가 있으면
+                    # 전체 이미지에서 가장 큰 컴포넌트 찾기
+                    # stats 구조: [left, top, width, height, area]
+                    CC_STAT_AREA = 4
+                    largest_area = 0
+                    largest_label = 1
+                    for label in range(1, num_labels):
+                        area = stats[label, CC_STAT_AREA]
+                        if area > largest_area:
+                            largest_area = area
+                            largest_label = label
+
+                    # 상단 영역의 작은 컴포넌트 제거
+                    mask = np.zeros_like(alpha_cleaned, dtype=np.uint8)
+                    for label in range(1, num_labels):
+                        if label == largest_label:
+                            # 가장 큰 컴포넌트는 항상 유지
+                            mask[labels == label] = 255
+                        else:
+                            # 상단 영역에 있는 작은 컴포넌트만 제거
+                            y_center = int(centroids[label, 1])
+                            area = stats[label, CC_STAT_AREA]
+                            if y_center < top_region_height and area < (w * h * 0.05):  # 상단 + 작은 면적
+                                continue  # 제거
+                            else:
+                                mask[labels == label] = 255
+
+                    # 마스크 적용
+                    alpha_cleaned = np.where(mask > 0, alpha_cleaned, 0)
+            except Exception as e:
+                print(f"Connected components 실패, morphology만 사용: {str(e)}")
+
+        # 3. Gaussian blur (가볍게)
+        alpha_cleaned = cv2.GaussianBlur(alpha_cleaned, (3, 3), 0.5)
+
+        return alpha_cleaned.astype(np.float32) / 255.0
+    except Exception as e:
+        print(f"refine_alpha_mask 실패, 원본 사용: {str(e)}")
+        return alpha
+
+
+def make_synthetic_mask(size, components, seed=0):
+    """큰 피사체 + 지정 개수의 작은 노이즈 컴포넌트로 구성된 합성 알파 마스크"""
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((size, size), dtype=np.uint8)
+    cv2.ellipse(mask, (size // 2, int(size * 0.6)), (size // 3, size // 3), 0, 0, 360, 255, -1)
+    for _ in range(components):
+        x, y = (int(v) for v in rng.integers(0, size, 2))
+        cv2.circle(mask, (x, y), int(rng.integers(2, 8)), 255, -1)
+    return cv2.GaussianBlur(mask, (5, 5), 1)
+
+
+def bench_refine(args):
+    """노이즈 컴포넌트 수별 알파 정제 시간: 기존 루프 vs 벡터화 + 바운딩 박스"""
+    from bg_pipeline import bounding_box
+    from image_bg_backend import refine_alpha_mask
+
+    def legacy(mask):
+        alpha = (legacy_refine_alpha_mask(mask.astype(np.float32) / 255.0) * 255).astype(np.uint8)
+        ys, xs = np.where(alpha > 0)
+        return alpha, (xs.min(), ys.min(), xs.max(), ys.max()) if ys.size else None
+
+    results = []
+    for size in args.sizes:
+        for components in args.components:
+            mask = make_synthetic_mask(size, components)
+            expected = legacy(mask)[0]
+            for name, fn in (('legacy', legacy), ('vectorized', refine_alpha_mask)):
+                # 결과는 기존 필터와 같아야 함 (max_abs_diff 0)
+                max_abs_diff = int(np.abs(fn(mask)[0].astype(np.int16) - expected).max())
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    fn(mask)
+                    timings.append(time.perf_counter() - start)
+                results.append({
+                    'benchmark': 'refine',
+                    'impl': name,
+                    'mask_size': size,
+                    'components': components,
+                    'seconds': round(min(timings), 5),
+                    'max_abs_diff': max_abs_diff,
+                })
+    return results
+
+
+def make_matting_case(size):
+    """합성 제품 이미지 + 피사체 타원을 흐린 부드러운 경계 알파"""
+    image = make_synthetic_image((size, size))
+    alpha = Image.new('L', (size, size), 0)
+    ImageDraw.Draw(alpha).ellipse((size * 0.25, size * 0.2, size * 0.75, size * 0.85), fill=255)
+    alpha = cv2.GaussianBlur(np.asarray(alpha), (0, 0), max(1.0, size / 200))
+    return np.asarray(image), alpha
+
+
+def _matting_full_frame(rgb, alpha):
+    from matting import estimate_alpha_cf, generate_trimap
+
+    trimap = generate_trimap(alpha)
+    matted = estimate_alpha_cf(rgb / 255.0, trimap / 255.0)
+    return (np.clip(matted, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+def _run_matting_case(impl, size, tile_size, repeat):
+    """별도 프로세스에서 매팅 1종 실행 → (출력 알파, 최소 시간, 실행 중 RSS 증가분 MB)"""
+    from inference_workers import current_rss_bytes
+    from matting import refine_matte
+
+    rgb, alpha = make_matting_case(size)
+    if impl == 'full_closed_form':
+        fn = lambda: _matting_full_frame(rgb, alpha)
+    else:
+        fn = lambda: refine_matte(rgb, alpha, impl.replace('tiled_', ''), tile_size=tile_size)
+    baseline = current_rss_bytes() / (1024 * 1024)
+    output = fn()
+    timings = measure(fn, repeat, warmup=0)
+    return output, min(timings), round(peak_rss_mb() - baseline, 1)
+
+
+def bench_matting(args):
+    """전체 프레임 closed-form vs 경계 띠 타일 closed-form vs guided filter: 시간/RSS 증가분/전체 대비 오차
+
+    RSS는 구현마다 새 프로세스에서 측정한다 (최대 RSS는 프로세스 안에서 줄어들지 않으므로).
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from matting import generate_trimap, unknown_tiles
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for size in args.sizes:
+        _, alpha = make_matting_case(size)
+        trimap = generate_trimap(alpha)
+        impls = ['guided', 'tiled_closed_form']
+        if size <= args.full_max_size:
+            impls.append('full_closed_form')
+
+        outputs = {}
+        for impl in impls:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                output, seconds, rss_delta = executor.submit(
+                    _run_matting_case, impl, size, args.tile_size, args.repeat).result()
+            outputs[impl] = output
+            results.append({
+                'benchmark': 'matting',
+                'impl': impl,
+                'image_size': size,
+                'tiles': len(unknown_tiles(trimap, args.tile_size)),
+                'unknown_ratio': round(float((trimap == 128).mean()), 4),
+                'seconds': round(seconds, 4),
+                'rss_delta_mb': rss_delta,
+            })
+        # 전체 프레임 결과가 있으면 평균 절대 오차(0~255) 기록
+        reference = outputs.get('full_closed_form')
+        if reference is not None:
+            for row in results[-len(impls):]:
+                diff = np.abs(outputs[row['impl']].astype(np.int16) - reference)
+                row['mae_vs_full'] = round(float(diff.mean()), 3)
+    return results
+
+
+def bench_encode(args):
+    """출력 형식/압축 수준별 인코딩 시간과 바이트 크기 (전체 캔버스 vs crop)"""
+    from image_bg_backend import render_cutout
+
+    variants = []
+    for variant in args.variants:
+        image_format, _, level = variant.partition(':')
+        output = {'format': image_format, 'compression': 6, 'webp_quality': 80, 'crop': False}
+        if level:
+            output['compression' if image_format == 'png' else 'webp_quality'] = int(level)
+        variants.append((variant, output))
+
+    rgb, alpha = make_matting_case(args.size)
+    results = []
+    for canvas in args.canvas_sizes:
+        for crop in (False, True):
+            for name, output in variants:
+                output = dict(output, crop=crop)
+                timings = measure(lambda: render_cutout(rgb, alpha, alpha, canvas, canvas, output=output), args.repeat)
+                encoded, _ = render_cutout(rgb, alpha, alpha, canvas, canvas, output=output)
+                results.append({
+                    'benchmark': 'encode',
+                    'variant': name,
+                    'crop': crop,
+                    'canvas': canvas,
+                    'bytes': len(encoded.getvalue()),
+                    'seconds': round(min(timings), 4),
+                })
+    return results
+
+
+def make_photo_jpeg(megapixels, path, orientation=1, seed=0):
+    """휴대폰 사진을 흉내 낸 4:3 합성 JPEG (작게 만든 제품 이미지를 확대 + 센서 노이즈, quality 90)"""
+    width = int(round((megapixels * 1e6 * 4 / 3) ** 0.5))
+    height = width * 3 // 4
+    image = make_synthetic_image((1000, 750), seed).resize((width, height), Image.Resampling.BICUBIC)
+    noise = Image.effect_noise((width, height), 12)
+    image = ImageChops.add(image, Image.merge('RGB', [noise] * 3), 1.0, -128)
+    exif = Image.Exif()
+    exif[ExifTags.Base.Orientation] = orientation
+    image.save(path, 'JPEG', quality=90, exif=exif.tobytes())
+    return image.size
+
+
+def _decode_full(data, max_dimension):
+    """축소 디코드 이전 경로: 전체 해상도 디코드 → LANCZOS 리사이즈 (+ 비교를 위해 EXIF 방향 적용)"""
+    from bg_pipeline import target_size
+
+    image = Image.open(BytesIO(data))
+    image.load()
+    image = image.resize(target_size(image.size, max_dimension), Image.Resampling.LANCZOS)
+    return ImageOps.exif_transpose(image)
+
+
+def _run_decode_case(impl, path, max_dimension, repeat):
+    """별도 프로세스에서 디코드 1종 실행 → (RGB 출력, 최소 시간, 실행 중 RSS 증가분 MB)"""
+    from bg_pipeline import open_image
+    from inference_workers import current_rss_bytes
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    if impl == 'full':
+        fn = lambda: _decode_full(data, max_dimension)
+    else:
+        fn = lambda: open_image(data, max_dimension)
+    baseline = current_rss_bytes() / (1024 * 1024)
+    output = np.asarray(fn().convert('RGB'))
+    timings = measure(fn, repeat, warmup=0)
+    return output, min(timings), round(peak_rss_mb() - baseline, 1)
+
+
+def bench_decode(args):
+    """업로드 크기(MP)별 전체 디코드 + 리사이즈 vs 축소 디코드: 시간/RSS 증가분/전체 경로 대비 PSNR
+
+    RSS는 경로마다 새 프로세스에서 측정한다. 입력은 EXIF 방향 태그가 있는 합성 JPEG이며, 생성도 별도 프로세스에서
+    한다 (Linux는 최대 RSS가 fork/exec 후에도 이어지므로 부모가 큰 이미지를 들고 있으면 측정이 오염됨).
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from bg_pipeline import decoded_size
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for megapixels in args.megapixels:
+            path = os.path.join(tmp, f'photo_{megapixels}mp.jpg')
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                size = executor.submit(make_photo_jpeg, megapixels, path, args.orientation).result()
+            outputs = {}
+            for impl in ('full', 'reduced'):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    output, seconds, rss_delta = executor.submit(
+                        _run_decode_case, impl, path, args.max_dimension, args.repeat).result()
+                outputs[impl] = output
+                results.append({
+                    'benchmark': 'decode',
+                    'impl': impl,
+                    'megapixels': megapixels,
+                    'source_size': size,
+                    'decoded_size': decoded_size(size, 'JPEG', args.max_dimension) if impl == 'reduced' else size,
+                    'output_size': output.shape[1::-1],
+                    'file_mb': round(os.path.getsize(path) / (1024 * 1024), 1),
+                    'seconds': round(seconds, 4),
+                    'rss_delta_mb': rss_delta,
+                })
+            # 같은 크기/방향이어야 비교 가능 (다르면 EXIF 처리가 어긋난 것)
+            full, reduced = outputs['full'], outputs['reduced']
+            if full.shape == reduced.shape:
+                mse = float(np.mean((full.astype(np.float32) - reduced) ** 2))
+                results[-1]['psnr_vs_full'] = round(10 * np.log10(255 ** 2 / mse), 2) if mse else None
+            else:
+                results[-1]['psnr_vs_full'] = f'shape mismatch {full.shape} vs {reduced.shape}'
+    return results
+
+
+def bench_pool(args):
+    """세션 풀 크기 × 동시 요청 수별 추론 처리량 (세션당 intra-op 스레드 = 코어 수 / 풀 크기)"""
+    from concurrent.futures import ThreadPoolExecutor
+    from bg_pipeline import predict_mask
+    from session_pool import SessionPool, default_intra_op_threads
+
+    images = [np.asarray(make_synthetic_image((args.size, args.size), seed=i)) for i in range(args.requests)]
+
+    results = []
+    for pool_size in args.pool_sizes:
+        intra = args.intra_op_threads or default_intra_op_threads(pool_size)
+        pool = SessionPool('u2net', size=pool_size, intra_op_threads=intra, inter_op_threads=1)
+        for session in pool.fill():
+            predict_mask(images[0], session)  # 워밍업
+
+        def handle(rgb):
+            start = time.perf_counter()
+            with pool.session() as session:
+                predict_mask(rgb, session)
+            return time.perf_counter() - start
+
+        for concurrency in args.concurrency:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                start = time.perf_counter()
+                latencies = list(executor.map(handle, images))
+                elapsed = time.perf_counter() - start
+            results.append({
+                'benchmark': 'pool',
+                'pool_size': pool_size,
+                'intra_op_threads': intra,
+                'concurrency': concurrency,
+                'requests': len(images),
+                'images_per_sec': round(len(images) / elapsed, 2),
+                'p50': round(float(np.percentile(latencies, 50)), 4),
+                'p95': round(float(np.percentile(latencies, 95)), 4),
+                'pool_wait_seconds': pool.stats()['wait_seconds'],
+            })
+    return results
+
+
+def run_legacy_pipeline(data, session, width, height, timer):
+    """기존 경로 재현: PNG 인코딩 → rembg.remove(bytes) → 결과 PNG 디코드 → numpy ↔ PIL → PNG 인코딩"""
+    from rembg import remove
+    with timer.stage('decode'):
+        image = Image.open(BytesIO(data))
+        image.load()
+    with timer.stage('png_encode_input'):
+        img_bytes = BytesIO()
+        image.convert("RGB").save(img_bytes, format="PNG")
+    with timer.stage('inference'):
+        # rembg 내부의 PNG 디코드/결과 PNG 인코딩 포함
+        result_bytes = remove(img_bytes.getvalue(), session=session, alpha_matting=False)
+    with timer.stage('png_decode_result'):
+        np_img = np.array(Image.open(BytesIO(result_bytes)).convert("RGBA"))
+    with timer.stage('refine'):
+        alpha = np_img[..., 3].astype(np.float32) / 255.0
+        np_img[..., 3] = (legacy_refine_alpha_mask(alpha) * 255).astype(np.uint8)
+    with timer.stage('render'):
+        result_image = Image.fromarray(np_img, 'RGBA')
+        ys, xs = np.where(np_img[..., 3] > 0)
+        if ys.size:
+            result_image = result_image.crop((xs.min(), ys.min(), xs.max() + 1, ys.max() + 1))
+        result_image.thumbnail((width, height), Image.Resampling.LANCZOS)
+        canvas = Image.new("RGBA", (width, height), (255, 255, 255, 0))
+        canvas.paste(result_image, ((width - result_image.width) // 2, (height - result_image.height) // 2), result_image)
+    with timer.stage('png_encode_output'):
+        canvas.save(BytesIO(), format='PNG', optimize=False)
+
+
+def run_array_pipeline(data, session, width, height, timer):
+    """새 경로: 디코드 1회 → ndarray 추론/정제 → 인코딩 1회"""
+    from bg_pipeline import decode_image, predict_mask
+    from image_bg_backend import refine_cutout_alpha, render_cutout
+
+    with timer.stage('decode'):
+        rgb = decode_image(data)
+    with timer.stage('inference'):
+        raw_mask = predict_mask(rgb, session)
+    with timer.stage('refine'):
+        alpha_final, box = refine_cutout_alpha(raw_mask)
+    with timer.stage('render_and_encode'):
+        render_cutout(rgb, raw_mask, alpha_final, width, height, box=box)
+
+
+def bench_pipeline(args):
+    """기존 PNG 왕복 경로 vs ndarray 파이프라인 단계별 시간 비교"""
+    from bg_pipeline import StageTimer
+    from image_bg_backend import get_session
+
+    session = get_session()
+    buffer = BytesIO()
+    make_synthetic_image((args.size, args.size)).save(buffer, format='JPEG', quality=90)
+    data = buffer.getvalue()
+
+    results = []
+    for name, runner in (('legacy', run_legacy_pipeline), ('array', run_array_pipeline)):
+        runner(data, session, args.width, args.height, StageTimer())  # 워밍업
+        timer = StageTimer()
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            runner(data, session, args.width, args.height, timer)
+        total = (time.perf_counter() - start) / args.repeat
+        stages = {stage: round(seconds / args.repeat, 4) for stage, seconds in timer.stages.items()}
+        results.append({
+            'benchmark': 'pipeline',
+            'path': name,
+            'image_size': args.size,
+            'seconds': round(total, 4),
+            'stages': stages,
+        })
+    return results
+
+
+def bench_suite_remove_bg(args):
+    """/api/remove_bg (Flask 테스트 클라이언트, 결과/마스크 캐시 비활성화) 해상도별 지연"""
+    import image_bg_backend
+    from result_cache import ResultCache
+
+    # 매 반복이 실제 추론을 하도록 캐시를 크기 0으로 교체
+    image_bg_backend.result_cache = ResultCache(max_memory_bytes=0)
+    image_bg_backend.mask_cache = ResultCache(max_memory_bytes=0)
+    client = image_bg_backend.app.test_client()
+
+    results = []
+    for size in args.sizes:
+        buffer = BytesIO()
+        make_synthetic_image((size, size)).save(buffer, format='JPEG', quality=90)
+        data = buffer.getvalue()
+
+        def run():
+            response = client.post('/api/remove_bg', data={
+                'file': (BytesIO(data), 'product.jpg'), 'width': '600', 'height': '600'
+            }, content_type='multipart/form-data')
+            if response.status_code != 200:
+                raise RuntimeError(f'remove_bg failed: {response.status_code} {response.get_data(as_text=True)}')
+
+        results.append({'benchmark': 'suite', 'target': 'remove_bg', 'image_size': size,
+                        **summarize(measure(run, args.repeat))})
+    return results
+
+
+def bench_suite_remove_background(args):
+    """background_removal.remove_background (pymatting 포함이라 작은 해상도만) 지연"""
+    from background_removal import remove_background
+
+    results = []
+    for size in args.matting_sizes:
+        image = make_synthetic_image((size, size))
+        results.append({'benchmark': 'suite', 'target': 'remove_background', 'image_size': size,
+                        **summarize(measure(lambda: remove_background(image, (600, 600)), args.repeat))})
+    return results
+
+
+def bench_suite_convert(args):
+    """/api/convert (결과 캐시 비활성화) 포맷/모드별 지연 - testsrc 클립 사용"""
+    import backend_server
+    from result_cache import ResultCache
+
+    if not backend_server.ffmpeg_info['available']:
+        return [{'benchmark': 'suite', 'target': 'convert', 'skipped': 'ffmpeg not available'}]
+
+    backend_server.convert_cache = ResultCache(max_memory_bytes=0)
+    client = backend_server.app.test_client()
+    temp_dir = tempfile.mkdtemp()
+    results = []
+    try:
+        clip_path = make_test_clip(backend_server.FFMPEG_PATH, os.path.join(temp_dir, 'testsrc.mp4'),
+                                   args.clip_seconds, args.clip_size, args.clip_fps)
+        with open(clip_path, 'rb') as f:
+            clip = f.read()
+
+        for variant in args.convert_variants:
+            output_format, _, gif_mode = variant.partition(':')
+            form = {'format': output_format, 'videoLength': 'full', 'width': str(args.convert_width)}
+            if gif_mode:
+                form['gifMode'] = gif_mode
+
+            def run():
+                response = client.post('/api/convert', data={'file': (BytesIO(clip), 'testsrc.mp4'), **form},
+                                       content_type='multipart/form-data')
+                response.get_data()
+                if response.status_code != 200:
+                    raise RuntimeError(f'convert failed: {response.status_code} {response.get_data(as_text=True)}')
+
+            results.append({'benchmark': 'suite', 'target': 'convert', 'variant': variant,
+                            'clip': f'{args.clip_size}@{args.clip_fps}fps/{args.clip_seconds}s',
+                            **summarize(measure(run, args.repeat))})
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return results
+
+
+def children_cpu_seconds():
+    """종료된 자식 프로세스(FFmpeg)의 누적 CPU 시간 (user + sys)"""
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench_renditions(args):
+    """렌디션 N개: /api/convert N회(렌디션마다 디코드) vs /api/convert/renditions 1회(디코드/스케일 공유)"""
+    import backend_server
+    from result_cache import ResultCache
+
+    if not backend_server.ffmpeg_info['available']:
+        return [{'benchmark': 'renditions', 'skipped': 'ffmpeg not available'}]
+
+    backend_server.convert_cache = ResultCache(max_memory_bytes=0)
+    client = backend_server.app.test_client()
+    temp_dir = tempfile.mkdtemp()
+    results = []
+    try:
+        clip_path = make_test_clip(backend_server.FFMPEG_PATH, os.path.join(temp_dir, 'testsrc.mp4'),
+                                   args.clip_seconds, args.clip_size, args.clip_fps)
+        with open(clip_path, 'rb') as f:
+            clip = f.read()
+
+        def post(url, form):
+            response = client.post(url, data={'file': (BytesIO(clip), 'testsrc.mp4'), 'videoLength': 'full', **form},
+                                   content_type='multipart/form-data')
+            response.get_data()
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} failed: {response.status_code} {response.get_data(as_text=True)}')
+
+        def separate():
+            for rendition in args.renditions:
+                output_format, _, width = rendition.partition(':')
+                post('/api/convert', {'format': output_format, 'width': width})
+
+        def combined():
+            post('/api/convert/renditions', {'renditions': ','.join(args.renditions)})
+
+        for name, fn in (('separate', separate), ('combined', combined)):
+            fn()  # 워밍업
+            cpu_start = children_cpu_seconds()
+            timings = measure(fn, args.repeat, warmup=0)
+            results.append({
+                'benchmark': 'renditions',
+                'mode': name,
+                'renditions': args.renditions,
+                'clip': f'{args.clip_size}@{args.clip_fps}fps/{args.clip_seconds}s',
+                'wall_seconds': round(min(timings), 3),
+                'ffmpeg_cpu_seconds': round((children_cpu_seconds() - cpu_start) / args.repeat, 3),
+            })
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return results
+
+
+SUITE_TARGETS = {
+    'remove_bg': bench_suite_remove_bg,
+    'remove_background': bench_suite_remove_background,
+    'convert': bench_suite_convert,
+}
+
+
+def bench_suite(args):
+    """전체 오프라인 벤치마크: p50/p95, 처리량, 최대 RSS (--output으로 버전 간 비교용 JSON 저장)"""
+    results = []
+    for target in args.targets:
+        results.extend(SUITE_TARGETS[target](args))
+
+    if args.output:
+        versions = {}
+        for module in ('numpy', 'PIL', 'cv2', 'rembg', 'onnxruntime', 'flask'):
+            try:
+                versions[module] = getattr(__import__(module), '__version__', None)
+            except ImportError:
+                versions[module] = None
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'versions': versions,
+                'results': results,
+            }, f, ensure_ascii=False, indent=2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='배경 제거 / 비디오 변환 벤치마크')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    batch = subparsers.add_parser('batch', help='배치 크기별 추론 처리량')
+    batch.add_argument('--images', type=int, default=32)
+    batch.add_argument('--size', type=int, default=1000, help='합성 이미지 한 변 길이(px)')
+    batch.add_argument('--batch-sizes', type=parse_int_list, default=[1, 2, 4, 8, 16])
+    batch.add_argument('--repeat', type=int, default=3)
+    batch.set_defaults(func=bench_batch)
+
+    pipeline = subparsers.add_parser('pipeline', help='PNG 왕복 경로 vs ndarray 파이프라인 단계별 시간')
+    pipeline.add_argument('--size', type=int, default=2000)
+    pipeline.add_argument('--width', type=int, default=600)
+    pipeline.add_argument('--height', type=int, default=600)
+    pipeline.add_argument('--repeat', type=int, default=5)
+    pipeline.set_defaults(func=bench_pipeline)
+
+    refine = subparsers.add_parser('refine', help='컴포넌트 수별 알파 정제 마이크로벤치마크')
+    refine.add_argument('--sizes', type=parse_int_list, default=[1000, 2000])
+    refine.add_argument('--components', type=parse_int_list, default=[0, 10, 100, 500, 1000])
+    refine.add_argument('--repeat', type=int, default=5)
+    refine.set_defaults(func=bench_refine)
+
+    matting = subparsers.add_parser('matting', help='전체 프레임 vs 경계 띠 타일 매팅 시간/메모리')
+    matting.add_argument('--sizes', type=parse_int_list, default=[256, 512, 1000, 2000])
+    matting.add_argument('--tile-size', type=int, default=256)
+    matting.add_argument('--full-max-size', type=int, default=512, help='전체 프레임 closed-form을 실행할 최대 크기')
+    matting.add_argument('--repeat', type=int, default=3)
+    matting.set_defaults(func=bench_matting)
+
+    encode = subparsers.add_parser('encode', help='출력 형식/압축 수준별 인코딩 시간과 크기')
+    encode.add_argument('--size', type=int, default=2000, help='합성 원본 이미지 한 변 길이(px)')
+    encode.add_argument('--canvas-sizes', type=parse_int_list, default=[600, 1200])
+    encode.add_argument('--variants', type=parse_str_list,
+                        default=['png:1', 'png:6', 'png:9', 'webp:60', 'webp:80', 'webp:95', 'webp_lossless'],
+                        help='format[:level] 목록 (png는 compression, webp는 quality)')
+    encode.add_argument('--repeat', type=int, default=3)
+    encode.set_defaults(func=bench_encode)
+
+    decode = subparsers.add_parser('decode', help='업로드 크기(MP)별 전체 디코드 vs 축소 디코드 시간/메모리')
+    decode.add_argument('--megapixels', type=parse_int_list, default=[12, 24, 50])
+    decode.add_argument('--max-dimension', type=int, default=2000, help='remove_bg 티어 최대 해상도 (best 2000)')
+    decode.add_argument('--orientation', type=int, default=6, help='EXIF 방향 태그 (6 = 세로로 찍은 휴대폰 사진)')
+    decode.add_argument('--repeat', type=int, default=3)
+    decode.set_defaults(func=bench_decode)
+
+    pool = subparsers.add_parser('pool', help='세션 풀 크기/동시 요청 수별 추론 처리량')
+    pool.add_argument('--pool-sizes', type=parse_int_list, default=[1, 2, 4])
+    pool.add_argument('--concurrency', type=parse_int_list, default=[1, 2, 4, 8])
+    pool.add_argument('--intra-op-threads', type=int, default=0, help='0이면 코어 수 / 풀 크기')
+    pool.add_argument('--requests', type=int, default=32)
+    pool.add_argument('--size', type=int, default=1000, help='합성 이미지 한 변 길이(px)')
+    pool.set_defaults(func=bench_pool)
+
+    renditions = subparsers.add_parser('renditions', help='렌디션별 개별 변환 vs 단일 필터 그래프 CPU/지연')
+    renditions.add_argument('--renditions', type=parse_str_list, default=['gif:320', 'gif:640', 'webp:320', 'webp:640'])
+    renditions.add_argument('--clip-seconds', type=int, default=5)
+    renditions.add_argument('--clip-size', default='1280x720')
+    renditions.add_argument('--clip-fps', type=int, default=30)
+    renditions.add_argument('--repeat', type=int, default=3)
+    renditions.set_defaults(func=bench_renditions)
+
+    suite = subparsers.add_parser('suite', help='remove_bg / remove_background / /api/convert 오프라인 벤치마크')
+    suite.add_argument('--targets', type=parse_str_list, default=list(SUITE_TARGETS))
+    suite.add_argument('--sizes', type=parse_int_list, default=[500, 1000, 2000, 4000],
+                       help='remove_bg 합성 이미지 한 변 길이(px)')
+    suite.add_argument('--matting-sizes', type=parse_int_list, default=[256, 512],
+                       help='remove_background(pymatting) 이미지 크기')
+    suite.add_argument('--clip-seconds', type=int, default=3)
+    suite.add_argument('--clip-size', default='640x360')
+    suite.add_argument('--clip-fps', type=int, default=15)
+    suite.add_argument('--convert-width', type=int, default=480)
+    suite.add_argument('--convert-variants', type=parse_str_list, default=['webp', 'gif:single', 'gif:two-pass'],
+                       help='format[:gifMode] 목록')
+    suite.add_argument('--repeat', type=int, default=5)
+    suite.add_argument('--output', help='결과 JSON 저장 경로 (환경/버전 정보 포함)')
+    suite.set_defaults(func=bench_suite)
+
+    args = parser.parse_args()
+    for row in args.func(args):
+        print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
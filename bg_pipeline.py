@@ -0,0 +1,218 @@
+"""배경 제거 공용 파이프라인 (ndarray 기반)
+
+디코드 1회 → u2net 추론/정제는 ndarray에서 직접 → 인코딩 1회.
+rembg.remove()에 PNG 바이트를 넘기고 결과 PNG를 다시 디코드하던 왕복을 없앤다.
+image_bg_backend.py, background_removal.py 양쪽에서 사용.
+"""
+import time
+from contextlib import contextmanager, nullcontext
+from io import BytesIO
+
+import numpy as np
+from PIL import ExifTags, Image, ImageOps
+
+from memory_profile import profile_stage
+
+# 입력 크기/정규화 값은 rembg U2netSession과 동일
+U2NET_INPUT_SIZE = (320, 320)
+U2NET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+U2NET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# 품질/속도 티어별 rembg 모델 (세 모델 모두 320x320 입력 + 같은 정규화라 predict_masks를 그대로 사용)
+#   fast: u2netp (~4.7MB, 썸네일용 대략적 컷아웃), balanced: silueta (u2net 경량화), best: u2net
+QUALITY_MODELS = {
+    'fast': 'u2netp',
+    'balanced': 'silueta',
+    'best': 'u2net',
+}
+
+
+class StageTimer:
+    """단계별 소요 시간 기록 (초 단위, 같은 단계는 누적, 메모리 프로파일링 중이면 단계별 메모리도 기록)"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        with profile_stage(name):
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self, digits=4):
+        return {name: round(seconds, digits) for name, seconds in self.stages.items()}
+
+
+def timed(timer, name):
+    """timer가 있으면 timer.stage(name), 없으면 아무것도 하지 않는 컨텍스트"""
+    return timer.stage(name) if timer is not None else nullcontext()
+
+
+# 큰 이미지 축소 디코드 (측정: python benchmark.py decode)
+#   JPEG: draft()로 DCT 단계에서 1/2~1/8 배율로 디코드 → 전체 해상도 비트맵을 만들지 않음
+#   그 외: 전체 디코드 후 reducing_gap으로 정수배 reduce() → 남은 비율만 LANCZOS
+DECODE_REDUCING_GAP = 3.0
+
+
+def target_size(size, max_dimension):
+    """긴 변을 max_dimension에 맞춘 크기 (비율 유지)"""
+    scale = max_dimension / max(size)
+    return int(size[0] * scale), int(size[1] * scale)
+
+
+def draft_scale(size, target):
+    """JPEG draft()가 고르는 DCT 축소 배율 (결과가 target 이상인 1/2/4/8 중 가장 큰 배율)"""
+    scale = min(size[0] // max(1, target[0]), size[1] // max(1, target[1]))
+    return next(factor for factor in (8, 4, 2, 1) if scale >= factor)
+
+
+def decoded_size(size, image_format, max_dimension=None):
+    """open_image가 실제로 디코드하는 비트맵 크기 (JPEG는 DCT 축소 후, 메모리 추정용)"""
+    if image_format == 'JPEG' and max_dimension and max(size) > max_dimension:
+        scale = draft_scale(size, target_size(size, max_dimension))
+        return -(-size[0] // scale), -(-size[1] // scale)
+    return size
+
+
+def open_image(data, max_dimension=None, timer=None):
+    """이미지 바이트(또는 경로) → 디코드된 PIL 이미지 (모드 유지, EXIF 방향 적용, 큰 이미지는 max_dimension으로 축소)"""
+    with timed(timer, 'decode'):
+        image = Image.open(BytesIO(data) if isinstance(data, (bytes, bytearray)) else data)
+        original_size = image.size
+        new_size = target_size(original_size, max_dimension) if max_dimension and max(original_size) > max_dimension else None
+        if new_size and image.format == 'JPEG':
+            image.draft(None, new_size)
+        image.load()
+    if new_size and image.size != new_size:
+        with timed(timer, 'downscale'):
+            image = image.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=DECODE_REDUCING_GAP)
+    if new_size:
+        print(f"이미지 리사이즈: {original_size} → {new_size} (메모리 절약)")
+    # 휴대폰 사진의 EXIF 방향 적용 (축소 후에 회전하므로 비용이 작음)
+    if image.getexif().get(ExifTags.Base.Orientation, 1) != 1:
+        with timed(timer, 'exif_transpose'):
+            image = ImageOps.exif_transpose(image)
+    return image
+
+
+def peek_image(data):
+    """이미지 헤더만 읽어 (원본 크기 (width, height), 형식) 반환 (픽셀은 디코드하지 않음)"""
+    with Image.open(BytesIO(data) if isinstance(data, (bytes, bytearray)) else data) as image:
+        return image.size, image.format
+
+
+def to_rgb_array(image, timer=None):
+    """PIL 이미지 → RGB ndarray (HxWx3 uint8)"""
+    with timed(timer, 'decode'):
+        return np.asarray(image.convert("RGB"))
+
+
+def decode_image(data, max_dimension=None, timer=None):
+    """이미지 바이트 → RGB ndarray (HxWx3 uint8). 큰 이미지는 max_dimension으로 축소"""
+    return to_rgb_array(open_image(data, max_dimension, timer), timer)
+
+
+def normalize_for_u2net(rgb):
+    """rembg U2netSession.normalize와 동일한 전처리 (배치 축 제외, CHW float32)"""
+    im = Image.fromarray(rgb).resize(U2NET_INPUT_SIZE, Image.Resampling.LANCZOS)
+    im_ary = np.asarray(im, dtype=np.float32)
+    im_ary = im_ary / max(float(im_ary.max()), 1e-6)
+    im_ary = (im_ary - U2NET_MEAN) / U2NET_STD
+    return im_ary.transpose((2, 0, 1))
+
+
+def predict_masks(images, session, batch_size=8):
+    """u2net 배치 추론: RGB 배열들을 (N, 3, 320, 320) 텐서로 묶어 실행하고 원본 크기 마스크(uint8) 반환"""
+    inner = session.inner_session
+    model_input = inner.get_inputs()[0]
+    # 배치 축이 고정 크기로 export된 모델이면 그 크기에 맞춰 실행 (부족분은 패딩)
+    fixed_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+    if fixed_batch:
+        batch_size = fixed_batch
+    batch_size = max(1, int(batch_size))
+
+    masks = []
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        tensors = [normalize_for_u2net(rgb) for rgb in chunk]
+        if fixed_batch and len(tensors) < fixed_batch:
+            tensors.extend([tensors[-1]] * (fixed_batch - len(tensors)))
+        batch = np.stack(tensors).astype(np.float32, copy=False)
+        pred = inner.run(None, {model_input.name: batch})[0][:len(chunk), 0, :, :]
+
+        # 정규화는 이미지별로 (rembg는 단일 이미지 기준 min/max 사용)
+        for rgb, p in zip(chunk, pred):
+            mi, ma = p.min(), p.max()
+            p = (p - mi) / max(ma - mi, 1e-6)
+            mask = Image.fromarray((p.clip(0, 1) * 255).astype(np.uint8), mode="L")
+            mask = mask.resize((rgb.shape[1], rgb.shape[0]), Image.Resampling.LANCZOS)
+            masks.append(np.asarray(mask))
+    return masks
+
+
+def predict_mask(rgb, session):
+    """단일 이미지 u2net 마스크 (uint8, HxW)"""
+    return predict_masks([rgb], session, batch_size=1)[0]
+
+
+def naive_cutout(rgb, mask):
+    """rembg naive_cutout과 동일한 합성 (RGB는 마스크로 감쇠, 알파 = 마스크) → RGBA ndarray
+
+    rgb/mask가 크롭된 뷰여도 그대로 동작하므로, 필요한 영역만 잘라 넘기면 그만큼만 계산한다.
+    """
+    rgba = np.empty(mask.shape + (4,), dtype=np.uint8)
+    weights = mask.astype(np.uint16)[..., None]
+    rgba[..., :3] = (rgb.astype(np.uint16) * weights + 127) // 255
+    rgba[..., 3] = mask
+    return rgba
+
+
+def bounding_box(alpha, padding=0):
+    """알파 > 0 영역의 바운딩 박스 (xmin, ymin, xmax, ymax), 없으면 None"""
+    cols = np.flatnonzero(alpha.any(axis=0))
+    if cols.size == 0:
+        return None
+    rows = np.flatnonzero(alpha.any(axis=1))
+    box = (int(cols[0]), int(rows[0]), int(cols[-1]), int(rows[-1]))
+    return pad_box(box, padding, alpha.shape) if padding else box
+
+
+def pad_box(box, padding, shape):
+    """바운딩 박스에 패딩 추가 (이미지 경계로 클리핑)"""
+    if box is None:
+        return None
+    h, w = shape[:2]
+    xmin, ymin, xmax, ymax = box
+    return (
+        max(0, xmin - padding),
+        max(0, ymin - padding),
+        min(w - 1, xmax + padding),
+        min(h - 1, ymax + padding),
+    )
+
+
+def encode_png(image, optimize=False):
+    """최종 1회 인코딩 → BytesIO"""
+    output = BytesIO()
+    image.save(output, format='PNG', optimize=optimize)
+    output.seek(0)
+    return output
+
+
+def encode_image(image, image_format='png', compress_level=6, quality=80):
+    """최종 1회 인코딩 → BytesIO (png: compress_level 0~9, webp: 손실 quality 0~100, webp_lossless)"""
+    output = BytesIO()
+    if image_format == 'png':
+        image.save(output, format='PNG', compress_level=compress_level)
+    elif image_format == 'webp':
+        # 알파 채널은 무손실 유지, 완전 투명 픽셀의 RGB는 인코더가 자유롭게 버림 (exact=False)
+        image.save(output, format='WEBP', quality=quality, method=4)
+    elif image_format == 'webp_lossless':
+        image.save(output, format='WEBP', lossless=True, quality=80, method=4)
+    else:
+        raise ValueError(f'Unsupported output format: {image_format}')
+    output.seek(0)
+    return output
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """대기 중인 작업이 max_pending을 넘으면 발생"""
+
+
+class JobQueue:
+    """변환 작업 큐: 동시 실행 개수가 제한된 워커 풀 + 상태/결과 조회
+
+    state_path(job_id)가 있으면 상태가 바뀔 때마다 작업 정보를 JSON 파일로 기록하고, 이 프로세스에 없는
+    작업은 그 파일에서 조회한다 (gunicorn 워커 여러 개가 같은 스크래치 루트를 공유할 때 다른 워커의 작업도 조회 가능).
+    local_fields는 파일에 기록하지 않는 프로세스 내부 필드 (예: 스크래치 작업 객체).
+    on_finish(job)는 작업이 끝날 때(성공/실패), on_expire(job)는 TTL이 지나 정리될 때 호출된다.
+    max_pending은 프로세스별 한도다.
+    """
+
+    def __init__(self, max_workers=2, max_pending=20, ttl_seconds=600, on_expire=None, on_finish=None,
+                 state_path=None, local_fields=()):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.on_expire = on_expire
+        self.on_finish = on_finish
+        self.state_path = state_path
+        self.local_fields = set(local_fields)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ffmpeg-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, job_id=None, **info):
+        """작업 등록 → job_id 반환 (job_id를 주지 않으면 새로 생성, 대기열이 가득 차면 QueueFullError)"""
+        self.purge_expired()
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job['status'] == 'queued')
+            if pending >= self.max_pending:
+                raise QueueFullError(f'Too many pending jobs ({pending})')
+            job_id = job_id or uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': 'queued',
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None,
+                'result': None,
+                **info,
+            }
+            self._save(self._jobs[job_id])
+        self._executor.submit(self._run, job_id, func, args)
+        return job_id
+
+    def _run(self, job_id, func, args):
+        self._update(job_id, status='running', started_at=time.time())
+        try:
+            result = func(*args)
+            self._update(job_id, status='done', result=result, finished_at=time.time())
+        except Exception as e:
+            print(f"변환 작업 실패 ({job_id}): {str(e)}")
+            print(traceback.format_exc())
+            self._update(job_id, status='failed', error=str(e), finished_at=time.time())
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if self.on_finish and job is not None:
+            try:
+                self.on_finish(job)
+            except Exception as e:
+                print(f"작업 완료 처리 실패 ({job_id}): {str(e)}")
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+                self._save(job)
+
+    def _save(self, job):
+        """작업 정보를 상태 파일에 원자적으로 기록 (임시 파일 → rename)"""
+        path = self.state_path(job['id']) if self.state_path else None
+        if path is None:
+            return
+        state = {key: value for key, value in job.items() if key not in self.local_fields}
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # 작업 디렉토리가 이미 정리된 경우 등
+            print(f"작업 상태 기록 실패 ({job['id']}): {str(e)}")
+
+    def _load(self, job_id):
+        """다른 프로세스가 기록한 작업 정보 (없거나 만료됐으면 None)"""
+        path = self.state_path(job_id) if self.state_path else None
+        if path is None:
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if job['finished_at'] is not None and time.time() - job['finished_at'] > self.ttl_seconds:
+            return None
+        return job
+
+    def get(self, job_id):
+        """작업 정보 사본 (이 프로세스에 없으면 상태 파일에서, 없으면 None)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        return self._load(job_id)
+
+    def purge_expired(self):
+        """완료 후 ttl_seconds가 지난 작업 정리 (on_expire 콜백으로 파일 정리)"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job['finished_at'] is not None and now - job['finished_at'] > self.ttl_seconds
+            ]
+            for job in expired:
+                del self._jobs[job['id']]
+        for job in expired:
+            if self.on_expire:
+                try:
+                    self.on_expire(job)
+                except Exception as e:
+                    print(f"작업 정리 실패 ({job['id']}): {str(e)}")
+
+    def stats(self):
+        """상태별 작업 수"""
+        with self._lock:
+            counts = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+        counts['max_workers'] = self.max_workers
+        counts['max_pending'] = self.max_pending
+        return counts
@@ -0,0 +1,29 @@
+"""gunicorn 설정 (두 백엔드 공용)
+
+    REMOVE_BG_PRELOAD=sync gunicorn -w 2 -b 0.0.0.0:5001 image_bg_backend:app
+    gunicorn -w 2 -b 0.0.0.0:5000 backend_server:app
+
+preload_app으로 앱 모듈을 fork 전에 master에서 1회 import한다 (FFmpeg 확인, 모델 파일 다운로드).
+onnxruntime 세션은 fork 이후 안전하지 않으므로 세션 생성 + 더미 추론은 워커마다
+post_worker_init에서 수행하고, 워밍업이 끝난 뒤에 워커가 요청을 받기 시작한다.
+"""
+import os
+import sys
+
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 300))
+
+
+def on_starting(server):
+    module = sys.modules.get('image_bg_backend')
+    if module is not None and module.REMOVE_BG_PRELOAD != 'off':
+        try:
+            module.prefetch_model()
+        except Exception as e:
+            print(f"모델 파일 사전 다운로드 실패: {str(e)}")
+
+
+def post_worker_init(worker):
+    module = sys.modules.get('image_bg_backend')
+    if module is not None:
+        module.warm_up()
@@ -2,24 +2,35 @@ from flask import Flask, request, send_file, jsonify
 from flask_cors import CORS
 from PIL import Image
 from io import BytesIO
-from rembg import remove, new_session
-import threading
+import os
+import json
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import cv2
-from skimage.morphology import dilation, disk
-# pymatting은 메모리 부족으로 인한 크래시 방지를 위해 선택적 import
-try:
-    from pymatting import estimate_alpha_cf
-    PYMATTING_AVAILABLE = True
-except ImportError:
-    PYMATTING_AVAILABLE = False
-    print("Warning: pymatting not available, using simplified alpha refinement")
 import traceback
+import threading
+from result_cache import ResultCache, make_cache_key
+from scratch import ScratchQuotaExceeded, scratch_from_env
+from admission import AdmissionController, AdmissionRejected
+from warmup import ModelWarmup
+from session_pool import SessionPool, default_intra_op_threads
+from inference_workers import InferenceWorkerPool, WorkerCrashed
+from metrics import MetricsRegistry, instrument_app
+from memory_profile import instrument_memory
+from matting import MATTING_MODES, refine_matte
+from triage import TriageStats, fast_path_mask, triage
+from video_cutout import TemporalMasker, cutout_video
+from bg_pipeline import QUALITY_MODELS, StageTimer, timed, peek_image, decoded_size, open_image, to_rgb_array, predict_mask, predict_masks, naive_cutout, bounding_box, pad_box, encode_image
 
 app = Flask(__name__)
 # CORS 설정 - 가장 단순한 형태로 모든 origin 허용
 CORS(app, origins="*", supports_credentials=False)
 
+# 큰 업로드의 스풀 파일은 공용 스크래치 루트에 생성 (SCRATCH_ROOT로 tmpfs 지정 가능)
+scratch_space = scratch_from_env()
+app.request_class = scratch_space.request_class()
+
 # CORS 헤더를 명시적으로 추가 (after_request - 모든 응답에)
 @app.after_request
 def after_request(response):
@@ -27,6 +38,8 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
     response.headers.add('Access-Control-Max-Age', '3600')
+    response.headers.add('Access-Control-Expose-Headers', 'X-Cache,X-Cutout-Offset-X,X-Cutout-Offset-Y,X-Cutout-Canvas,'
+                         'X-Video-Frames,X-Video-Inferred-Frames,X-Memory-Peak-MB')
     return response
 
 # 전역 에러 핸들러
@@ -41,106 +54,544 @@ def handle_exception(e):
     response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
     return response, 500
 
-# 모델 세션을 lazy load로 변경 (메모리 절약 및 시작 시간 단축)
-u2net_session = None
-session_lock = threading.Lock()
+# /metrics (Prometheus): 단계별 지연, 진행 중 요청 수, 업로드/응답 바이트
+metrics = instrument_app(app, MetricsRegistry())
+stage_seconds = metrics.histogram('remove_bg_stage_seconds', 'remove_bg time per pipeline stage', ['stage', 'quality'])
+remove_bg_results = metrics.counter('remove_bg_requests_total', 'remove_bg requests by cache outcome', ['cache'])
+triage_results = metrics.counter('remove_bg_triage_total', 'Pre-inference triage outcomes per image', ['path'])
+admission_rejected = metrics.counter('remove_bg_admission_rejected_total', 'Requests rejected by admission control',
+                                     ['reason'])
+video_frames = metrics.counter('remove_bg_video_frames_total', 'Video cutout frames by mask source', ['mask'])
 
-def get_session():
-    """모델 세션을 lazy load로 가져오기 (에러 핸들링 포함)"""
-    global u2net_session
-    if u2net_session is None:
-        with session_lock:
-            if u2net_session is None:
-                try:
-                    print("모델 세션 로딩 시작...")
-                    u2net_session = new_session('u2net')
-                    print("모델 세션 로딩 완료")
-                except Exception as e:
-                    print(f"모델 세션 로딩 실패: {str(e)}")
-                    print(traceback.format_exc())
-                    raise
-    return u2net_session
+# 요청별 메모리 프로파일링 (MEMORY_PROFILE=on|header, 기본 off): 단계별 최대 할당/할당 위치/큰 NumPy 버퍼
+# 결과는 JSON 한 줄 로그 + GET /api/debug/memory (최악 사례 집계)
+instrument_memory(app)
+
+# 큰 이미지는 추론 전 최대 2000px로 축소 (메모리 절약)
+MAX_DIMENSION = 2000
+
+# best 티어의 경계 매팅 모드 (off / guided / closed_form, 경계 띠 타일만 계산하므로 메모리는 경계 길이에 비례)
+# 기본 off: best 티어 출력은 기존과 동일. guided/closed_form은 경계 알파가 달라지므로 명시적으로 켤 때만
+MATTING_MODE = os.environ.get('REMOVE_BG_MATTING', 'off').lower()
+if MATTING_MODE not in MATTING_MODES:
+    raise ValueError(f"REMOVE_BG_MATTING must be one of {', '.join(MATTING_MODES)}")
+
+# 품질/속도 티어 (quality 파라미터): 모델, 추론 전 최대 해상도, 알파 정제 여부, 경계 매팅,
+# 작업 해상도 픽셀당 메모리 추정치 (admission control용)
+QUALITY_TIERS = {
+    'fast': {'model': QUALITY_MODELS['fast'], 'max_dimension': 1024, 'refine': False,
+             'matting': 'off', 'bytes_per_pixel': 8},
+    'balanced': {'model': QUALITY_MODELS['balanced'], 'max_dimension': 1600, 'refine': True,
+                 'matting': 'off', 'bytes_per_pixel': 12},
+    'best': {'model': QUALITY_MODELS['best'], 'max_dimension': MAX_DIMENSION, 'refine': True,
+             'matting': MATTING_MODE, 'bytes_per_pixel': 16},
+}
+DEFAULT_QUALITY = os.environ.get('REMOVE_BG_DEFAULT_QUALITY', 'best')
+
+# 출력 인코딩 (format 파라미터, 없으면 Accept 헤더로 협상). 측정: python benchmark.py encode
+#   png: 무손실, compression 0~9 (기본 6 = 기존 출력과 동일). 9는 인코딩 시간이 ~1.7배인데 크기는 1% 안팎만 줄어듦
+#   webp: 손실 RGB + 알파, webp_quality 0~100 (기본 80). PNG 대비 1/4~1/5 크기, 인코딩은 PNG 기본보다 ~2배 느림
+#   webp_lossless: 무손실 WebP. PNG 대비 ~40% 작지만 인코딩이 가장 느림 (PNG 기본의 ~2.5배)
+# crop=1이면 width x height 캔버스 대신 크롭된 피사체만 반환하고 배치 위치는 X-Cutout-* 헤더로 전달.
+# 완전 투명 여백은 거의 0바이트로 압축되므로 바이트 절감은 피사체가 캔버스에 비해 작을 때만 크고,
+# 주된 이득은 클라이언트가 디코드/합성할 픽셀 수가 줄어드는 것
+OUTPUT_FORMATS = {
+    'png': {'mimetype': 'image/png', 'extension': '.png'},
+    'webp': {'mimetype': 'image/webp', 'extension': '.webp'},
+    'webp_lossless': {'mimetype': 'image/webp', 'extension': '.webp'},
+}
+# Accept: image/webp만 보낸 클라이언트에 줄 형식 (품질 변화 없도록 기본은 무손실)
+ACCEPT_WEBP_FORMAT = os.environ.get('REMOVE_BG_ACCEPT_WEBP_FORMAT', 'webp_lossless')
+
+# 추론 전 트리아지 (REMOVE_BG_TRIAGE=off로 비활성화, 임계값은 triage.py의 TRIAGE_* 환경 변수)
+# 이미 알파가 있는 이미지 / 단색 이미지 / 균일한 배경은 세션을 쓰지 않고 빠른 경로로 처리
+TRIAGE_ENABLED = os.environ.get('REMOVE_BG_TRIAGE', 'on').lower() != 'off'
+triage_stats = TriageStats()
+
+# 영상 → 투명 애니메이션 WebP (/api/remove_bg_video)
+# 추론은 VIDEO_KEYFRAME_INTERVAL 프레임마다 또는 이동 보정 후 썸네일 차이가 VIDEO_DIFF_THRESHOLD를 넘을 때만,
+# 나머지 프레임은 직전 추론 마스크를 이동해 재사용 (video_cutout.py)
+VIDEO_FFMPEG_PATH = os.environ.get('FFMPEG_PATH', 'ffmpeg')
+VIDEO_QUALITY = os.environ.get('REMOVE_BG_VIDEO_QUALITY', 'balanced')
+VIDEO_DEFAULT_WIDTH = int(os.environ.get('REMOVE_BG_VIDEO_WIDTH', 480))
+VIDEO_MAX_WIDTH = int(os.environ.get('REMOVE_BG_VIDEO_MAX_WIDTH', 1280))
+VIDEO_DEFAULT_FPS = int(os.environ.get('REMOVE_BG_VIDEO_FPS', 12))
+VIDEO_MAX_FPS = int(os.environ.get('REMOVE_BG_VIDEO_MAX_FPS', 30))
+VIDEO_MAX_FRAMES = int(os.environ.get('REMOVE_BG_VIDEO_MAX_FRAMES', 600))
+VIDEO_KEYFRAME_INTERVAL = int(os.environ.get('REMOVE_BG_VIDEO_KEYFRAME_INTERVAL', 12))
+VIDEO_DIFF_THRESHOLD = float(os.environ.get('REMOVE_BG_VIDEO_DIFF_THRESHOLD', 4.0))
+VIDEO_TIMEOUT = int(os.environ.get('REMOVE_BG_VIDEO_TIMEOUT', 600))
+
+# 메모리 기반 요청 승인 (admission.py): 헤더의 이미지 크기로 요청별 최대 메모리를 추정해 예산 안에서만 실행
+# 자리가 없으면 대기열(REMOVE_BG_ADMISSION_QUEUE)에서 기다리고, 가득 차면 429 + Retry-After
+# 예산/동시 실행 수는 프로세스(gunicorn 워커)별, 0이면 해당 한도 없음
+admission = AdmissionController(
+    max_bytes=int(os.environ.get('REMOVE_BG_MEMORY_BUDGET_MB', 1024)) * 1024 * 1024,
+    max_concurrent=int(os.environ.get('REMOVE_BG_MAX_CONCURRENT', 4)),
+    max_queue=int(os.environ.get('REMOVE_BG_ADMISSION_QUEUE', 16)),
+    queue_timeout=float(os.environ.get('REMOVE_BG_ADMISSION_TIMEOUT', 30)),
+)
+admission_gauges = metrics.gauge('remove_bg_admission', 'Admission control state', ['state'])
+admission_gauges.set_function(lambda: admission.queued, state='queued')
+admission_gauges.set_function(lambda: admission.active, state='active')
+admission_gauges.set_function(lambda: admission.reserved_bytes, state='reserved_bytes')
+
+# 요청 메모리 추정 (바이트): 원본 디코드 + 작업 해상도 버퍼 + 출력 캔버스 + 고정분
+# RSS 측정(6000x4000 JPEG best ≈ 58MB (축소 디코드), 2000x1500 best ≈ 56MB, 1000x750 fast ≈ 21MB)보다 크게 잡은 값
+#   원본: PIL은 RGB도 픽셀당 4바이트 + 축소 버퍼 → 5B/px (JPEG는 DCT 축소 디코드된 크기 기준)
+#   작업 해상도: RGB 배열, 원본/정제 마스크, 정제/매팅 임시 버퍼, 크롭 합성 → 티어별 bytes_per_pixel
+#   출력 캔버스: RGBA + 인코더 버퍼 → 8B/px
+ADMISSION_SOURCE_BPP = 5
+ADMISSION_CANVAS_BPP = 8
+ADMISSION_BASE_BYTES = 16 * 1024 * 1024
+# 영상: 프레임 폭 기준 세로 영상(9:16)까지 가정 + FFmpeg 디코더/인코더 프로세스
+ADMISSION_VIDEO_PROCESS_BYTES = 64 * 1024 * 1024
+
+# 배치 추론 설정
+DEFAULT_BATCH_SIZE = int(os.environ.get('REMOVE_BG_BATCH_SIZE', 8))
+MAX_BATCH_FILES = int(os.environ.get('REMOVE_BG_MAX_BATCH_FILES', 50))
+
+# 결과 캐시 (같은 이미지 + 같은 width/height 재요청 시 모델 실행 생략)
+# REMOVE_BG_CACHE_DIR 지정 시 디스크 계층 사용
+result_cache = ResultCache(
+    max_memory_bytes=int(os.environ.get('REMOVE_BG_CACHE_MEMORY_MB', 64)) * 1024 * 1024,
+    disk_dir=os.environ.get('REMOVE_BG_CACHE_DIR') or None,
+    max_disk_bytes=int(os.environ.get('REMOVE_BG_CACHE_DISK_MB', 512)) * 1024 * 1024,
+)
+
+# 마스크 캐시 (이미지 콘텐츠 키 → 정제된 알파, 출력 크기/패딩/배경과 무관하게 재사용)
+mask_cache = ResultCache(
+    max_memory_bytes=int(os.environ.get('REMOVE_BG_MASK_CACHE_MEMORY_MB', 128)) * 1024 * 1024,
+    disk_dir=os.environ.get('REMOVE_BG_MASK_CACHE_DIR') or None,
+    max_disk_bytes=int(os.environ.get('REMOVE_BG_MASK_CACHE_DISK_MB', 1024)) * 1024 * 1024,
+)
+
+# 모델 세션 풀 (lazy load, 메모리 절약 및 시작 시간 단축)
+# 세션 수 × 세션당 intra-op 스레드 ≈ 코어 수가 되도록 설정 (풀 크기 1이면 onnxruntime 기본값)
+SESSION_POOL_SIZE = int(os.environ.get('REMOVE_BG_SESSION_POOL_SIZE', 1))
+SESSION_INTRA_OP_THREADS = int(os.environ.get(
+    'REMOVE_BG_INTRA_OP_THREADS', default_intra_op_threads(SESSION_POOL_SIZE) if SESSION_POOL_SIZE > 1 else 0))
+SESSION_INTER_OP_THREADS = int(os.environ.get('REMOVE_BG_INTER_OP_THREADS', 0))
+
+# 모델별 세션 풀 (티어가 처음 요청될 때 생성)
+session_pools = {}
+session_pools_lock = threading.Lock()
+
+def get_session_pool(model_name=None):
+    """모델 이름 → 세션 풀 (없으면 생성, 세션 자체는 풀 안에서 lazy load)"""
+    model_name = model_name or QUALITY_TIERS[DEFAULT_QUALITY]['model']
+    pool = session_pools.get(model_name)
+    if pool is None:
+        with session_pools_lock:
+            pool = session_pools.get(model_name)
+            if pool is None:
+                pool = session_pools[model_name] = SessionPool(
+                    model_name,
+                    size=SESSION_POOL_SIZE,
+                    intra_op_threads=SESSION_INTRA_OP_THREADS,
+                    inter_op_threads=SESSION_INTER_OP_THREADS,
+                )
+    return pool
+
+def get_session(model_name=None):
+    """풀의 세션 하나 (워밍업/벤치마크용, 요청 처리는 get_session_pool().session()으로 빌려 씀)"""
+    return get_session_pool(model_name).get_any()
+
+# 모델 사전 로딩 모드 (REMOVE_BG_PRELOAD)
+#   off(기본): 첫 요청 시 lazy load
+#   sync: 서버 시작 전에 세션 로딩 + 더미 추론 (gunicorn은 gunicorn.conf.py에서 워커마다 실행)
+#   background: 서버는 바로 시작하고 백그라운드에서 워밍업 (준비 전까지 헬스 체크 503)
+REMOVE_BG_PRELOAD = os.environ.get('REMOVE_BG_PRELOAD', 'off').lower()
+
+def infer_masks(rgb, quality):
+    """티어 모델 추론 + 알파 정제 → (raw_mask, alpha_final, box, 단계별 시간)
+    
+    추론 워커 프로세스 또는 현재 프로세스에서 실행된다.
+    """
+    tier = QUALITY_TIERS[quality]
+    timer = StageTimer()
+    with timer.stage('inference'), get_session_pool(tier['model']).session() as session:
+        raw_mask = predict_mask(rgb, session)
+    with timer.stage('refine_alpha_mask'):
+        alpha_final, box = refine_cutout_alpha(raw_mask, tier['refine'], rgb, tier['matting'])
+    return raw_mask, alpha_final, box, timer.stages
+
+def run_triage(image, timer=None):
+    """썸네일 트리아지 → (경로, 세부 정보). 비활성화면 항상 model"""
+    if not TRIAGE_ENABLED:
+        return 'model', {}
+    with timed(timer, 'triage'):
+        path, info = triage(image)
+    triage_stats.record(path)
+    triage_results.inc(path=path)
+    return path, info
+
+def estimate_request_bytes(source, tier, width, height):
+    """헤더 정보 (원본 크기, 형식)/티어/출력 캔버스 → remove_bg 요청 하나의 최대 메모리 추정치 (바이트)
+    
+    JPEG는 DCT 축소 디코드 크기 기준 (open_image가 전체 해상도 비트맵을 만들지 않음)
+    """
+    source_w, source_h = decoded_size(*source, tier['max_dimension'])
+    scale = min(1.0, tier['max_dimension'] / max(source_w, source_h, 1))
+    working_pixels = int(source_w * scale) * int(source_h * scale)
+    return (ADMISSION_BASE_BYTES + source_w * source_h * ADMISSION_SOURCE_BPP
+            + working_pixels * tier['bytes_per_pixel'] + width * height * ADMISSION_CANVAS_BPP)
+
+def estimate_video_bytes(width, tier):
+    """영상 폭/티어 → 영상 배경 제거 요청의 최대 메모리 추정치 (프레임은 한 장씩만 메모리에 있음)"""
+    frame_pixels = width * (width * 16 // 9)
+    return (ADMISSION_BASE_BYTES + ADMISSION_VIDEO_PROCESS_BYTES
+            + frame_pixels * (tier['bytes_per_pixel'] + ADMISSION_CANVAS_BPP))
+
+def admission_rejected_response(e):
+    """승인 거절 응답: 대기열 초과/대기 시간 초과는 429 + Retry-After, 예산보다 큰 요청은 413 (재시도해도 실패)"""
+    admission_rejected.inc(reason=e.reason)
+    if e.reason == 'too_large':
+        return jsonify({'error': 'Request too large for memory budget', 'message': str(e)}), 413
+    response = jsonify({'error': 'Server busy', 'message': str(e), 'reason': e.reason})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
+
+def triage_masks(image, rgb, path, info):
+    """빠른 경로 마스크 → (raw_mask, alpha_final)"""
+    alpha = fast_path_mask(image, rgb, path, info)
+    if path == 'alpha':
+        # 이미 잘라낸 이미지는 원본 색을 그대로 두고 알파만 사용 (naive_cutout 감쇠 없음)
+        return np.full_like(alpha, 255), alpha
+    return alpha, alpha
+
+def warm_worker():
+    """추론 워커 프로세스 초기화: 기본 티어 모델 로딩 + 더미 추론"""
+    if not ModelWarmup(lambda: get_session_pool().fill()).warm():
+        raise RuntimeError('Model warm-up failed')
+
+# 추론 워커 프로세스 (REMOVE_BG_INFERENCE_WORKERS > 0이면 추론/정제를 별도 프로세스에서 실행)
+# 워커는 REMOVE_BG_WORKER_MAX_TASKS번 처리하거나 RSS가 REMOVE_BG_WORKER_MAX_RSS_MB를 넘으면 교체
+INFERENCE_WORKERS = int(os.environ.get('REMOVE_BG_INFERENCE_WORKERS', 0))
+inference_pool = InferenceWorkerPool(
+    infer_masks,
+    num_workers=INFERENCE_WORKERS,
+    max_tasks_per_worker=int(os.environ.get('REMOVE_BG_WORKER_MAX_TASKS', 100)),
+    max_rss_mb=int(os.environ.get('REMOVE_BG_WORKER_MAX_RSS_MB', 1500)),
+    task_timeout=int(os.environ.get('REMOVE_BG_WORKER_TIMEOUT', 120)),
+    initializer=warm_worker,
+) if INFERENCE_WORKERS > 0 else None
+
+def run_inference(rgb, quality):
+    """추론 + 정제 실행 (워커 풀이 있으면 워커 프로세스에서)"""
+    if inference_pool is not None:
+        return inference_pool.run(rgb, quality)
+    return infer_masks(rgb, quality)
+
+# 워밍업은 기본 티어 모델만 (워커 모드에서는 웹 프로세스에 모델을 올리지 않고 워커를 미리 띄움)
+if inference_pool is not None:
+    model_warmup = ModelWarmup(inference_pool.start)
+else:
+    model_warmup = ModelWarmup(lambda: get_session_pool().fill())
+
+def prefetch_model(model_name=None):
+    """모델 파일만 미리 다운로드/확인 (fork 전 master에서 호출해도 안전)"""
+    from rembg.sessions import sessions_class
+    model_name = model_name or QUALITY_TIERS[DEFAULT_QUALITY]['model']
+    for session_class in sessions_class:
+        if session_class.name() == model_name:
+            session_class.download_models()
+            return
+    raise ValueError(f"Unknown model: {model_name}")
+
+def warm_up():
+    """REMOVE_BG_PRELOAD 설정에 따라 모델 워밍업 시작"""
+    if REMOVE_BG_PRELOAD == 'sync':
+        model_warmup.warm()
+    elif REMOVE_BG_PRELOAD == 'background':
+        model_warmup.warm_in_background()
 
 def refine_alpha_mask(alpha):
-    """알파 마스크 정제: morphology + connected components (상단 텍스트 제거)"""
-    try:
-        alpha_uint8 = (alpha * 255).astype(np.uint8)
-        h, w = alpha_uint8.shape
-        
-        # 1. Morphology로 노이즈 제거
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-        alpha_cleaned = cv2.morphologyEx(alpha_uint8, cv2.MORPH_OPEN, kernel, iterations=1)
-        alpha_cleaned = cv2.morphologyEx(alpha_cleaned, cv2.MORPH_CLOSE, kernel, iterations=1)
-        
-        # 2. Connected components로 상단 텍스트 제거 (메모리 효율적으로)
-        # 상단 22% 영역에서만 작은 컴포넌트 제거
-        top_region_height = int(h * 0.22)
-        if top_region_height > 0:
-            try:
-                # 이진 마스크 생성 (알파 > 128인 영역)
-                binary = (alpha_cleaned > 128).astype(np.uint8) * 255
-                
-                # Connected components 분석 (최소 면적만 계산)
-                num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    """알파 마스크 정제: morphology + connected components (상단 텍스트 제거)
+    
+    기존 필터와 같은 결과를 원본 해상도에서 계산한다. 컴포넌트 필터링은 라벨 LUT 한 번으로 처리하고
+    (제거할 컴포넌트가 없으면 LUT도 생략), 바운딩 박스도 유지된 컴포넌트 통계에서 함께 계산해 반환한다.
+    축소 해상도에서 라벨링하면 작은/가는 컴포넌트 판정이 달라지므로 축소하지 않는다.
+    반환: (정제된 uint8 알파, 알파 > 0 영역 (xmin, ymin, xmax, ymax) 또는 None)
+    """
+    alpha_uint8 = alpha if alpha.dtype == np.uint8 else (alpha * 255).astype(np.uint8)
+    h, w = alpha_uint8.shape
+    
+    # 1. Morphology로 노이즈 제거
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    alpha_cleaned = cv2.morphologyEx(alpha_uint8, cv2.MORPH_OPEN, kernel, iterations=1)
+    alpha_cleaned = cv2.morphologyEx(alpha_cleaned, cv2.MORPH_CLOSE, kernel, iterations=1)
+    
+    # 2. Connected components로 상단 텍스트 제거 (상단 22% 영역의 작은 컴포넌트)
+    box = None
+    top_region_height = int(h * 0.22)
+    if top_region_height > 0:
+        try:
+            _, binary = cv2.threshold(alpha_cleaned, 128, 1, cv2.THRESH_BINARY)
+            num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(binary, connectivity=8)
+            
+            if num_labels > 1:  # 배경(0) 외에 컴포넌트가 있으면
+                # 라벨별 유지 여부 (배경 0은 제거, 가장 큰 컴포넌트는 항상 유지)
+                areas = stats[:, cv2.CC_STAT_AREA]
+                keep = (centroids[:, 1].astype(np.int64) >= top_region_height) | (areas >= w * h * 0.05)
+                keep[0] = False
+                keep[1 + int(np.argmax(areas[1:]))] = True
+                if keep[1:].all():
+                    # 제거할 컴포넌트 없음: 어떤 컴포넌트에도 속하지 않는 알파 <= 128 픽셀만 0으로
+                    _, alpha_cleaned = cv2.threshold(alpha_cleaned, 128, 255, cv2.THRESH_TOZERO)
+                else:
+                    lut = np.where(keep, 255, 0).astype(np.uint8)
+                    alpha_cleaned = cv2.bitwise_and(alpha_cleaned, lut[labels])
                 
-                if num_labels > 1:  # 배경(0) 외에 컴포넌트가 있으면
-                    # 전체 이미지에서 가장 큰 컴포넌트 찾기
-                    # stats 구조: [left, top, width, height, area]
-                    CC_STAT_AREA = 4
-                    largest_area = 0
-                    largest_label = 1
-                    for label in range(1, num_labels):
-                        area = stats[label, CC_STAT_AREA]
-                        if area > largest_area:
-                            largest_area = area
-                            largest_label = label
-                    
-                    # 상단 영역의 작은 컴포넌트 제거
-                    mask = np.zeros_like(alpha_cleaned, dtype=np.uint8)
-                    for label in range(1, num_labels):
-                        if label == largest_label:
-                            # 가장 큰 컴포넌트는 항상 유지
-                            mask[labels == label] = 255
-                        else:
-                            # 상단 영역에 있는 작은 컴포넌트만 제거
-                            y_center = int(centroids[label, 1])
-                            area = stats[label, CC_STAT_AREA]
-                            if y_center < top_region_height and area < (w * h * 0.05):  # 상단 + 작은 면적
-                                continue  # 제거
-                            else:
-                                mask[labels == label] = 255
-                    
-                    # 마스크 적용
-                    alpha_cleaned = np.where(mask > 0, alpha_cleaned, 0)
-            except Exception as e:
-                print(f"Connected components 실패, morphology만 사용: {str(e)}")
-        
-        # 3. Gaussian blur (가볍게)
-        alpha_cleaned = cv2.GaussianBlur(alpha_cleaned, (3, 3), 0.5)
-        
-        return alpha_cleaned.astype(np.float32) / 255.0
-    except Exception as e:
-        print(f"refine_alpha_mask 실패, 원본 사용: {str(e)}")
-        return alpha
-
-def generate_trimap(alpha, fg_thresh=230, bg_thresh=15, kernel_size=8):
-    """Trimap 생성 (pymatting용) - 현재 비활성화"""
-    # 메모리 절약을 위해 간단한 버전만
-    alpha_uint8 = alpha if isinstance(alpha, np.ndarray) and alpha.dtype == np.uint8 else (alpha * 255).astype(np.uint8)
-    fg = alpha_uint8 > fg_thresh
-    bg = alpha_uint8 < bg_thresh
-    unknown = ~(fg | bg)
+                # 유지된 컴포넌트 통계로 바운딩 박스 근사 (blur 여유분 포함)
+                kept = stats[keep]
+                margin = 2
+                box = (
+                    max(0, int(kept[:, cv2.CC_STAT_LEFT].min()) - margin),
+                    max(0, int(kept[:, cv2.CC_STAT_TOP].min()) - margin),
+                    min(w - 1, int((kept[:, cv2.CC_STAT_LEFT] + kept[:, cv2.CC_STAT_WIDTH]).max()) + margin),
+                    min(h - 1, int((kept[:, cv2.CC_STAT_TOP] + kept[:, cv2.CC_STAT_HEIGHT]).max()) + margin),
+                )
+        except Exception as e:
+            print(f"Connected components 실패, morphology만 사용: {str(e)}")
+    
+    # 3. Gaussian blur (가볍게)
+    alpha_cleaned = cv2.GaussianBlur(alpha_cleaned, (3, 3), 0.5)
+    
+    # 근사 박스 안에서만 정확한 바운딩 박스 탐색 (전체 프레임 스캔 생략)
+    if box is None:
+        return alpha_cleaned, bounding_box(alpha_cleaned)
+    xmin, ymin, xmax, ymax = box
+    inner = bounding_box(alpha_cleaned[ymin:ymax + 1, xmin:xmax + 1])
+    if inner is None:
+        return alpha_cleaned, None
+    return alpha_cleaned, (inner[0] + xmin, inner[1] + ymin, inner[2] + xmin, inner[3] + ymin)
+
+def refine_cutout_alpha(raw_mask, refine=True, rgb=None, matting='off'):
+    """u2net 원본 마스크(uint8) → (최종 알파(uint8), 바운딩 박스). 추론 다음으로 비싼 단계
+    
+    matting이 off가 아니고 rgb가 주어지면 정제된 알파의 경계 띠만 매팅으로 다시 계산한다.
+    """
+    if not refine:
+        # fast 티어: 정제 생략, 모델 마스크 그대로 사용
+        return raw_mask, bounding_box(raw_mask)
     
-    trimap = np.full(alpha_uint8.shape, 128, dtype=np.uint8)
-    trimap[fg] = 255
-    trimap[bg] = 0
+    # 알파 마스크 정제 (간단한 버전만)
+    try:
+        alpha_final, box = refine_alpha_mask(raw_mask)
+    except Exception as e:
+        # 정제 실패 시 원본 알파 사용
+        print(f"알파 정제 실패, 원본 사용: {str(e)}")
+        alpha_final, box = raw_mask.copy(), bounding_box(raw_mask)
     
-    # Dilation은 메모리 절약을 위해 작은 커널만
+    # 경계 띠 매팅 (unknown 띠를 덮는 타일만 계산, 실패 시 정제된 알파 사용)
+    if matting != 'off' and rgb is not None and box is not None:
+        try:
+            alpha_final = refine_matte(rgb, alpha_final, matting)
+            # 매팅은 경계 띠(기존 박스 + 띠 폭) 안에서만 알파를 바꾸므로 그 안에서 박스 재계산
+            xmin, ymin, xmax, ymax = pad_box(box, 32, alpha_final.shape)
+            inner = bounding_box(alpha_final[ymin:ymax + 1, xmin:xmax + 1])
+            box = None if inner is None else (inner[0] + xmin, inner[1] + ymin, inner[2] + xmin, inner[3] + ymin)
+        except Exception as e:
+            print(f"매팅 실패, 정제된 알파 사용: {str(e)}")
+    return alpha_final, box
+
+def encode_masks(raw_mask, alpha_final):
+    """마스크 캐시용 압축 인코딩: 원본 마스크(L) + 정제 알파(A)를 LA PNG 하나로"""
+    packed = np.dstack([raw_mask, alpha_final])
+    output = BytesIO()
+    Image.fromarray(packed, 'LA').save(output, format='PNG', compress_level=6)
+    return output.getvalue()
+
+def decode_masks(data):
+    """encode_masks의 역변환 → (raw_mask, alpha_final)"""
+    packed = np.array(Image.open(BytesIO(data)).convert('LA'))
+    return packed[..., 0], packed[..., 1]
+
+def int_param(form, name, default):
+    """정수 폼 파라미터 (정수가 아니면 파라미터 이름이 담긴 ValueError)"""
+    value = form.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer') from None
+
+def parse_background(value):
+    """배경색 파라미터 ('transparent' 또는 '#RRGGBB') → RGBA 튜플"""
+    if not value or value == 'transparent':
+        return (255, 255, 255, 0)
+    color_hex = value.lstrip('#')
     try:
-        trimap = dilation(trimap, disk(min(kernel_size, 5)))
-    except:
-        pass
-    return trimap
+        if len(color_hex) != 6:
+            raise ValueError
+        return (int(color_hex[0:2], 16), int(color_hex[2:4], 16), int(color_hex[4:6], 16), 255)
+    except ValueError:
+        raise ValueError(f'Invalid background color: {value} (use #RRGGBB or transparent)') from None
+
+def parse_quality(form):
+    """quality 파라미터 (fast/balanced/best) → (티어 이름, 티어 설정)"""
+    quality = form.get('quality') or DEFAULT_QUALITY
+    if quality not in QUALITY_TIERS:
+        raise ValueError(f"Invalid quality: {quality} (choose from {', '.join(QUALITY_TIERS)})")
+    return quality, QUALITY_TIERS[quality]
+
+def parse_render_options(form):
+    """렌더링 파라미터 파싱: width, height, padding(px, 기본 자동), background('#RRGGBB' 또는 투명)"""
+    width = int_param(form, 'width', 600)
+    height = int_param(form, 'height', 600)
+    if width <= 0 or height <= 0:
+        raise ValueError('width and height must be positive')
+    padding = int_param(form, 'padding', None)
+    if padding is not None and padding < 0:
+        raise ValueError('padding must not be negative')
+    background = parse_background(form.get('background'))
+    return width, height, padding, background
+
+def parse_output_options(form, accept_mimetypes=None):
+    """출력 파라미터 파싱: format(png/webp/webp_lossless, 없으면 Accept 협상), compression, webp_quality, crop"""
+    image_format = form.get('format')
+    if not image_format:
+        # */*만 보낸 클라이언트는 PNG, image/webp를 명시한 클라이언트(브라우저 등)만 WebP
+        accepts_webp = accept_mimetypes is not None and any(
+            value == 'image/webp' and q > 0 for value, q in accept_mimetypes)
+        image_format = ACCEPT_WEBP_FORMAT if accepts_webp else 'png'
+    if image_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Invalid format: {image_format} (choose from {', '.join(OUTPUT_FORMATS)})")
+    compression = int_param(form, 'compression', 6)
+    webp_quality = int_param(form, 'webp_quality', 80)
+    if not 0 <= compression <= 9:
+        raise ValueError('compression must be between 0 and 9')
+    if not 0 <= webp_quality <= 100:
+        raise ValueError('webp_quality must be between 0 and 100')
+    crop = form.get('crop', '').lower() in ('1', 'true', 'yes')
+    return {'format': image_format, 'compression': compression, 'webp_quality': webp_quality, 'crop': crop}
+
+def parse_video_options(form):
+    """영상 파라미터 파싱: width, fps, keyframe_interval, diff_threshold, webp_quality (범위 밖이면 ValueError)"""
+    options = {
+        'width': int(form.get('width') or VIDEO_DEFAULT_WIDTH),
+        'fps': int(form.get('fps') or VIDEO_DEFAULT_FPS),
+        'keyframe_interval': int(form.get('keyframe_interval') or VIDEO_KEYFRAME_INTERVAL),
+        'diff_threshold': float(form.get('diff_threshold') or VIDEO_DIFF_THRESHOLD),
+        'webp_quality': int(form.get('webp_quality') or 75),
+    }
+    if not 16 <= options['width'] <= VIDEO_MAX_WIDTH:
+        raise ValueError(f'width must be between 16 and {VIDEO_MAX_WIDTH}')
+    if not 1 <= options['fps'] <= VIDEO_MAX_FPS:
+        raise ValueError(f'fps must be between 1 and {VIDEO_MAX_FPS}')
+    if options['keyframe_interval'] < 1:
+        raise ValueError('keyframe_interval must be at least 1')
+    if options['diff_threshold'] < 0:
+        raise ValueError('diff_threshold must not be negative')
+    if not 0 <= options['webp_quality'] <= 100:
+        raise ValueError('webp_quality must be between 0 and 100')
+    return options
+
+def output_cache_params(output):
+    """결과 캐시 키에 넣을 출력 파라미터 (해당 형식에 영향 없는 값은 제외)"""
+    level = output['compression'] if output['format'] == 'png' else output['webp_quality'] if output['format'] == 'webp' else None
+    return output['format'], level, output['crop']
+
+def render_cutout(rgb, raw_mask, alpha_final, width, height, padding=None, background=None, box=None, timer=None,
+                  output=None):
+    """마스크 적용 → 크롭 → 리사이즈 → 중앙 정렬 후 인코딩 (추론 없이 저렴한 합성 단계만)
+    
+    반환: (인코딩된 BytesIO, crop 모드면 배치 위치 {'x', 'y', 'canvas'} 아니면 None)
+    """
+    output = output or {'format': 'png', 'compression': 6, 'webp_quality': 80, 'crop': False}
+    placement = None
+    with timed(timer, 'crop_resize'):
+        if output['crop']:
+            new_img, (x, y) = place_cutout(rgb, raw_mask, alpha_final, width, height, padding, box)
+            if background and background[3] == 255:
+                # 불투명 배경색은 크롭 영역에만 적용
+                canvas = Image.new('RGBA', new_img.size, background)
+                canvas.paste(new_img, (0, 0), new_img)
+                new_img = canvas
+            placement = {'x': x, 'y': y, 'canvas': (width, height)}
+        else:
+            new_img = compose_cutout(rgb, raw_mask, alpha_final, width, height, padding, background, box)
+    
+    # 파이프라인 전체에서 인코딩은 여기 한 번뿐
+    with timed(timer, f"{output['format']}_encode"):
+        encoded = encode_image(new_img, output['format'], output['compression'], output['webp_quality'])
+    return encoded, placement
+
+def compose_cutout(rgb, raw_mask, alpha_final, width, height, padding=None, background=None, box=None):
+    """크롭/리사이즈/중앙 정렬된 RGBA 캔버스 (PIL Image)"""
+    result_image, (paste_x, paste_y) = place_cutout(rgb, raw_mask, alpha_final, width, height, padding, box)
+    new_img = Image.new("RGBA", (width, height), background or (255, 255, 255, 0))
+    new_img.paste(result_image, (paste_x, paste_y), result_image)
+    return new_img
+
+def place_cutout(rgb, raw_mask, alpha_final, width, height, padding=None, box=None):
+    """크롭/리사이즈된 RGBA 피사체 (PIL Image)와 width x height 캔버스 중앙 배치 위치 (x, y)"""
+    h, w = alpha_final.shape
+    
+    # 바운딩 박스 (알파 > 0인 영역, 정제 단계에서 계산된 값이 있으면 재사용)
+    if box is None:
+        box = bounding_box(alpha_final)
+    # 패딩 기본: 3% 또는 최소 20px
+    if padding is None:
+        padding = max(20, int(min(w, h) * 0.03))
+    box = pad_box(box, padding, alpha_final.shape)
+    xmin, ymin, xmax, ymax = box if box else (0, 0, w - 1, h - 1)
+    
+    # 크롭 영역(뷰)만 합성 후 최종 알파 적용
+    region = (slice(ymin, ymax + 1), slice(xmin, xmax + 1))
+    rgba = naive_cutout(rgb[region], raw_mask[region])
+    rgba[..., 3] = alpha_final[region]
+    result_image = Image.fromarray(rgba, 'RGBA')
+    
+    # 리사이징: thumbnail 방식 (비율 유지, 큰 쪽만 축소)
+    result_w, result_h = result_image.size
+    if result_w > width or result_h > height:
+        scale = min(width / result_w, height / result_h)
+        new_w = int(result_w * scale)
+        new_h = int(result_h * scale)
+        result_image = result_image.resize((new_w, new_h), Image.Resampling.LANCZOS)
+    else:
+        new_w, new_h = result_w, result_h
+    
+    # 중앙 정렬 위치
+    return result_image, ((width - new_w) // 2, (height - new_h) // 2)
+
+def pack_result(encoded, placement):
+    """결과 캐시 항목: crop 모드면 배치 위치 JSON 한 줄 + 이미지 바이트, 아니면 이미지 바이트 그대로"""
+    if placement is None:
+        return encoded
+    return json.dumps(placement).encode() + b'\n' + encoded
+
+def unpack_result(data, crop):
+    """pack_result의 역변환 → (이미지 바이트, 배치 위치 또는 None)"""
+    if not crop:
+        return data, None
+    header, _, encoded = data.partition(b'\n')
+    return encoded, json.loads(header)
+
+def cutout_response(encoded, output, placement, cache_status):
+    """인코딩 결과 → 응답 (crop 모드면 배치 위치 헤더 포함)"""
+    response = send_file(BytesIO(encoded), mimetype=OUTPUT_FORMATS[output['format']]['mimetype'], as_attachment=False)
+    response.headers['X-Cache'] = cache_status
+    # format 파라미터가 없으면 Accept 헤더로 형식이 달라지므로 중간 캐시가 구분하도록
+    response.headers['Vary'] = 'Accept'
+    if placement is not None:
+        response.headers['X-Cutout-Offset-X'] = str(placement['x'])
+        response.headers['X-Cutout-Offset-Y'] = str(placement['y'])
+        response.headers['X-Cutout-Canvas'] = f"{placement['canvas'][0]}x{placement['canvas'][1]}"
+    return response
+
+def get_cached_masks(content_key, rgb):
+    """마스크 캐시 조회 (작업 해상도가 다르면 미스로 처리)"""
+    data = mask_cache.get(content_key)
+    if data is None:
+        return None
+    raw_mask, alpha_final = decode_masks(data)
+    if raw_mask.shape != rgb.shape[:2]:
+        return None
+    return raw_mask, alpha_final
 
 @app.route('/api/health', methods=['GET', 'OPTIONS'])
 def health_check():
@@ -150,9 +601,26 @@ def health_check():
         return response, 200
     
     try:
-        # 모델 로드 시도 안 함, 단순히 서버가 살아있는지만 확인
-        response = jsonify({'status': 'ok', 'message': 'Backend is running'})
-        return response, 200
+        # 모델 로드 시도 안 함, 시작 시 워밍업 결과(캐시된 상태)로 준비 여부만 보고
+        ready = model_warmup.ready or REMOVE_BG_PRELOAD == 'off'
+        if ready:
+            status = 'ok'
+        else:
+            status = 'error' if model_warmup.error else 'starting'
+        response = jsonify({
+            'status': status,
+            'ready': ready,
+            'message': 'Backend is running',
+            'model': model_warmup.state(),
+            'sessions': {name: pool.stats() for name, pool in list(session_pools.items())},
+            'inference_workers': inference_pool.stats() if inference_pool is not None else None,
+            'cache': result_cache.stats(),
+            'mask_cache': mask_cache.stats(),
+            'triage': triage_stats.stats(),
+            'admission': admission.stats(),
+            'scratch': scratch_space.stats()
+        })
+        return response, 200 if ready else 503
     except Exception as e:
         print(f"Health check error: {str(e)}")
         response = jsonify({'status': 'error', 'message': str(e)})
@@ -175,113 +643,262 @@ def remove_bg():
         if file.filename == '':
             return {'error': 'No file selected'}, 400
         
-        # width, height 파라미터 가져오기
-        width = int(request.form.get('width', 600))
-        height = int(request.form.get('height', 600))
-        
-        # 이미지 로드
-        image = Image.open(file.stream)
-        original_size = image.size
+        # 품질 티어 + 렌더링 파라미터 (width, height, padding, background) + 출력 인코딩
+        try:
+            quality, tier = parse_quality(request.form)
+            output_options = parse_output_options(request.form, request.accept_mimetypes)
+            width, height, padding, background = parse_render_options(request.form)
+        except ValueError as e:
+            return {'error': str(e)}, 400
         
-        # 메모리 절약: 큰 이미지는 미리 리사이즈 (최대 2000px)
-        max_dimension = 2000
-        if max(original_size) > max_dimension:
-            scale = max_dimension / max(original_size)
-            new_size = (int(original_size[0] * scale), int(original_size[1] * scale))
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
-            original_size = new_size
-            print(f"이미지 리사이즈: {original_size} (메모리 절약)")
+        # 캐시 조회 (업로드 바이트 해시 + 티어 + 렌더링 파라미터 + 출력 인코딩)
+        data = file.read()
+        cache_key = make_cache_key(data, quality, width, height, padding, background,
+                                   *output_cache_params(output_options))
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            remove_bg_results.inc(cache='result')
+            encoded, placement = unpack_result(cached, output_options['crop'])
+            return cutout_response(encoded, output_options, placement, 'HIT')
         
-        # 배경 제거 (투명 배경 PNG 반환)
-        # 이미지를 바이트로 변환
-        img_bytes = BytesIO()
-        image.convert("RGB").save(img_bytes, format="PNG")
-        img_bytes.seek(0)
+        # 메모리 예산 승인 (헤더의 크기로 추정, 자리가 없으면 대기열에서 대기 / 대기열이 가득 차면 429)
+        estimated_bytes = estimate_request_bytes(peek_image(data), tier, width, height)
+        with admission.admit(estimated_bytes):
+            timer = StageTimer()
+            # 이미지 디코드 1회 (큰 이미지는 티어별 최대 해상도로 리사이즈) → 썸네일 트리아지 → RGB ndarray
+            image = open_image(data, tier['max_dimension'], timer)
+            path, info = run_triage(image, timer)
+            rgb = to_rgb_array(image, timer)
         
-        # rembg로 배경 제거 (투명 배경) - lazy load 세션 사용
-        session = get_session()
-        result_bytes = remove(
-            img_bytes.getvalue(),
-            session=session,
-            alpha_matting=False
-        )
+            # 마스크 캐시 조회 (같은 이미지 + 같은 티어면 추론/정제 생략, 합성만 다시 수행)
+            content_key = make_cache_key(data, quality, tier['matting'])
+            masks = get_cached_masks(content_key, rgb) if path == 'model' else None
+            if path != 'model':
+                # 트리아지 빠른 경로: 세션/마스크 캐시를 쓰지 않음
+                with timer.stage('triage_mask'):
+                    raw_mask, alpha_final = triage_masks(image, rgb, path, info)
+                box = None
+            elif masks is None:
+                # 티어 모델 추론 + 정제 (PNG 왕복 없이 ndarray에서 직접, 워커 모드면 별도 프로세스)
+                raw_mask, alpha_final, box, stages = run_inference(rgb, quality)
+                for stage, seconds in stages.items():
+                    timer.stages[stage] = timer.stages.get(stage, 0.0) + seconds
+                mask_cache.put(content_key, encode_masks(raw_mask, alpha_final))
+                remove_bg_results.inc(cache='miss')
+            else:
+                raw_mask, alpha_final = masks
+                box = None
+                remove_bg_results.inc(cache='mask')
         
-        # 결과 이미지 로드
-        result_image = Image.open(BytesIO(result_bytes)).convert("RGBA")
-        np_img = np.array(result_image)
-        alpha = np_img[..., 3].astype(np.float32) / 255.0
+            # 크롭/리사이즈/중앙 정렬
+            output, placement = render_cutout(rgb, raw_mask, alpha_final, width, height, padding, background, box, timer,
+                                              output_options)
+            encoded = output.getvalue()
+            result_cache.put(cache_key, pack_result(encoded, placement))
+            for stage, seconds in timer.stages.items():
+                stage_seconds.observe(seconds, stage=stage, quality=quality)
         
-        # 알파 마스크 정제 (간단한 버전만)
-        try:
-            alpha_refined = refine_alpha_mask(alpha)
-            alpha_final = (alpha_refined * 255).astype(np.uint8)
-        except Exception as e:
-            # 정제 실패 시 원본 알파 사용
-            print(f"알파 정제 실패, 원본 사용: {str(e)}")
-            alpha_final = (alpha * 255).astype(np.uint8)
+            return cutout_response(encoded, output_options, placement, 'MISS')
         
-        # pymatting은 메모리 부족으로 인한 크래시 방지를 위해 비활성화
-        # 필요시 주석 해제 (메모리 여유 있을 때만)
-        # try:
-        #     trimap = generate_trimap(alpha_final)
-        #     alpha_matted = estimate_alpha_cf(np_img[..., :3] / 255.0, trimap / 255.0)
-        #     alpha_final = (alpha_matted * 255).astype(np.uint8)
-        # except Exception as e:
-        #     print(f"Pymatting 실패, 정제된 알파 사용: {str(e)}")
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    except WorkerCrashed as e:
+        # 워커가 죽어도 웹 프로세스는 유지 (워커는 다음 요청 때 새로 생성)
+        print(f"ERROR: 추론 워커 실패: {str(e)}")
+        response = jsonify({'error': 'Inference worker failed', 'message': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    except Exception as e:
+        error_msg = f"배경 제거 실패: {str(e)}"
+        error_trace = traceback.format_exc()
+        print(f"ERROR: {error_msg}\n{error_trace}")
+        # 에러 메시지는 간단하게, 상세는 서버 로그에만
+        response = jsonify({'error': 'Background removal failed', 'message': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 500
+
+@app.route('/api/remove_bg_batch', methods=['POST', 'OPTIONS'])
+def remove_bg_batch():
+    """배치 배경 제거 API (여러 파일 → 배치 추론 → ZIP 한 번에 반환)"""
+    if request.method == 'OPTIONS':
+        response = jsonify({})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+        return response, 200
+    try:
+        files = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+        if not files:
+            return {'error': 'No file provided'}, 400
+        if len(files) > MAX_BATCH_FILES:
+            return {'error': f'Too many files (max {MAX_BATCH_FILES})'}, 400
         
-        # 최종 알파 마스크로 이미지 생성
-        np_img[..., 3] = alpha_final
-        result_image = Image.fromarray(np_img, 'RGBA')
+        try:
+            quality, tier = parse_quality(request.form)
+            output_options = parse_output_options(request.form, request.accept_mimetypes)
+            width, height, padding, background = parse_render_options(request.form)
+            batch_size = int_param(request.form, 'batch_size', DEFAULT_BATCH_SIZE)
+            if batch_size < 1:
+                raise ValueError('batch_size must be at least 1')
+        except ValueError as e:
+            return {'error': str(e)}, 400
         
-        # 바운딩 박스 계산 (알파 > 0인 영역)
-        mask = alpha_final > 0
-        if np.any(mask):
-            ys, xs = np.where(mask)
-            ymin, ymax = ys.min(), ys.max()
-            xmin, xmax = xs.min(), xs.max()
-            # 패딩 추가 (3% 또는 최소 20px)
-            padding = max(20, int(min(original_size) * 0.03))
-            xmin = max(0, xmin - padding)
-            ymin = max(0, ymin - padding)
-            xmax = min(original_size[0] - 1, xmax + padding)
-            ymax = min(original_size[1] - 1, ymax + padding)
-            
-            # 크롭
-            result_image = result_image.crop((xmin, ymin, xmax + 1, ymax + 1))
+        # 배치는 모든 이미지를 동시에 메모리에 두므로 파일별 추정치의 합으로 승인 (캔버스는 한 장씩 렌더링)
+        uploads = []
+        estimated_bytes = width * height * ADMISSION_CANVAS_BPP
+        for file in files:
+            data = file.read()
+            try:
+                source = peek_image(data)
+            except Exception as e:
+                return {'error': f'Invalid image: {file.filename}', 'message': str(e)}, 400
+            estimated_bytes += estimate_request_bytes(source, tier, 0, 0)
+            uploads.append(data)
         
-        # 리사이징: thumbnail 방식 (비율 유지, 큰 쪽만 축소)
-        result_w, result_h = result_image.size
-        if result_w > width or result_h > height:
-            scale = min(width / result_w, height / result_h)
-            new_w = int(result_w * scale)
-            new_h = int(result_h * scale)
-            result_image = result_image.resize((new_w, new_h), Image.Resampling.LANCZOS)
-        else:
-            new_w, new_h = result_w, result_h
+        with admission.admit(estimated_bytes):
+            # 디코드는 파일당 한 번, 트리아지 빠른 경로에 해당하면 마스크도 바로 계산
+            images = []
+            content_keys = []
+            masks = []
+            for file, data in zip(files, uploads):
+                try:
+                    image = open_image(data, tier['max_dimension'])
+                except Exception as e:
+                    return {'error': f'Invalid image: {file.filename}', 'message': str(e)}, 400
+                path, info = run_triage(image)
+                images.append(to_rgb_array(image))
+                content_keys.append(make_cache_key(data, quality, tier['matting']))
+                masks.append(triage_masks(image, images[-1], path, info) if path != 'model' else None)
         
-        # 중앙 정렬
-        new_img = Image.new("RGBA", (width, height), (255, 255, 255, 0))
-        paste_x = (width - new_w) // 2
-        paste_y = (height - new_h) // 2
-        new_img.paste(result_image, (paste_x, paste_y), result_image)
+            # 마스크 캐시에 없는 이미지만 배치 추론
+            masks = [m or get_cached_masks(key, image) for m, key, image in zip(masks, content_keys, images)]
+            pending = [i for i, m in enumerate(masks) if m is None]
+            if pending and inference_pool is not None:
+                # 워커 모드: 이미지별로 워커 프로세스에 분배
+                with ThreadPoolExecutor(max_workers=inference_pool.num_workers) as executor:
+                    results = list(executor.map(lambda i: run_inference(images[i], quality), pending))
+                for i, (mask, alpha_final, _, _) in zip(pending, results):
+                    mask_cache.put(content_keys[i], encode_masks(mask, alpha_final))
+                    masks[i] = (mask, alpha_final)
+            elif pending:
+                with get_session_pool(tier['model']).session() as session:
+                    predicted = predict_masks([images[i] for i in pending], session, batch_size=batch_size)
+                for i, mask in zip(pending, predicted):
+                    alpha_final, _ = refine_cutout_alpha(mask, tier['refine'], images[i], tier['matting'])
+                    mask_cache.put(content_keys[i], encode_masks(mask, alpha_final))
+                    masks[i] = (mask, alpha_final)
         
-        # PNG로 변환 (투명도 포함)
-        output = BytesIO()
-        new_img.save(output, format='PNG', optimize=False)
-        output.seek(0)
+            output = BytesIO()
+            used_names = set()
+            placements = {}
+            extension = OUTPUT_FORMATS[output_options['format']]['extension']
+            # PNG/WebP는 이미 압축되어 있으므로 ZIP은 무압축 저장
+            with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+                for index, (file, image, (raw_mask, alpha_final)) in enumerate(zip(files, images, masks)):
+                    stem = os.path.splitext(os.path.basename(file.filename))[0] or f'image_{index}'
+                    name = f'{stem}{extension}'
+                    if name in used_names:
+                        name = f'{stem}_{index}{extension}'
+                    used_names.add(name)
+                    rendered, placement = render_cutout(image, raw_mask, alpha_final, width, height, padding, background,
+                                                        output=output_options)
+                    archive.writestr(name, rendered.getvalue())
+                    if placement is not None:
+                        placements[name] = placement
+                # crop 모드: 파일별 배치 위치는 placements.json으로
+                if placements:
+                    archive.writestr('placements.json', json.dumps(placements, indent=2))
+            output.seek(0)
         
         return send_file(
             output,
-            mimetype='image/png',
-            as_attachment=False
+            mimetype='application/zip',
+            as_attachment=True,
+            download_name='remove_bg_results.zip'
         )
         
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
     except Exception as e:
-        error_msg = f"배경 제거 실패: {str(e)}"
+        error_msg = f"배치 배경 제거 실패: {str(e)}"
         error_trace = traceback.format_exc()
         print(f"ERROR: {error_msg}\n{error_trace}")
-        # 에러 메시지는 간단하게, 상세는 서버 로그에만
-        response = jsonify({'error': 'Background removal failed', 'message': str(e)})
+        response = jsonify({'error': 'Batch background removal failed', 'message': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 500
+
+@app.route('/api/remove_bg_video', methods=['POST', 'OPTIONS'])
+def remove_bg_video():
+    """영상 배경 제거 API (MP4 등 → 배경이 투명한 애니메이션 WebP)"""
+    if request.method == 'OPTIONS':
+        response = jsonify({})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+        return response, 200
+    try:
+        if 'file' not in request.files:
+            return {'error': 'No file provided'}, 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return {'error': 'No file selected'}, 400
+        
+        try:
+            quality, tier = parse_quality({'quality': request.form.get('quality') or VIDEO_QUALITY})
+            options = parse_video_options(request.form)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        
+        def infer_alpha(rgb):
+            return run_inference(rgb, quality)[1]
+        
+        masker = TemporalMasker(infer_alpha, options['keyframe_interval'], options['diff_threshold'])
+        # 영상은 프레임을 한 장씩만 메모리에 두므로 프레임 크기 + FFmpeg 프로세스 몫으로 승인
+        with admission.admit(estimate_video_bytes(options['width'], tier)):
+            scratch_job = scratch_space.job('video')
+            try:
+                # 업로드만 파일로 저장, 프레임은 디코더 → 마스크 → 인코더 파이프로만 흐름
+                scratch_job.reserve(request.content_length)
+                input_path = scratch_job.file(file.filename)
+                file.save(input_path)
+                output_name = os.path.splitext(os.path.basename(file.filename))[0] + '.webp'
+                output_path = scratch_job.file(f'cutout-{output_name}')
+                result = cutout_video(input_path, output_path, masker, VIDEO_FFMPEG_PATH, options['width'],
+                                      options['fps'], VIDEO_MAX_FRAMES, options['webp_quality'], VIDEO_TIMEOUT)
+                scratch_job.account()
+                output_file = open(output_path, 'rb')
+            finally:
+                scratch_job.close()
+                video_frames.inc(masker.inferred, mask='inferred')
+                video_frames.inc(masker.reused, mask='reused')
+        
+        stage_seconds.observe(result['mask_seconds'], stage='video_mask', quality=quality)
+        stage_seconds.observe(result['total_seconds'], stage='video_total', quality=quality)
+        print(f"영상 배경 제거: {result['frames']}프레임 중 {result['inferred']}프레임 추론 ({result['total_seconds']}s)")
+        
+        response = send_file(output_file, mimetype='image/webp', as_attachment=True, download_name=output_name)
+        response.content_length = os.fstat(output_file.fileno()).st_size
+        response.headers['X-Video-Frames'] = str(result['frames'])
+        response.headers['X-Video-Inferred-Frames'] = str(result['inferred'])
+        return response
+        
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    except ScratchQuotaExceeded as e:
+        response = jsonify({'error': 'Insufficient scratch space', 'message': str(e)})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    except WorkerCrashed as e:
+        print(f"ERROR: 추론 워커 실패: {str(e)}")
+        response = jsonify({'error': 'Inference worker failed', 'message': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    except Exception as e:
+        error_msg = f"영상 배경 제거 실패: {str(e)}"
+        error_trace = traceback.format_exc()
+        print(f"ERROR: {error_msg}\n{error_trace}")
+        response = jsonify({'error': 'Video background removal failed', 'message': str(e)})
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 500
 
@@ -290,7 +907,11 @@ if __name__ == '__main__':
     print("배경 제거 백엔드 서버 시작")
     print("=" * 50)
     print("서버 주소: http://localhost:5001")
-    print("API 엔드포인트: /api/remove_bg")
+    print("API 엔드포인트: /api/remove_bg, /api/remove_bg_batch, /api/remove_bg_video")
+    print(f"모델 사전 로딩: {REMOVE_BG_PRELOAD}")
     print("=" * 50)
+    # 디버그 리로더의 부모 프로세스에서는 워밍업 생략 (실제 서버 프로세스에서만)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_up()
     app.run(host='0.0.0.0', port=5001, debug=True)
 
@@ -0,0 +1,287 @@
+"""추론 전용 워커 프로세스 풀
+
+모델 추론/알파 정제를 웹 프로세스 밖에서 실행한다. 이미지/마스크는 pickle 대신 공유 메모리로 주고받고,
+워커는 N번 작업하거나 RSS 한도를 넘으면 스스로 종료해 새 프로세스로 교체된다 (메모리 증가 회수).
+큰 작업 하나가 워커를 OOM으로 죽여도 웹 프로세스는 WorkerCrashed 예외만 받는다.
+"""
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class WorkerCrashed(Exception):
+    """작업 중 워커 프로세스가 종료됨 (OOM kill, 타임아웃 등)"""
+
+
+def current_rss_bytes():
+    """현재 프로세스 RSS (Linux는 /proc, 그 외는 최대 RSS로 대체, 측정 불가면 0)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return 0
+
+
+def _attach(name):
+    """기존 공유 메모리 연결 (spawn 워커는 부모의 resource_tracker를 공유하므로 해제는 부모가 unlink로 담당)"""
+    return shared_memory.SharedMemory(name=name)
+
+
+def _worker_main(conn, func, initializer, max_tasks, max_rss_bytes):
+    """워커 루프: (입력 shm, shape, 출력 shm, args) 수신 → func(rgb, *args) → 마스크 2장을 출력 shm에 기록"""
+    try:
+        if initializer is not None:
+            initializer()
+        conn.send({'status': 'ready', 'rss': current_rss_bytes()})
+    except Exception as e:
+        conn.send({'status': 'error', 'error': f'initializer failed: {e}', 'retire': True})
+        return
+
+    tasks = 0
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+
+        in_name, shape, out_name, args = message
+        reply = {'status': 'ok'}
+        try:
+            shm_in = _attach(in_name)
+            shm_out = _attach(out_name)
+            try:
+                rgb = np.ndarray(shape, dtype=np.uint8, buffer=shm_in.buf)
+                raw_mask, alpha_final, box, stages = func(rgb, *args)
+                out = np.ndarray((2,) + tuple(shape[:2]), dtype=np.uint8, buffer=shm_out.buf)
+                out[0] = raw_mask
+                out[1] = alpha_final
+                reply['box'] = box
+                reply['stages'] = stages
+                del rgb, out
+            finally:
+                shm_in.close()
+                shm_out.close()
+        except Exception as e:
+            reply = {'status': 'error', 'error': str(e), 'traceback': traceback.format_exc()}
+
+        tasks += 1
+        reply['rss'] = current_rss_bytes()
+        reply['retire'] = tasks >= max_tasks or bool(max_rss_bytes and reply['rss'] > max_rss_bytes)
+        conn.send(reply)
+        if reply['retire']:
+            return
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.retired = False
+
+    def alive(self):
+        return not self.retired and self.process.is_alive()
+
+    def stop(self, timeout=5):
+        self.retired = True
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class InferenceWorkerPool:
+    """추론 워커 프로세스 풀 (필요할 때 생성, 작업 수/RSS 한도로 재활용)
+
+    func(rgb, *args)는 (raw_mask, alpha_final, box, stages)를 반환하는 모듈 수준 함수여야 한다.
+    """
+
+    def __init__(self, func, num_workers=1, max_tasks_per_worker=100, max_rss_mb=0, task_timeout=120,
+                 initializer=None, start_method='spawn'):
+        self.func = func
+        self.initializer = initializer
+        self.num_workers = max(1, int(num_workers))
+        self.max_tasks_per_worker = max(1, int(max_tasks_per_worker))
+        self.max_rss_bytes = int(max_rss_mb) * 1024 * 1024
+        self.task_timeout = task_timeout
+        self._context = multiprocessing.get_context(start_method)
+        self._idle = queue.LifoQueue()
+        self._workers = 0
+        self._lock = threading.Lock()
+        self.tasks = 0
+        self.recycled = 0
+        self.crashed = 0
+        # 워커별 마지막 RSS (요청 스레드와 stats()가 함께 접근하므로 _lock 안에서만 읽고 씀)
+        self.last_rss = {}
+
+    def _spawn(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.func, self.initializer, self.max_tasks_per_worker, self.max_rss_bytes),
+            name='inference-worker',
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        # 초기화(모델 로딩/워밍업) 완료까지 대기
+        try:
+            if not parent_conn.poll(self.task_timeout):
+                raise WorkerCrashed('Inference worker did not start in time')
+            reply = parent_conn.recv()
+        except (EOFError, OSError):
+            process.join(1)
+            reply = {'status': 'error', 'error': f'exit code {process.exitcode}'}
+        except WorkerCrashed:
+            worker.stop(timeout=0)
+            raise
+        if reply['status'] != 'ready':
+            worker.stop(timeout=0)
+            raise WorkerCrashed(f"Inference worker failed to start: {reply['error']}")
+        with self._lock:
+            self.last_rss[process.pid] = reply['rss']
+        print(f"추론 워커 시작 (pid {process.pid})")
+        return worker
+
+    def _acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                can_spawn = self._workers < self.num_workers
+                if can_spawn:
+                    self._workers += 1
+            if can_spawn:
+                try:
+                    return self._spawn()
+                except Exception:
+                    with self._lock:
+                        self._workers -= 1
+                    raise
+            # 모두 사용 중: 반납을 기다리되, 재활용으로 자리가 비면 다시 생성 시도
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    def _release(self, worker):
+        if worker.alive():
+            self._idle.put(worker)
+            return
+        # 재활용/비정상 종료된 워커는 정리하고 자리만 비움 (다음 요청 때 새로 생성)
+        worker.stop(timeout=1)
+        with self._lock:
+            self.last_rss.pop(worker.process.pid, None)
+            self._workers -= 1
+
+    def start(self):
+        """워커를 풀 크기만큼 미리 생성 (각 워커는 initializer로 워밍업 후 준비 완료)"""
+        spawned = []
+        while True:
+            with self._lock:
+                if self._workers >= self.num_workers:
+                    break
+                self._workers += 1
+            try:
+                spawned.append(self._spawn())
+            except Exception:
+                with self._lock:
+                    self._workers -= 1
+                raise
+        for worker in spawned:
+            self._idle.put(worker)
+
+    def run(self, rgb, *args):
+        """워커에서 func(rgb, *args) 실행 → (raw_mask, alpha_final, box, stages)"""
+        rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+        h, w = rgb.shape[:2]
+        shm_in = shared_memory.SharedMemory(create=True, size=max(1, rgb.nbytes))
+        shm_out = shared_memory.SharedMemory(create=True, size=max(1, 2 * h * w))
+        try:
+            np.ndarray(rgb.shape, dtype=np.uint8, buffer=shm_in.buf)[:] = rgb
+
+            worker = self._acquire()
+            try:
+                worker.conn.send((shm_in.name, rgb.shape, shm_out.name, args))
+                if not worker.conn.poll(self.task_timeout):
+                    worker.process.kill()
+                    raise WorkerCrashed(f'Inference timed out after {self.task_timeout}s')
+                reply = worker.conn.recv()
+            except (EOFError, OSError) as e:
+                worker.process.join(1)
+                worker.retired = True
+                with self._lock:
+                    self.crashed += 1
+                raise WorkerCrashed(f'Inference worker died (exit code {worker.process.exitcode})') from e
+            except WorkerCrashed:
+                worker.retired = True
+                with self._lock:
+                    self.crashed += 1
+                raise
+            else:
+                with self._lock:
+                    self.last_rss[worker.process.pid] = reply['rss']
+                    self.tasks += 1
+                    if reply['retire']:
+                        self.recycled += 1
+                if reply['retire']:
+                    worker.retired = True
+                    print(f"추론 워커 재활용 (pid {worker.process.pid}, RSS {reply['rss'] // (1024 * 1024)}MB)")
+            finally:
+                self._release(worker)
+
+            if reply['status'] != 'ok':
+                print(reply.get('traceback', ''))
+                raise RuntimeError(reply['error'])
+            masks = np.ndarray((2, h, w), dtype=np.uint8, buffer=shm_out.buf).copy()
+            return masks[0], masks[1], reply['box'], reply['stages']
+        finally:
+            shm_in.close()
+            shm_in.unlink()
+            shm_out.close()
+            shm_out.unlink()
+
+    def shutdown(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.stop()
+            with self._lock:
+                self._workers -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self._workers,
+                'max_workers': self.num_workers,
+                'idle': self._idle.qsize(),
+                'tasks': self.tasks,
+                'recycled': self.recycled,
+                'crashed': self.crashed,
+                'max_tasks_per_worker': self.max_tasks_per_worker,
+                'max_rss_mb': self.max_rss_bytes // (1024 * 1024),
+                'worker_rss_mb': {pid: rss // (1024 * 1024) for pid, rss in self.last_rss.items()},
+            }
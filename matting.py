@@ -0,0 +1,104 @@
+"""경계 띠(unknown band)만 다시 계산하는 알파 매팅
+
+closed-form 매팅(pymatting.estimate_alpha_cf)은 전체 픽셀에 대한 희소 선형계를 풀기 때문에
+이미지 면적에 비례해 메모리를 쓴다. 실제로 풀어야 하는 곳은 trimap의 unknown 띠뿐이므로
+띠를 덮는 타일만 여유분(margin)을 붙여 잘라서 타일별로 푼다 → 메모리는 타일 1개 크기,
+시간은 경계 길이에 비례. 더 가벼운 대안으로 guided filter(He et al.) 모드도 제공한다.
+"""
+import cv2
+import numpy as np
+
+# pymatting은 선택적 의존성 (없으면 closed_form 모드도 guided filter로 대체)
+try:
+    from pymatting import estimate_alpha_cf
+    PYMATTING_AVAILABLE = True
+except ImportError:
+    PYMATTING_AVAILABLE = False
+    print("Warning: pymatting not available, closed_form matting falls back to guided filter")
+
+# off: 매팅 생략, guided: guided filter(빠름), closed_form: 타일 단위 closed-form 매팅(느림, 고품질)
+MATTING_MODES = ('off', 'guided', 'closed_form')
+
+
+def generate_trimap(alpha, fg_thresh=240, bg_thresh=10, band=10):
+    """알파(uint8) → trimap (255 전경 / 0 배경 / 128 unknown). 확실한 영역을 band px 침식해 경계 띠를 만듦"""
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * band + 1, 2 * band + 1))
+    fg = cv2.erode((alpha >= fg_thresh).astype(np.uint8), kernel)
+    bg = cv2.erode((alpha <= bg_thresh).astype(np.uint8), kernel)
+    trimap = np.full(alpha.shape, 128, dtype=np.uint8)
+    trimap[fg > 0] = 255
+    trimap[bg > 0] = 0
+    return trimap
+
+
+def unknown_tiles(trimap, tile_size=256):
+    """unknown 픽셀이 있는 타일 목록 [(y0, y1, x0, x1), ...]"""
+    h, w = trimap.shape
+    ny, nx = -(-h // tile_size), -(-w // tile_size)
+    unknown = np.zeros((ny * tile_size, nx * tile_size), dtype=bool)
+    unknown[:h, :w] = trimap == 128
+    occupied = unknown.reshape(ny, tile_size, nx, tile_size).any(axis=(1, 3))
+    return [
+        (ty * tile_size, min(h, (ty + 1) * tile_size), tx * tile_size, min(w, (tx + 1) * tile_size))
+        for ty, tx in zip(*np.nonzero(occupied))
+    ]
+
+
+def guided_filter(guide, src, radius=6, eps=1e-4):
+    """회색조 guide(float32, 0~1)로 src(float32, 0~1)를 edge-preserving 평활화"""
+    size = (2 * radius + 1, 2 * radius + 1)
+
+    def box(x):
+        return cv2.boxFilter(x, -1, size, borderType=cv2.BORDER_REFLECT)
+
+    mean_i = box(guide)
+    mean_p = box(src)
+    var_i = box(guide * guide) - mean_i * mean_i
+    cov_ip = box(guide * src) - mean_i * mean_p
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+    return box(a) * guide + box(b)
+
+
+def _solve_tile_guided(rgb, alpha, trimap, radius, eps):
+    guide = cv2.cvtColor(np.ascontiguousarray(rgb), cv2.COLOR_RGB2GRAY).astype(np.float32) / 255.0
+    return guided_filter(guide, alpha.astype(np.float32) / 255.0, radius, eps)
+
+
+def _solve_tile_closed_form(rgb, alpha, trimap, radius, eps):
+    # 타일 안에 확실한 전경/배경이 모두 있어야 선형계가 정의됨 (없으면 guided filter로 대체)
+    if not PYMATTING_AVAILABLE or not (trimap == 255).any() or not (trimap == 0).any():
+        return _solve_tile_guided(rgb, alpha, trimap, radius, eps)
+    return estimate_alpha_cf(rgb / 255.0, trimap / 255.0)
+
+
+def refine_matte(rgb, alpha, mode='guided', tile_size=256, band=10, radius=6, eps=1e-4, snap=2):
+    """원본 RGB + 정제 알파(uint8) → unknown 띠만 다시 계산한 알파(uint8)
+
+    띠를 덮는 tile_size 타일마다 margin(띠 폭/필터 반경의 2배)을 붙여 잘라 풀고,
+    타일 중심부의 unknown 픽셀만 되돌려 쓴다. 확실한 전경/배경 픽셀은 그대로 둔다.
+    """
+    if mode == 'off':
+        return alpha
+    if mode not in MATTING_MODES:
+        raise ValueError(f"Invalid matting mode: {mode} (choose from {', '.join(MATTING_MODES)})")
+    solve = _solve_tile_closed_form if mode == 'closed_form' else _solve_tile_guided
+
+    trimap = generate_trimap(alpha, band=band)
+    h, w = alpha.shape
+    margin = 2 * max(band, radius)
+    result = alpha.copy()
+    for y0, y1, x0, x1 in unknown_tiles(trimap, tile_size):
+        cy0, cy1 = max(0, y0 - margin), min(h, y1 + margin)
+        cx0, cx1 = max(0, x0 - margin), min(w, x1 + margin)
+        crop = (slice(cy0, cy1), slice(cx0, cx1))
+        solved = solve(rgb[crop], alpha[crop], trimap[crop], radius, eps)
+
+        core = (slice(y0 - cy0, y1 - cy0), slice(x0 - cx0, x1 - cx0))
+        unknown = trimap[y0:y1, x0:x1] == 128
+        solved = (np.clip(solved[core], 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+        # 풀이 잔차로 생긴 거의 0/255 값은 정리 (배경 쪽 띠의 미세한 알파가 바운딩 박스를 넓히지 않도록)
+        solved[solved <= snap] = 0
+        solved[solved >= 255 - snap] = 255
+        result[y0:y1, x0:x1][unknown] = solved[unknown]
+    return result
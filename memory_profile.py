@@ -0,0 +1,381 @@
+"""요청별 메모리 프로파일링 (opt-in, 기본 off)
+
+MEMORY_PROFILE=on이면 모든 요청을, header면 X-Memory-Profile: 1 헤더가 있는 요청만 프로파일링한다.
+요청마다 아래 값을 JSON 한 줄로 로그에 남기고(MEMORY_PROFILE_LOG를 지정하면 그 파일에도 추가),
+최근 결과와 최악 사례 집계는 디버그 엔드포인트(GET /api/debug/memory)로 확인한다.
+
+    rss_peak_delta_mb: 요청 중 RSS 최대 증가량 (샘플링 스레드가 MEMORY_PROFILE_INTERVAL_MS마다 측정)
+    traced_peak_mb:    tracemalloc 기준 Python/NumPy 할당 최대치 (PIL/OpenCV/onnxruntime 내부 버퍼는 RSS에만 잡힘)
+    stages:            StageTimer 단계별 최대 할당/순증가/RSS 증가, 그리고 최대 시점에 살아 있던
+                       (요청 중 할당된) 위치 상위 N개와 큰 NumPy 버퍼(임시 배열 포함) 크기/위치
+
+tracemalloc은 프로파일링 중인 요청이 있을 때만 켜고 모두 끝나면 끈다 (off/미대상 요청은 오버헤드 없음).
+추적은 프로세스 전역이라 동시에 처리 중인 다른 요청의 할당도 섞이므로 정확한 수치는 동시 요청 1개로 측정한다.
+추론 워커 모드(REMOVE_BG_INFERENCE_WORKERS > 0)에서는 추론/정제가 워커 프로세스에서 실행되어 여기 잡히지 않는다.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+from inference_workers import current_rss_bytes
+
+PROFILE_MODES = ('off', 'on', 'header')
+MEMORY_PROFILE = os.environ.get('MEMORY_PROFILE', 'off').lower()
+# 단계별로 보고할 할당 위치/NumPy 버퍼 수, NumPy 버퍼 최소 크기, RSS 샘플링 간격
+PROFILE_TOP = int(os.environ.get('MEMORY_PROFILE_TOP', 10))
+PROFILE_NUMPY_MIN_BYTES = int(float(os.environ.get('MEMORY_PROFILE_NUMPY_MIN_MB', 1)) * 1024 * 1024)
+PROFILE_INTERVAL = int(os.environ.get('MEMORY_PROFILE_INTERVAL_MS', 5)) / 1000
+# 디버그 엔드포인트에 보관할 최근 요청 수, JSON Lines 로그 파일 (빈 문자열이면 stdout에만)
+PROFILE_HISTORY = int(os.environ.get('MEMORY_PROFILE_HISTORY', 100))
+PROFILE_LOG = os.environ.get('MEMORY_PROFILE_LOG', '')
+
+# NumPy 배열 데이터 버퍼는 이 tracemalloc 도메인으로 기록됨
+NUMPY_DOMAIN = np.lib.tracemalloc_domain
+# 할당 위치 보고 최소 크기 (import 캐시 등 잡음 제외)
+SITE_MIN_BYTES = 64 * 1024
+# 할당 위치 집계에서 제외 (프로파일러 자신)
+_IGNORED_FILES = (tracemalloc.__file__, __file__)
+
+_local = threading.local()
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+
+def _mb(nbytes):
+    return round(nbytes / (1024 * 1024), 2)
+
+
+def _site(frame):
+    """할당 위치 표시 (site-packages 아래는 패키지 경로, 그 외는 파일 이름)"""
+    filename = frame.filename.replace('\\', '/')
+    if 'site-packages/' in filename:
+        filename = filename.rsplit('site-packages/', 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f'{filename}:{frame.lineno}'
+
+
+def _children_max_rss():
+    """종료된 자식 프로세스(FFmpeg 등) 중 최대 RSS (바이트, 측정 불가면 0)"""
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    except ImportError:
+        return 0
+
+
+def _acquire_tracing():
+    """프로파일링 요청 수 참조 카운트 (첫 요청이 tracemalloc 시작, 이미 외부에서 켜져 있으면 그대로 사용)"""
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0:
+            _tracing_owned = not tracemalloc.is_tracing()
+            if _tracing_owned:
+                tracemalloc.start()
+        _tracing_users += 1
+
+
+def _release_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+
+
+class _Span:
+    """요청 전체 또는 단계 하나의 측정 구간"""
+
+    def __init__(self, name, rss, traced):
+        self.name = name
+        self.rss_start = self.rss_peak = rss
+        self.traced_start = self.traced_peak = self.traced_end = traced
+        self.snapshot = None
+        self.snapshot_growth = 0
+
+    def wants_snapshot(self, traced, min_bytes):
+        # 최대치가 눈에 띄게 갱신될 때만 다시 스냅샷 (스냅샷 비용은 추적 중인 블록 수에 비례)
+        growth = traced - self.traced_start
+        return growth >= min_bytes and growth > self.snapshot_growth * 1.25
+
+
+class RequestProfile:
+    """요청 하나의 메모리 프로파일 (start → stage(name)... → finish)"""
+
+    def __init__(self, top=PROFILE_TOP, numpy_min_bytes=PROFILE_NUMPY_MIN_BYTES, interval=PROFILE_INTERVAL):
+        self.top = top
+        self.numpy_min_bytes = numpy_min_bytes
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._stack = []
+        self._stages = []
+
+    def start(self):
+        _acquire_tracing()
+        # 요청 시작 전부터 있던 할당은 기준 스냅샷으로 빼고 요청 중 늘어난 것만 보고
+        self._baseline = self._take_snapshot()
+        self._baseline_buffers = {}
+        for trace in self._numpy_traces(self._baseline):
+            key = (trace.size, trace.traceback)
+            self._baseline_buffers[key] = self._baseline_buffers.get(key, 0) + 1
+        self._children_rss = _children_max_rss()
+        self._started = time.perf_counter()
+        self._root = self._open('request')
+        self._stack.append(self._root)
+        self._sampler = threading.Thread(target=self._sample, name='memory-profile', daemon=True)
+        self._sampler.start()
+
+    def _take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES])
+
+    def _numpy_traces(self, snapshot):
+        numpy_only = snapshot.filter_traces([tracemalloc.DomainFilter(True, NUMPY_DOMAIN)])
+        return [trace for trace in numpy_only.traces if trace.size >= self.numpy_min_bytes]
+
+    def _fold_peak(self):
+        """reset_peak 전에 지금까지의 tracemalloc 최대치를 열린 모든 구간에 반영"""
+        peak = tracemalloc.get_traced_memory()[1]
+        for span in self._stack:
+            span.traced_peak = max(span.traced_peak, peak)
+
+    def _open(self, name):
+        self._fold_peak()
+        tracemalloc.reset_peak()
+        return _Span(name, current_rss_bytes(), tracemalloc.get_traced_memory()[0])
+
+    def _observe(self, rss, traced):
+        for span in self._stack:
+            span.rss_peak = max(span.rss_peak, rss)
+        # 최대 시점 스냅샷: 나중에 해제되는 임시 배열도 살아 있을 때 잡히도록 샘플링 중에 찍음
+        spans = [span for span in self._stack if span.wants_snapshot(traced, self.numpy_min_bytes)]
+        if spans:
+            snapshot = self._take_snapshot()
+            for span in spans:
+                span.snapshot = snapshot
+                span.snapshot_growth = traced - span.traced_start
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss_bytes()
+            with self._lock:
+                if self._stack:
+                    self._observe(rss, tracemalloc.get_traced_memory()[0])
+
+    @contextmanager
+    def stage(self, name):
+        """파이프라인 단계 하나를 별도 구간으로 측정 (같은 이름이 여러 번이면 최대치 구간을 보고)"""
+        with self._lock:
+            span = self._open(name)
+            self._stack.append(span)
+        try:
+            yield
+        finally:
+            rss = current_rss_bytes()
+            with self._lock:
+                self._fold_peak()
+                span.traced_end = tracemalloc.get_traced_memory()[0]
+                self._observe(rss, span.traced_end)
+                self._stack.pop()
+            self._stages.append(span)
+
+    def finish(self):
+        """샘플링 중지 + tracemalloc 해제 → 결과 dict"""
+        self._stop.set()
+        self._sampler.join()
+        rss = current_rss_bytes()
+        with self._lock:
+            self._fold_peak()
+            self._root.traced_end = tracemalloc.get_traced_memory()[0]
+            self._observe(rss, self._root.traced_end)
+            self._stack.clear()
+        _release_tracing()
+
+        stages = {}
+        for span in self._stages:
+            best = stages.get(span.name)
+            if best is None or span.traced_peak - span.traced_start > best.traced_peak - best.traced_start:
+                stages[span.name] = span
+        result = {
+            'seconds': round(time.perf_counter() - self._started, 4),
+            'rss_start_mb': _mb(self._root.rss_start),
+            'rss_end_mb': _mb(rss),
+            **self._summarize(self._root),
+            'stages': {name: self._summarize(span) for name, span in stages.items()},
+        }
+        children_rss = _children_max_rss()
+        if children_rss > self._children_rss:
+            # 이 요청 중 종료된 자식 프로세스가 최대 RSS를 갱신함 (FFmpeg 등)
+            result['children_peak_rss_mb'] = _mb(children_rss)
+        return result
+
+    def _summarize(self, span):
+        summary = {
+            'rss_peak_delta_mb': _mb(span.rss_peak - span.rss_start),
+            'traced_peak_mb': _mb(span.traced_peak - span.traced_start),
+            'traced_net_mb': _mb(span.traced_end - span.traced_start),
+        }
+        if span.snapshot is not None:
+            summary['top_sites'] = self._top_sites(span.snapshot)
+            summary['numpy_buffers'] = self._numpy_buffers(span.snapshot)
+        return summary
+
+    def _top_sites(self, snapshot):
+        """기준 스냅샷 대비 늘어난 할당 위치 상위 N개"""
+        stats = [stat for stat in snapshot.compare_to(self._baseline, 'lineno') if stat.size_diff >= SITE_MIN_BYTES]
+        stats.sort(key=lambda stat: stat.size_diff, reverse=True)
+        return [{'site': _site(stat.traceback[0]), 'mb': _mb(stat.size_diff), 'blocks': stat.count_diff}
+                for stat in stats[:self.top]]
+
+    def _numpy_buffers(self, snapshot):
+        """요청 중에 만들어진 numpy_min_bytes 이상 NumPy 버퍼 상위 N개 (크기, 할당 위치)"""
+        remaining = dict(self._baseline_buffers)
+        buffers = []
+        for trace in self._numpy_traces(snapshot):
+            key = (trace.size, trace.traceback)
+            if remaining.get(key):
+                remaining[key] -= 1
+                continue
+            buffers.append(trace)
+        buffers.sort(key=lambda trace: trace.size, reverse=True)
+        return [{'site': _site(trace.traceback[0]), 'mb': _mb(trace.size)} for trace in buffers[:self.top]]
+
+
+def profile_stage(name):
+    """현재 스레드의 요청이 프로파일링 중이면 profile.stage(name), 아니면 아무것도 하지 않는 컨텍스트"""
+    profile = getattr(_local, 'profile', None)
+    return profile.stage(name) if profile is not None else nullcontext()
+
+
+class ProfileLog:
+    """프로파일 결과 기록: JSON 한 줄 로그 + 최근 N개 링 버퍼 + 엔드포인트/단계/할당 위치별 최악 사례"""
+
+    def __init__(self, history=PROFILE_HISTORY, log_path=PROFILE_LOG, worst=5):
+        self.recent = deque(maxlen=max(1, history))
+        self.log_path = log_path
+        self.worst = worst
+        self._lock = threading.Lock()
+        self._worst_requests = []
+        self._endpoints = {}
+        self._stages = {}
+        self._sites = {}
+
+    def record(self, result):
+        line = json.dumps({'event': 'memory_profile', **result}, ensure_ascii=False)
+        print(line)
+        with self._lock:
+            if self.log_path:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+            self.recent.append(result)
+            self._worst_requests.append(result)
+            self._worst_requests.sort(key=lambda r: r['rss_peak_delta_mb'], reverse=True)
+            del self._worst_requests[self.worst:]
+            self._aggregate(self._endpoints, result['endpoint'], result)
+            for name, stage in result['stages'].items():
+                self._aggregate(self._stages, name, stage)
+                for site in stage.get('top_sites', []) + stage.get('numpy_buffers', []):
+                    current = self._sites.get(site['site'])
+                    if current is None or site['mb'] > current['max_mb']:
+                        self._sites[site['site']] = {'max_mb': site['mb'], 'stage': name,
+                                                     'endpoint': result['endpoint']}
+
+    @staticmethod
+    def _aggregate(table, key, values):
+        entry = table.setdefault(key, {'count': 0, 'max_rss_peak_delta_mb': 0.0, 'max_traced_peak_mb': 0.0,
+                                       'total_traced_peak_mb': 0.0})
+        entry['count'] += 1
+        entry['max_rss_peak_delta_mb'] = max(entry['max_rss_peak_delta_mb'], values['rss_peak_delta_mb'])
+        entry['max_traced_peak_mb'] = max(entry['max_traced_peak_mb'], values['traced_peak_mb'])
+        entry['total_traced_peak_mb'] += values['traced_peak_mb']
+
+    @staticmethod
+    def _with_mean(table):
+        return {
+            key: {'count': entry['count'],
+                  'max_rss_peak_delta_mb': entry['max_rss_peak_delta_mb'],
+                  'max_traced_peak_mb': entry['max_traced_peak_mb'],
+                  'mean_traced_peak_mb': round(entry['total_traced_peak_mb'] / entry['count'], 2)}
+            for key, entry in sorted(table.items(), key=lambda item: item[1]['max_traced_peak_mb'], reverse=True)
+        }
+
+    def report(self, limit=20):
+        with self._lock:
+            sites = sorted(self._sites.items(), key=lambda item: item[1]['max_mb'], reverse=True)
+            return {
+                'worst_requests': list(self._worst_requests),
+                'endpoints': self._with_mean(self._endpoints),
+                'stages': self._with_mean(self._stages),
+                'worst_sites': [{'site': site, **info} for site, info in sites[:limit]],
+                'recent': list(self.recent)[-limit:],
+            }
+
+
+def instrument_memory(app, url='/api/debug/memory', mode=MEMORY_PROFILE):
+    """Flask 앱에 요청별 메모리 프로파일링 훅 + GET url 디버그 엔드포인트 등록 (mode가 off면 아무것도 하지 않음)"""
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Invalid MEMORY_PROFILE: {mode} (choose from {', '.join(PROFILE_MODES)})")
+    if mode == 'off':
+        return None
+    from flask import jsonify, request
+
+    log = ProfileLog()
+    skipped_paths = {url, '/metrics'}
+
+    def finish(profile, status):
+        _local.profile = None
+        result = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint or 'unknown',
+            'status': status,
+            **profile.finish(),
+        }
+        log.record(result)
+        return result
+
+    @app.before_request
+    def _memory_profile_before():
+        if request.method == 'OPTIONS' or request.path in skipped_paths:
+            return
+        if mode == 'header' and request.headers.get('X-Memory-Profile', '').lower() not in ('1', 'true', 'on'):
+            return
+        profile = RequestProfile()
+        profile.start()
+        _local.profile = profile
+        request.environ['memory_profile'] = profile
+
+    @app.after_request
+    def _memory_profile_after(response):
+        profile = request.environ.pop('memory_profile', None)
+        if profile is not None:
+            result = finish(profile, response.status_code)
+            response.headers['X-Memory-Peak-MB'] = str(result['rss_peak_delta_mb'])
+        return response
+
+    @app.teardown_request
+    def _memory_profile_teardown(exc):
+        # after_request가 실행되지 않은 경우(처리되지 않은 예외)에도 샘플링 스레드/tracemalloc 정리
+        profile = request.environ.pop('memory_profile', None)
+        if profile is not None:
+            finish(profile, 500)
+
+    @app.route(url, methods=['GET'])
+    def memory_profile_report():
+        """최근 프로파일 + 엔드포인트/단계/할당 위치별 최악 사례 (limit: 최근/할당 위치 개수)"""
+        try:
+            limit = max(1, int(request.args.get('limit', 20)))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        return jsonify({'mode': mode, **log.report(limit)})
+
+    print(f"메모리 프로파일링 활성화 (MEMORY_PROFILE={mode}, GET {url})")
+    return log
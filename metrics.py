@@ -0,0 +1,213 @@
+"""Prometheus 텍스트 포맷 메트릭 (외부 의존성 없는 최소 구현)
+
+카운터/게이지/히스토그램과 Flask 앱용 공통 계측(진행 중 요청 수, 업로드/응답 바이트, /metrics)을 제공한다.
+값은 프로세스별로 집계되므로 gunicorn 워커가 여러 개면 워커마다 따로 스크레이프된다.
+"""
+import bisect
+import threading
+import time
+
+from flask import Response, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name}: expected labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, func, **labels):
+        """스크레이프 시점에 func()로 값을 읽음 (대기열 길이처럼 다른 객체가 가진 상태용)"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = func
+
+    def _render_samples(self, items):
+        return super()._render_samples([(key, value() if callable(value) else value) for key, value in items])
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [버킷별 개수..., +Inf 개수], 합계
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    def time(self, **labels):
+        """with 블록 소요 시간 기록"""
+        return _Timer(self, labels)
+
+    def _render_samples(self, items):
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", _format_value(bound))])} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    """메트릭 등록/렌더링"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def instrument_app(app, registry):
+    """Flask 앱 공통 계측: 진행 중 요청 게이지, 요청 수, 업로드/응답 바이트 + GET /metrics"""
+    in_flight = registry.gauge('http_requests_in_flight', 'Requests currently being handled', ['endpoint'])
+    requests_total = registry.counter('http_requests_total', 'Handled requests', ['endpoint', 'method', 'status'])
+    request_bytes = registry.counter('http_request_bytes_total', 'Uploaded request body bytes', ['endpoint'])
+    response_bytes = registry.counter('http_response_bytes_total', 'Response body bytes sent', ['endpoint'])
+
+    def endpoint_label():
+        return request.endpoint or 'unknown'
+
+    @app.before_request
+    def _metrics_before():
+        request.environ['metrics.endpoint'] = endpoint_label()
+        in_flight.inc(endpoint=request.environ['metrics.endpoint'])
+
+    @app.after_request
+    def _metrics_after(response):
+        endpoint = request.environ.get('metrics.endpoint', endpoint_label())
+        requests_total.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        if request.content_length:
+            request_bytes.inc(request.content_length, endpoint=endpoint)
+        if response.content_length is not None:
+            response_bytes.inc(response.content_length, endpoint=endpoint)
+        elif response.is_streamed:
+            # 스트리밍 응답은 실제로 보낸 청크 크기를 누적
+            response.response = _count_chunks(response.response, response_bytes, endpoint)
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown(exc):
+        endpoint = request.environ.pop('metrics.endpoint', None)
+        if endpoint is not None:
+            in_flight.dec(endpoint=endpoint)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus 스크레이프 엔드포인트"""
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return registry
+
+
+def _count_chunks(iterable, counter, endpoint):
+    try:
+        for chunk in iterable:
+            counter.inc(len(chunk), endpoint=endpoint)
+            yield chunk
+    finally:
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,225 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(data, *params):
+    """입력 바이트 해시 + 파라미터로 콘텐츠 주소 키 생성"""
+    return _with_params(hashlib.sha256(data).hexdigest(), params)
+
+
+def make_file_cache_key(path, *params, chunk_size=1024 * 1024):
+    """파일 내용 해시 + 파라미터로 키 생성 (큰 입력도 메모리에 올리지 않고 청크 단위로 해시)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return _with_params(digest.hexdigest(), params)
+
+
+def _with_params(digest, params):
+    if not params:
+        return digest
+    # 파라미터는 별도 해시로 (디스크 파일명으로 안전하게 사용)
+    params_digest = hashlib.sha256(repr(params).encode('utf-8')).hexdigest()[:16]
+    return f'{digest}-{params_digest}'
+
+
+class ResultCache:
+    """2단계 결과 캐시: 메모리(LRU) + 선택적 디스크(LRU), 둘 다 바이트 크기 기준으로 제한
+
+    디스크 디렉토리는 여러 워커 프로세스가 공유할 수 있다. 저장 시 로컬 합계가 한도를 넘거나
+    disk_rescan_seconds가 지나면 디렉토리를 다시 읽어 다른 워커가 쓴 파일까지 포함해 max_disk_bytes를 지키고,
+    로컬 인덱스에 없는 키도 디스크에서 찾는다.
+    """
+
+    def __init__(self, max_memory_bytes=64 * 1024 * 1024, disk_dir=None, max_disk_bytes=512 * 1024 * 1024,
+                 disk_rescan_seconds=30):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = disk_dir
+        self.disk_rescan_seconds = disk_rescan_seconds
+        self._last_rescan = 0.0
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._rescan_disk(force=True)
+
+    def _scan_disk(self):
+        """디렉토리 기준 디스크 인덱스 (mtime 오래된 순으로 LRU, 재시작/다른 워커의 파일 포함). 락 없이 호출"""
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith('.tmp'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.disk_dir, name))
+            except OSError:
+                # 다른 워커가 방금 삭제
+                continue
+            entries.append((stat.st_mtime, name, stat.st_size))
+        return OrderedDict((name, size) for _, name, size in sorted(entries))
+
+    def _rescan_disk(self, force=False):
+        """로컬 합계가 한도를 넘었거나 disk_rescan_seconds가 지났으면 디렉토리를 다시 읽고 축출
+
+        디렉토리 스캔은 락 밖에서 하므로 스캔 중에도 조회는 막히지 않는다.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not (force or self._disk_bytes > self.max_disk_bytes
+                    or now - self._last_rescan >= self.disk_rescan_seconds):
+                return
+            self._last_rescan = now
+        disk = self._scan_disk()
+        with self._lock:
+            self._disk = disk
+            self._disk_bytes = sum(disk.values())
+            self._evict_disk()
+
+    def _touch_disk(self, key):
+        """디스크 파일 mtime 갱신 + 인덱스에서 최근 사용으로 이동 (파일이 없으면 인덱스에서 제거 후 False)"""
+        path = self._disk_path(key)
+        try:
+            os.utime(path)
+            size = os.path.getsize(path)
+        except OSError:
+            if key in self._disk:
+                self._disk_bytes -= self._disk.pop(key)
+            return False
+        if key in self._disk:
+            self._disk_bytes -= self._disk.pop(key)
+        self._disk[key] = size
+        self._disk_bytes += size
+        return True
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key)
+
+    def get(self, key):
+        """캐시 조회 (없으면 None). 디스크 히트는 메모리 계층으로 승격"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+            if self.disk_dir:
+                try:
+                    with open(self._disk_path(key), 'rb') as f:
+                        data = f.read()
+                except OSError:
+                    if key in self._disk:
+                        self._disk_bytes -= self._disk.pop(key)
+                    data = None
+                if data is not None:
+                    self._touch_disk(key)
+                    self._put_memory(key, data)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return data
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        """결과 저장 (메모리 + 디스크)"""
+        with self._lock:
+            self._put_memory(key, data)
+        if self.disk_dir and len(data) <= self.max_disk_bytes:
+            self._put_disk(key, data)
+
+    def open_file(self, key):
+        """디스크 계층 조회 → 열린 캐시 파일 (없으면 None). 큰 결과를 send_file로 바로 보낼 때 사용
+
+        경로 대신 핸들을 돌려주므로 다른 워커가 직후에 파일을 축출해도 전송에는 영향이 없다.
+        """
+        with self._lock:
+            if self.disk_dir and self._touch_disk(key):
+                try:
+                    f = open(self._disk_path(key), 'rb')
+                except OSError:
+                    self._disk_bytes -= self._disk.pop(key)
+                    f = None
+                if f is not None:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return f
+            self.misses += 1
+            return None
+
+    def put_file(self, key, src_path):
+        """파일을 디스크 계층에 복사해 저장 (메모리 계층 사용 안 함)"""
+        if not self.disk_dir:
+            return
+        size = os.path.getsize(src_path)
+        if size > self.max_disk_bytes:
+            return
+        path = self._disk_path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            shutil.copyfile(src_path, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"디스크 캐시 저장 실패: {str(e)}")
+            return
+        with self._lock:
+            self._touch_disk(key)
+        self._rescan_disk()
+
+    def _put_memory(self, key, data):
+        if len(data) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _put_disk(self, key, data):
+        path = self._disk_path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"디스크 캐시 저장 실패: {str(e)}")
+            return
+        with self._lock:
+            self._touch_disk(key)
+        self._rescan_disk()
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            name, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self._disk_path(name))
+            except OSError:
+                pass
+
+    def stats(self):
+        """히트/미스 카운터 및 계층별 사용량"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+            }
@@ -0,0 +1,227 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from flask import Request
+
+
+class ScratchQuotaExceeded(Exception):
+    """작업별 또는 전체 스크래치 용량 한도 초과"""
+
+
+class ScratchJob:
+    """작업 하나의 스크래치 디렉토리 (예약 용량 기준으로 한도 관리)"""
+
+    def __init__(self, space, job_id, path, max_bytes):
+        self.space = space
+        self.id = job_id
+        self.path = path
+        self.max_bytes = max_bytes
+        self.reserved = 0
+        self.created_at = time.time()
+        self.closed = False
+
+    def file(self, name):
+        """작업 디렉토리 안의 파일 경로 (경로 구분자 제거)"""
+        return os.path.join(self.path, os.path.basename(name) or 'file')
+
+    def reserve(self, nbytes):
+        """용량 예약 (작업/전체 한도를 넘으면 ScratchQuotaExceeded)"""
+        self.space._reserve(self, int(nbytes or 0))
+
+    def charge(self, total_bytes):
+        """예약량을 total_bytes까지 늘림 (이미 그 이상 예약했으면 그대로)"""
+        if total_bytes > self.reserved:
+            self.reserve(total_bytes - self.reserved)
+
+    def account(self):
+        """실제 디스크 사용량으로 예약 갱신 (변환 결과 생성 후 호출)"""
+        used = self.usage()
+        self.charge(used)
+        return used
+
+    def usage(self):
+        total = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def finish(self):
+        """결과 보관 단계로 전환: heartbeat 대상에서 제외 (close() 전까지 디렉토리와 예약은 유지)"""
+        self.space.retire(self)
+
+    def close(self):
+        """디렉토리 삭제 및 예약 해제 (여러 번 호출해도 안전)"""
+        self.space.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ScratchSpace:
+    """두 백엔드 공용 스크래치 공간: 루트 지정(tmpfs 가능), 전체/작업별 용량 한도, 오래된 파일 정리
+
+    루트는 여러 프로세스(gunicorn 워커)가 공유한다. 각 프로세스의 janitor는 자기 작업 디렉토리의 mtime을
+    주기적으로 갱신(heartbeat)하므로, stale_seconds 동안 갱신되지 않은 항목은 소유 프로세스가 종료된 것으로 보고 삭제한다.
+    """
+
+    def __init__(self, root=None, max_total_bytes=2 * 1024 ** 3, max_job_bytes=500 * 1024 ** 2,
+                 stale_seconds=3600, janitor_interval=300):
+        self.root = root or os.path.join(tempfile.gettempdir(), 'image-editor-scratch')
+        self.max_total_bytes = max_total_bytes
+        self.max_job_bytes = max_job_bytes
+        self.stale_seconds = stale_seconds
+        # heartbeat 간격은 stale_seconds보다 충분히 짧아야 다른 프로세스가 실행 중인 작업을 지우지 않음
+        self.janitor_interval = max(1, min(janitor_interval, stale_seconds // 3))
+        self._jobs = {}
+        self._reserved = 0
+        self._lock = threading.Lock()
+        self._janitor = None
+        self._janitor_tasks = []
+        self.swept = 0
+        self.rejected = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    def job(self, prefix='job'):
+        """새 작업 디렉토리 생성 (첫 호출 시 janitor 스레드 시작)"""
+        self.start_janitor()
+        job_id = uuid.uuid4().hex
+        path = self.job_path(prefix, job_id)
+        os.makedirs(path)
+        job = ScratchJob(self, job_id, path, self.max_job_bytes)
+        with self._lock:
+            self._jobs[path] = job
+        return job
+
+    def job_path(self, prefix, job_id):
+        """작업 디렉토리 경로 (다른 프로세스가 만든 작업도 prefix + ID로 찾을 수 있음)"""
+        return os.path.join(self.root, f'{prefix}-{job_id}')
+
+    def _reserve(self, job, nbytes):
+        with self._lock:
+            if job.reserved + nbytes > job.max_bytes:
+                self.rejected += 1
+                raise ScratchQuotaExceeded(f'Job scratch quota exceeded ({job.max_bytes} bytes)')
+            if self._reserved + nbytes > self.max_total_bytes:
+                self.rejected += 1
+                raise ScratchQuotaExceeded(f'Scratch space full ({self.max_total_bytes} bytes)')
+            job.reserved += nbytes
+            self._reserved += nbytes
+
+    def release(self, job):
+        with self._lock:
+            if job.closed:
+                return
+            job.closed = True
+            self._jobs.pop(job.path, None)
+            self._reserved -= job.reserved
+        shutil.rmtree(job.path, ignore_errors=True)
+
+    def retire(self, job):
+        """작업 디렉토리를 heartbeat 대상에서 제외 (마지막 갱신 후 stale_seconds가 지나면 sweep 대상)"""
+        with self._lock:
+            self._jobs.pop(job.path, None)
+
+    def heartbeat(self):
+        """이 프로세스의 활성 작업 디렉토리 mtime 갱신 (다른 프로세스의 sweep 대상에서 제외)"""
+        with self._lock:
+            active = list(self._jobs)
+        for path in active:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return active
+
+    def sweep(self):
+        """이 프로세스에 등록되지 않은 항목 중 stale_seconds 동안 갱신되지 않은 것(소유 프로세스 종료) 삭제"""
+        active = set(self.heartbeat())
+        now = time.time()
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if path in active:
+                continue
+            try:
+                if now - os.path.getmtime(path) < self.stale_seconds:
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self.swept += removed
+        return removed
+
+    def add_janitor_task(self, task):
+        """janitor 스레드가 sweep 뒤에 함께 실행할 함수 등록 (예: 만료된 작업 정리)"""
+        with self._lock:
+            self._janitor_tasks.append(task)
+
+    def start_janitor(self):
+        """주기적으로 sweep 실행하는 데몬 스레드 (프로세스당 1개, fork 이후 첫 사용 시 시작)"""
+        if self._janitor is not None and self._janitor.is_alive():
+            return
+        with self._lock:
+            if self._janitor is not None and self._janitor.is_alive():
+                return
+
+            def run():
+                while True:
+                    with self._lock:
+                        tasks = [self.sweep, *self._janitor_tasks]
+                    for task in tasks:
+                        try:
+                            task()
+                        except Exception as e:
+                            print(f"스크래치 정리 실패: {str(e)}")
+                    time.sleep(self.janitor_interval)
+
+            self._janitor = threading.Thread(target=run, name='scratch-janitor', daemon=True)
+            self._janitor.start()
+
+    def request_class(self):
+        """업로드 스풀 파일도 스크래치 루트에 만들도록 하는 Flask Request 클래스"""
+        space = self
+
+        class ScratchRequest(Request):
+            def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+                return tempfile.SpooledTemporaryFile(max_size=500 * 1024, mode='rb+', dir=space.root)
+
+        return ScratchRequest
+
+    def stats(self):
+        with self._lock:
+            return {
+                'root': self.root,
+                'active_jobs': len(self._jobs),
+                'reserved_bytes': self._reserved,
+                'max_total_bytes': self.max_total_bytes,
+                'max_job_bytes': self.max_job_bytes,
+                'rejected': self.rejected,
+                'swept': self.swept,
+            }
+
+
+def scratch_from_env():
+    """환경 변수 설정으로 ScratchSpace 생성 (SCRATCH_ROOT로 tmpfs 지정 가능)"""
+    return ScratchSpace(
+        root=os.environ.get('SCRATCH_ROOT') or None,
+        max_total_bytes=int(os.environ.get('SCRATCH_MAX_MB', 2048)) * 1024 * 1024,
+        max_job_bytes=int(os.environ.get('SCRATCH_JOB_MAX_MB', 500)) * 1024 * 1024,
+        stale_seconds=int(os.environ.get('SCRATCH_STALE_SECONDS', 3600)),
+        janitor_interval=int(os.environ.get('SCRATCH_JANITOR_INTERVAL', 300)),
+    )
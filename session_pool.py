@@ -0,0 +1,135 @@
+import os
+import queue
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+
+def default_intra_op_threads(pool_size):
+    """풀 크기에 맞춘 세션당 intra-op 스레드 수 (코어를 세션 수로 나눔)"""
+    return max(1, (os.cpu_count() or 1) // max(1, pool_size))
+
+
+class SessionPool:
+    """같은 모델의 onnxruntime 세션 N개를 돌려 쓰는 풀
+
+    세션 하나를 모든 요청 스레드가 공유하면 onnxruntime 기본 스레드 설정(코어 수만큼)끼리
+    코어를 두고 경쟁한다. 세션 수 × 세션당 intra-op 스레드 ≈ 코어 수로 맞추면
+    동시 요청이 서로 막지 않고 코어에 나뉘어 실행된다. 세션은 처음 필요할 때 생성한다.
+    """
+
+    def __init__(self, model_name='u2net', size=1, intra_op_threads=0, inter_op_threads=0, factory=None):
+        self.model_name = model_name
+        self.size = max(1, int(size))
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.factory = factory or self._new_session
+        self._idle = queue.LifoQueue()
+        self._sessions = []
+        # 로딩 중인 세션 수 (락 밖에서 로딩하므로 자리만 먼저 예약)
+        self._loading = 0
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.wait_seconds = 0.0
+
+    def _new_session(self):
+        import onnxruntime as ort
+        from rembg import new_session
+
+        sess_opts = ort.SessionOptions()
+        if self.intra_op_threads:
+            sess_opts.intra_op_num_threads = self.intra_op_threads
+        if self.inter_op_threads:
+            sess_opts.inter_op_num_threads = self.inter_op_threads
+        return new_session(self.model_name, sess_opts=sess_opts)
+
+    def _try_create(self):
+        """풀이 다 차지 않았으면 세션 1개 생성 (생성 실패 시 예약 해제 후 예외 전파)
+
+        모델 로딩(수 초)은 락 밖에서 하므로 stats()/이미 로딩된 세션 대여가 로딩을 기다리지 않는다.
+        """
+        with self._lock:
+            if len(self._sessions) + self._loading >= self.size:
+                return None
+            self._loading += 1
+            number = len(self._sessions) + self._loading
+        print(f"모델 세션 로딩 시작... ({self.model_name} {number}/{self.size})")
+        try:
+            session = self.factory()
+        except Exception as e:
+            with self._lock:
+                self._loading -= 1
+            print(f"모델 세션 로딩 실패: {str(e)}")
+            print(traceback.format_exc())
+            raise
+        with self._lock:
+            self._loading -= 1
+            self._sessions.append(session)
+        print("모델 세션 로딩 완료")
+        return session
+
+    @contextmanager
+    def session(self):
+        """세션 하나를 빌려 쓰고 반납 (모두 사용 중이면 반납될 때까지 대기)"""
+        try:
+            session = self._idle.get_nowait()
+        except queue.Empty:
+            session = self._try_create()
+            if session is None:
+                start = time.perf_counter()
+                with self._lock:
+                    self.waiting += 1
+                try:
+                    while session is None:
+                        try:
+                            session = self._idle.get(timeout=1)
+                        except queue.Empty:
+                            # 다른 스레드의 로딩이 실패했으면 빈 자리에 직접 생성
+                            session = self._try_create()
+                finally:
+                    with self._lock:
+                        self.waiting -= 1
+                        self.wait_seconds += time.perf_counter() - start
+        try:
+            yield session
+        finally:
+            self._idle.put(session)
+
+    def fill(self):
+        """풀 크기만큼 세션을 미리 생성 → 전체 세션 목록 (워밍업용)"""
+        while True:
+            session = self._try_create()
+            if session is None:
+                return list(self._sessions)
+            self._idle.put(session)
+
+    def get_any(self):
+        """반납 없이 참조만 하는 세션 (벤치마크/도구용, 요청 처리는 session() 사용)"""
+        with self._lock:
+            if self._sessions:
+                return self._sessions[0]
+        created = self._try_create()
+        if created is not None:
+            self._idle.put(created)
+            return created
+        with self._lock:
+            if self._sessions:
+                return self._sessions[0]
+        # 다른 스레드가 로딩 중이면 끝날 때까지 대기
+        with self.session() as session:
+            return session
+
+    def stats(self):
+        with self._lock:
+            return {
+                'model': self.model_name,
+                'size': self.size,
+                'created': len(self._sessions),
+                'loading': self._loading,
+                'idle': self._idle.qsize(),
+                'waiting': self.waiting,
+                'wait_seconds': round(self.wait_seconds, 3),
+                'intra_op_threads': self.intra_op_threads,
+                'inter_op_threads': self.inter_op_threads,
+            }
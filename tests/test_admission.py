@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def hold(controller, nbytes, started, release):
+    """다른 스레드에서 승인받아 release가 set될 때까지 자리를 차지"""
+    def run():
+        with controller.admit(nbytes):
+            started.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert started.wait(5)
+    return thread
+
+
+def test_request_over_budget_is_rejected_as_too_large():
+    controller = AdmissionController(max_bytes=100)
+    with pytest.raises(AdmissionRejected) as excinfo:
+        with controller.admit(101):
+            pass
+    assert excinfo.value.reason == 'too_large'
+    assert controller.stats()['rejected']['too_large'] == 1
+
+
+def test_full_queue_is_rejected_immediately():
+    controller = AdmissionController(max_concurrent=1, max_queue=0)
+    release = threading.Event()
+    thread = hold(controller, 10, threading.Event(), release)
+    try:
+        start = time.monotonic()
+        with pytest.raises(AdmissionRejected) as excinfo:
+            with controller.admit(10):
+                pass
+        assert excinfo.value.reason == 'queue_full'
+        assert excinfo.value.retry_after >= 1
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_queued_request_times_out():
+    controller = AdmissionController(max_bytes=100, max_queue=4, queue_timeout=0.2)
+    release = threading.Event()
+    thread = hold(controller, 80, threading.Event(), release)
+    try:
+        with pytest.raises(AdmissionRejected) as excinfo:
+            with controller.admit(50):
+                pass
+        assert excinfo.value.reason == 'timeout'
+        assert controller.stats()['queued'] == 0
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_queued_request_runs_when_budget_frees():
+    controller = AdmissionController(max_bytes=100, max_queue=4, queue_timeout=5)
+    release = threading.Event()
+    thread = hold(controller, 80, threading.Event(), release)
+    threading.Timer(0.1, release.set).start()
+    with controller.admit(50):
+        assert controller.stats()['active'] == 1
+    thread.join()
+    stats = controller.stats()
+    assert stats['admitted'] == 2 and stats['queued_total'] == 1 and stats['reserved_mb'] == 0
@@ -0,0 +1,83 @@
+import io
+import os
+
+import pytest
+
+os.environ.setdefault('CONVERT_CACHE_DIR', '')
+
+import backend_server
+from backend_server import (build_renditions_command, clip_args, parse_convert_settings, parse_renditions,
+                            probe_mp4_layout)
+
+
+def box(box_type, payload=b''):
+    return (8 + len(payload)).to_bytes(4, 'big') + box_type + payload
+
+
+@pytest.fixture
+def client():
+    return backend_server.app.test_client()
+
+
+def test_probe_streams_faststart_mp4():
+    data = box(b'ftyp', b'isom' * 4) + box(b'moov', b'm' * 32) + box(b'mdat', b'd' * 64)
+    prefix, needs_spool = probe_mp4_layout(io.BytesIO(data))
+    assert not needs_spool
+    assert data.startswith(prefix)
+
+
+def test_probe_spools_mp4_with_moov_after_mdat():
+    data = box(b'ftyp', b'isom' * 4) + box(b'mdat', b'd' * 64) + box(b'moov', b'm' * 32)
+    _, needs_spool = probe_mp4_layout(io.BytesIO(data))
+    assert needs_spool
+
+
+def test_probe_streams_non_mp4_containers():
+    _, needs_spool = probe_mp4_layout(io.BytesIO(b'\x1a\x45\xdf\xa3' + b'w' * 100))
+    assert not needs_spool
+
+
+def test_renditions_graph_decodes_once_and_scales_in_cascade():
+    outputs = [('gif', 320, 'a.gif'), ('webp', 640, 'b.webp'), ('gif', 640, 'c.gif')]
+    cmd = build_renditions_command('in.mp4', outputs, {'threads': 2})
+    assert cmd.count('-i') == 1
+    graph = cmd[cmd.index('-filter_complex') + 1]
+    assert graph.count('scale=640:-1') == 1 and graph.count('scale=320:-1') == 1
+    assert graph.index('scale=640') < graph.index('scale=320')
+    assert graph.count('palettegen') == 2
+    for _, _, path in outputs:
+        assert path in cmd
+
+
+def test_parse_renditions_enforces_width_cap():
+    assert parse_renditions('gif:320, webp:640,gif:320') == [('gif', 320), ('webp', 640)]
+    assert parse_renditions(f'gif:{backend_server.CONVERT_MAX_WIDTH}')
+    for value in ['gif:0', f'gif:{backend_server.CONVERT_MAX_WIDTH + 1}', 'gif:abc', 'bmp:320', '']:
+        with pytest.raises(ValueError):
+            parse_renditions(value)
+
+
+def test_parse_convert_settings_validates_values():
+    settings = parse_convert_settings({'videoLength': 'partial', 'startTime': '00:00:01', 'endTime': '2.5'})
+    assert clip_args(settings) == ['-ss', '1.000', '-t', '1.500']
+    for form in [{'width': 'abc'}, {'opacity': 'x'}, {'width': '0'},
+                 {'width': str(backend_server.CONVERT_MAX_WIDTH + 1)},
+                 {'videoLength': 'partial', 'startTime': '00:00:05', 'endTime': '00:00:02'},
+                 {'videoLength': 'partial', 'startTime': 'soon'}]:
+        with pytest.raises(ValueError):
+            parse_convert_settings(form)
+
+
+def test_bad_clip_range_returns_400_on_every_endpoint(client):
+    fields = {'videoLength': 'partial', 'startTime': '00:00:05', 'endTime': '00:00:02'}
+
+    def upload(**extra):
+        return {'file': (io.BytesIO(b'video'), 'a.mp4'), 'format': 'gif', **fields, **extra}
+
+    assert client.post('/api/convert', data=upload()).status_code == 400
+    assert client.post('/api/jobs', data=upload()).status_code == 400
+    assert client.post('/api/convert/renditions', data=upload(renditions='gif:320')).status_code == 400
+    response = client.post('/api/convert/stream', query_string={'format': 'gif', **fields},
+                           data=b'\x1a\x45\xdf\xa3ww', content_type='video/webm')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'endTime must be after startTime'
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+import background_removal
+from background_removal import _bulk_process_one, bulk_remove_background
+
+
+def save_image(path, rgb):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.fromarray(rgb).save(path)
+
+
+def product_shot():
+    rgb = np.full((120, 120, 3), 255, dtype=np.uint8)
+    rgb[30:90, 40:80] = (40, 40, 40)
+    return rgb
+
+
+def noise():
+    return (np.random.RandomState(0).rand(120, 120, 3) * 255).astype(np.uint8)
+
+
+def test_processed_image_is_written_and_reported_ok(tmp_path):
+    source = str(tmp_path / 'in' / 'shot.png')
+    output = str(tmp_path / 'out' / 'sub' / 'shot.png')
+    save_image(source, product_shot())
+
+    result = _bulk_process_one((source, output, (200, 200), 'best', 'png'))
+    assert result['status'] == 'ok' and result['triage'] == 'key'
+    assert Image.open(output).size == (200, 200)
+
+
+def test_inference_failure_writes_no_output(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('model unavailable')
+
+    monkeypatch.setattr(background_removal, 'get_session', fail)
+    source = str(tmp_path / 'in' / 'photo.png')
+    output = str(tmp_path / 'out' / 'photo.png')
+    save_image(source, noise())
+
+    result = _bulk_process_one((source, output, (200, 200), 'best', 'png'))
+    assert result['status'] == 'error'
+    assert 'model unavailable' in result['error']
+    # 출력도 .part 파일도 남지 않으므로 다음 실행에서 다시 처리
+    assert not os.path.exists(tmp_path / 'out')
+
+
+def test_resume_skips_existing_outputs(tmp_path):
+    source_dir = tmp_path / 'in'
+    output_dir = tmp_path / 'out'
+    for name in ('a', 'b'):
+        save_image(str(source_dir / f'{name}.png'), product_shot())
+        save_image(str(output_dir / f'{name}.png'), product_shot())
+
+    results = list(bulk_remove_background(str(source_dir), str(output_dir)))
+    assert [result['status'] for result in results] == ['skipped', 'skipped']
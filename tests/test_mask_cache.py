@@ -0,0 +1,32 @@
+import numpy as np
+
+import image_bg_backend
+from image_bg_backend import decode_masks, encode_masks, get_cached_masks
+from result_cache import ResultCache
+
+
+def make_masks(h=40, w=60):
+    raw = np.zeros((h, w), np.uint8)
+    raw[10:30, 15:45] = 200
+    alpha = raw.copy()
+    alpha[alpha > 0] = 255
+    return raw, alpha
+
+
+def test_mask_encoding_round_trips():
+    raw, alpha = make_masks()
+    decoded_raw, decoded_alpha = decode_masks(encode_masks(raw, alpha))
+    assert np.array_equal(decoded_raw, raw)
+    assert np.array_equal(decoded_alpha, alpha)
+
+
+def test_cached_masks_reused_only_for_same_resolution(monkeypatch):
+    monkeypatch.setattr(image_bg_backend, 'mask_cache', ResultCache())
+    raw, alpha = make_masks()
+    image_bg_backend.mask_cache.put('content', encode_masks(raw, alpha))
+
+    hit = get_cached_masks('content', np.zeros((40, 60, 3), np.uint8))
+    assert hit is not None and np.array_equal(hit[1], alpha)
+    # 작업 해상도가 다르면 미스
+    assert get_cached_masks('content', np.zeros((80, 120, 3), np.uint8)) is None
+    assert get_cached_masks('other', np.zeros((40, 60, 3), np.uint8)) is None
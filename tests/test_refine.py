@@ -0,0 +1,16 @@
+import numpy as np
+
+from benchmark import legacy_refine_alpha_mask, make_synthetic_mask
+from bg_pipeline import bounding_box
+from image_bg_backend import refine_alpha_mask
+
+
+def test_refine_matches_legacy_filter_on_large_mask():
+    mask = make_synthetic_mask(3000, 200)
+    mask[100:102, 100:2900] = 255  # 상단의 가는 컴포넌트
+
+    alpha, box = refine_alpha_mask(mask)
+    legacy = (legacy_refine_alpha_mask(mask.astype(np.float32) / 255.0) * 255).astype(np.uint8)
+
+    assert np.array_equal(alpha, legacy)
+    assert box == bounding_box(legacy)
@@ -0,0 +1,52 @@
+import os
+import time
+
+from result_cache import ResultCache, make_cache_key, make_file_cache_key
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(max_memory_bytes=30)
+    cache.put('a', b'a' * 10)
+    cache.put('b', b'b' * 10)
+    cache.put('c', b'c' * 10)
+    assert cache.get('a') == b'a' * 10  # a를 최근 사용으로
+
+    cache.put('d', b'd' * 10)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None and cache.get('d') is not None
+    assert cache.stats()['memory_bytes'] == 30
+
+
+def test_entry_larger_than_memory_tier_is_not_stored():
+    cache = ResultCache(max_memory_bytes=10)
+    cache.put('big', b'x' * 11)
+    assert cache.get('big') is None
+
+
+def test_disk_tier_evicts_oldest_and_promotes_hits(tmp_path):
+    cache = ResultCache(max_memory_bytes=0, disk_dir=str(tmp_path), max_disk_bytes=100)
+    for key in ('a', 'b'):
+        cache.put(key, b'x' * 40)
+        time.sleep(0.01)
+    assert cache.get('a') == b'x' * 40  # 디스크 히트 → a가 최근 사용
+
+    cache.put('c', b'x' * 40)
+    assert sorted(os.listdir(tmp_path)) == ['a', 'c']
+    assert cache.stats()['disk_hits'] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    ResultCache(max_memory_bytes=0, disk_dir=str(tmp_path)).put('k', b'data')
+    assert ResultCache(max_memory_bytes=0, disk_dir=str(tmp_path)).get('k') == b'data'
+
+
+def test_cache_key_separates_content_and_params(tmp_path):
+    key = make_cache_key(b'image', 'best', 1000, 1000)
+    assert key == make_cache_key(b'image', 'best', 1000, 1000)
+    assert key != make_cache_key(b'image', 'fast', 1000, 1000)
+    assert key != make_cache_key(b'image', 'best', 1000, 800)
+    assert key != make_cache_key(b'other', 'best', 1000, 1000)
+
+    path = tmp_path / 'input.bin'
+    path.write_bytes(b'image')
+    assert make_file_cache_key(str(path), 'best', 1000, 1000) == key
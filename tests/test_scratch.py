@@ -0,0 +1,72 @@
+import os
+import time
+
+import pytest
+
+from scratch import ScratchQuotaExceeded, ScratchSpace
+
+
+def make_space(tmp_path, **kwargs):
+    options = {'max_total_bytes': 1000, 'max_job_bytes': 600, 'stale_seconds': 60, 'janitor_interval': 3600}
+    options.update(kwargs)
+    return ScratchSpace(root=str(tmp_path), **options)
+
+
+def test_job_and_total_quotas(tmp_path):
+    space = make_space(tmp_path)
+    first = space.job()
+    first.reserve(500)
+    with pytest.raises(ScratchQuotaExceeded):
+        first.reserve(200)  # 작업 한도 600 초과
+
+    second = space.job()
+    with pytest.raises(ScratchQuotaExceeded):
+        second.reserve(600)  # 전체 한도 1000 초과
+    second.reserve(500)
+    assert space.stats()['reserved_bytes'] == 1000
+    assert space.stats()['rejected'] == 2
+
+    first.close()
+    assert space.stats()['reserved_bytes'] == 500
+    assert not os.path.exists(first.path)
+
+
+def test_charge_and_account_reserve_written_bytes(tmp_path):
+    space = make_space(tmp_path)
+    job = space.job()
+    job.charge(100)
+    job.charge(50)  # 이미 예약한 만큼이면 그대로
+    assert job.reserved == 100
+
+    with open(job.file('out.bin'), 'wb') as f:
+        f.write(b'x' * 300)
+    assert job.account() == 300
+    assert job.reserved == 300
+    with pytest.raises(ScratchQuotaExceeded):
+        job.charge(601)
+
+
+def test_sweep_removes_stale_entries_but_keeps_live_jobs(tmp_path):
+    owner = make_space(tmp_path)
+    other = make_space(tmp_path)
+    live = owner.job()
+    dead = os.path.join(str(tmp_path), 'job-dead')
+    os.makedirs(dead)
+    old = time.time() - 120
+    for path in (live.path, dead):
+        os.utime(path, (old, old))
+
+    owner.heartbeat()  # 소유 프로세스의 janitor가 mtime 갱신
+    other.sweep()
+    assert os.path.exists(live.path)
+    assert not os.path.exists(dead)
+
+
+def test_finished_job_leaves_heartbeat(tmp_path):
+    space = make_space(tmp_path)
+    job = space.job()
+    job.finish()
+    assert job.path not in space.heartbeat()
+    assert os.path.exists(job.path)
+    job.close()
+    assert space.stats()['reserved_bytes'] == 0
@@ -0,0 +1,34 @@
+import numpy as np
+from PIL import Image
+
+from triage import fast_path_mask, triage
+
+
+def make_product_shot():
+    """흰 배경 위 어두운 제품 + 제품 안의 흰 라벨"""
+    rgb = np.full((200, 200, 3), 255, dtype=np.uint8)
+    rgb[50:150, 60:140] = (40, 40, 40)
+    rgb[85:115, 85:115] = (255, 255, 255)
+    return rgb
+
+
+def test_key_path_keeps_enclosed_background_colored_region():
+    rgb = make_product_shot()
+    image = Image.fromarray(rgb)
+    path, info = triage(image)
+    assert path == 'key'
+
+    alpha = fast_path_mask(image, rgb, path, info)
+    assert alpha[0, 0] == 0 and alpha[199, 199] == 0
+    assert (alpha[50:150, 60:140] == 255).all()
+
+
+def test_key_path_removes_background_connected_to_border():
+    rgb = make_product_shot()
+    # 라벨을 제품 가장자리까지 늘려 바깥 배경과 이어지게 함
+    rgb[85:115, 85:140] = 255
+    image = Image.fromarray(rgb)
+    path, info = triage(image)
+    alpha = fast_path_mask(image, rgb, 'key', info)
+    assert (alpha[85:115, 100:140] == 0).all()
+    assert alpha[70, 70] == 255
@@ -0,0 +1,136 @@
+"""추론 전 트리아지: 작은 썸네일로 모델이 필요 없는 입력을 골라 빠른 경로로 처리
+
+    alpha: 이미 의미 있는 알파 채널이 있음 → 기존 알파를 마스크로 사용
+    empty: 피사체가 없음 (거의 단색/완전 투명) → 빈 마스크
+    key:   배경이 균일한 단색(흰색 포함)이고 피사체와 분명히 구분됨 → 색 거리 키로 마스크
+    model: 그 외 → 모델 추론
+
+판정은 긴 변 THUMB_SIZE px 썸네일에서만 하므로 비용은 썸네일 축소가 대부분이다 (2000px 기준 수 ms).
+경로별 적중률은 TriageStats로 집계해 임계값 조정에 사용한다.
+"""
+import os
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image
+
+TRIAGE_PATHS = ('alpha', 'empty', 'key', 'model')
+
+THUMB_SIZE = int(os.environ.get('TRIAGE_THUMB_SIZE', 64))
+# 알파: 투명(<=16) 비율이 이 이상이면 이미 배경이 제거된 이미지로 봄
+ALPHA_MIN_TRANSPARENT = float(os.environ.get('TRIAGE_ALPHA_MIN_TRANSPARENT', 0.02))
+# empty: 썸네일 밝기의 1~99 퍼센타일 폭이 이 이하면 단색 이미지
+EMPTY_MAX_RANGE = int(os.environ.get('TRIAGE_EMPTY_MAX_RANGE', 12))
+# key: 테두리 색 분산(배경색과의 채널 최대 차이 95 퍼센타일) 한도와 배경/피사체 색 거리 램프
+KEY_MAX_BORDER_SPREAD = int(os.environ.get('TRIAGE_KEY_MAX_BORDER_SPREAD', 10))
+KEY_LOW = int(os.environ.get('TRIAGE_KEY_LOW', 24))
+KEY_HIGH = int(os.environ.get('TRIAGE_KEY_HIGH', 64))
+# key: 배경도 피사체도 아닌 중간 거리 픽셀(그림자/그라데이션/경계) 비율 한도
+KEY_MAX_AMBIGUOUS = float(os.environ.get('TRIAGE_KEY_MAX_AMBIGUOUS', 0.06))
+
+
+def make_thumbnail(image, size=THUMB_SIZE):
+    """긴 변 size px 썸네일 (reduce 후 BOX 리샘플링, 원본은 그대로)"""
+    scale = size / max(image.size)
+    if scale >= 1:
+        return image
+    thumb_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(thumb_size, Image.Resampling.BOX, reducing_gap=2.0)
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def _color_distance(rgb, color):
+    """픽셀별 배경색과의 채널 최대 차이 (uint8 HxW)"""
+    diff = cv2.absdiff(np.ascontiguousarray(rgb), (float(color[0]), float(color[1]), float(color[2]), 0.0))
+    red, green, blue = cv2.split(diff)
+    return cv2.max(cv2.max(red, green), blue)
+
+
+def _border_connected(mask):
+    """mask(bool HxW)에서 이미지 테두리에 닿는 연결 영역(4-연결)만 True"""
+    _, labels = cv2.connectedComponents(mask.astype(np.uint8), connectivity=4)
+    border = np.concatenate([labels[0], labels[-1], labels[:, 0], labels[:, -1]])
+    keep = np.zeros(labels.max() + 1, dtype=bool)
+    keep[border] = True
+    keep[0] = False  # 0은 mask가 False인 픽셀
+    return keep[labels]
+
+
+def triage(image):
+    """PIL 이미지 → (경로, 세부 정보 dict). 경로는 TRIAGE_PATHS 중 하나"""
+    thumb = make_thumbnail(image)
+
+    if has_alpha(image):
+        alpha = np.asarray(thumb.convert('RGBA').getchannel('A'))
+        opaque = float((alpha > 16).mean())
+        if opaque < 0.005:
+            return 'empty', {'reason': 'transparent'}
+        transparent = float((alpha <= 16).mean())
+        if transparent >= ALPHA_MIN_TRANSPARENT:
+            return 'alpha', {'transparent': round(transparent, 4)}
+
+    rgb = np.asarray(thumb.convert('RGB'))
+    gray = cv2.cvtColor(np.ascontiguousarray(rgb), cv2.COLOR_RGB2GRAY)
+    low, high = np.percentile(gray, (1, 99))
+    if high - low <= EMPTY_MAX_RANGE:
+        return 'empty', {'reason': 'uniform'}
+
+    # 테두리 2px 링으로 배경색 추정 → 테두리가 균일하면 색 거리로 배경/피사체 분리 가능성 확인
+    border = np.concatenate([rgb[:2].reshape(-1, 3), rgb[-2:].reshape(-1, 3),
+                             rgb[:, :2].reshape(-1, 3), rgb[:, -2:].reshape(-1, 3)])
+    background = tuple(int(v) for v in np.median(border, axis=0))
+    spread = float(np.percentile(np.abs(border.astype(np.int16) - background).max(axis=1), 95))
+    if spread <= KEY_MAX_BORDER_SPREAD:
+        distance = _color_distance(rgb, background)
+        ambiguous = float(((distance > KEY_LOW) & (distance < KEY_HIGH)).mean())
+        subject = float((distance >= KEY_HIGH).mean())
+        info = {'background': background, 'ambiguous': round(ambiguous, 4), 'subject': round(subject, 4)}
+        if ambiguous <= KEY_MAX_AMBIGUOUS and 0.002 <= subject <= 0.95:
+            return 'key', info
+        return 'model', info
+    return 'model', {'border_spread': round(spread, 1)}
+
+
+def fast_path_mask(image, rgb, path, info):
+    """트리아지 경로별 마스크 (uint8 HxW, 모델 없이). image는 rgb와 같은 크기의 PIL 이미지"""
+    h, w = rgb.shape[:2]
+    if path == 'empty':
+        return np.zeros((h, w), dtype=np.uint8)
+    if path == 'alpha':
+        return np.asarray(image.convert('RGBA').getchannel('A'))
+    if path == 'key':
+        # 배경색과의 거리를 KEY_LOW~KEY_HIGH 램프로 알파에 매핑 (LUT 한 번)
+        ramp = (np.arange(256, dtype=np.float32) - KEY_LOW) * 255.0 / (KEY_HIGH - KEY_LOW)
+        lut = np.clip(ramp, 0, 255).astype(np.uint8)
+        distance = _color_distance(rgb, info['background'])
+        alpha = cv2.LUT(distance, lut)
+        # 테두리와 이어진 배경색 영역만 키로 뺌 (흰 배경 위 제품 안의 흰 라벨처럼 둘러싸인 부분은 피사체)
+        alpha[~_border_connected(distance < KEY_HIGH)] = 255
+        return alpha
+    raise ValueError(f'No fast path for triage result: {path}')
+
+
+class TriageStats:
+    """트리아지 경로별 건수/적중률 (스레드 안전)"""
+
+    def __init__(self):
+        self.counts = dict.fromkeys(TRIAGE_PATHS, 0)
+        self._lock = threading.Lock()
+
+    def record(self, path):
+        with self._lock:
+            self.counts[path] += 1
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        return {
+            'total': total,
+            'counts': counts,
+            'hit_rates': {path: round(count / total, 4) if total else 0.0 for path, count in counts.items()},
+        }
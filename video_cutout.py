@@ -0,0 +1,250 @@
+"""짧은 상품 영상(MP4) → 배경이 투명한 애니메이션 WebP
+
+FFmpeg 디코더(stdout, PPM 프레임) → 마스크 단계 → FFmpeg 인코더(stdin, RGBA rawvideo)를 파이프로 연결해
+프레임 파일 없이 스트리밍한다. 세 단계는 별도 프로세스/파이프 버퍼로 겹쳐 실행된다.
+
+모델 추론은 키프레임(keyframe_interval마다)과 직전 추론 프레임 대비 변화가 큰 프레임에서만 한다.
+나머지 프레임은 직전 추론 마스크를 전역 이동량(위상 상관)만큼 옮겨 재사용한다. 이동량은 항상
+추론 프레임 기준으로 구하므로 재사용이 이어져도 오차가 누적되지 않는다.
+"""
+import subprocess
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class TemporalMasker:
+    """키프레임/변화가 큰 프레임만 추론하고 나머지는 이전 마스크를 이동해 재사용
+
+    infer(rgb)는 프레임과 같은 크기의 알파(uint8 HxW)를 반환한다.
+    diff_threshold는 이동 보정 후 피사체 주변 썸네일 평균 밝기 차이(0~255) 한도, max_shift는 프레임 폭 대비 이동 한도.
+    """
+
+    def __init__(self, infer, keyframe_interval=12, diff_threshold=4.0, thumb_width=128, max_shift=0.15):
+        self.infer = infer
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.diff_threshold = float(diff_threshold)
+        self.thumb_width = thumb_width
+        self.max_shift = max_shift
+        self.inferred = 0
+        self.reused = 0
+        self._key_thumb = None
+        self._key_mask = None
+        self._key_box = None
+        self._since_key = 0
+        self._window = None
+
+    def _thumb(self, rgb):
+        """회색조 썸네일(float32)과 축소 비율"""
+        h, w = rgb.shape[:2]
+        scale = min(1.0, self.thumb_width / w)
+        gray = cv2.cvtColor(np.ascontiguousarray(rgb), cv2.COLOR_RGB2GRAY)
+        if scale < 1:
+            gray = cv2.resize(gray, (max(1, round(w * scale)), max(1, round(h * scale))),
+                              interpolation=cv2.INTER_AREA)
+        return gray.astype(np.float32), scale
+
+    def _subject_box(self, alpha, thumb_shape, pad=0.15):
+        """키 마스크의 피사체 영역을 썸네일 좌표로 (y0, y1, x0, x1). 피사체가 없으면 전체"""
+        h, w = thumb_shape
+        small = cv2.resize(alpha, (w, h), interpolation=cv2.INTER_AREA)
+        ys, xs = np.nonzero(small > 127)
+        if len(xs) == 0:
+            return 0, h, 0, w
+        py, px = max(2, round((ys.max() - ys.min()) * pad)), max(2, round((xs.max() - xs.min()) * pad))
+        return max(0, ys.min() - py), min(h, ys.max() + py + 1), max(0, xs.min() - px), min(w, xs.max() + px + 1)
+
+    def _align(self, thumb):
+        """추론 프레임 대비 (dx, dy, 정렬 후 피사체 영역 평균 차이). 이동 없음/위상 상관 중 차이가 작은 쪽
+
+        차이와 이동량은 피사체 주변(키 마스크 박스)에서만 계산한다. 배경 전체 평균을 쓰면
+        정지한 배경에 묻혀 피사체가 움직여도 차이가 작게 나온다.
+        """
+        y0, y1, x0, x1 = self._key_box
+        region = (slice(y0, y1), slice(x0, x1))
+        key = self._key_thumb[region]
+        current = thumb[region]
+        best = (0.0, 0.0, float(cv2.absdiff(key, current).mean()))
+        if min(key.shape) < 8:
+            return best
+        if self._window is None or self._window.shape != key.shape:
+            self._window = cv2.createHanningWindow(key.shape[::-1], cv2.CV_32F)
+        # phaseCorrelate는 창 함수를 입력 배열에 제자리로 곱하므로 복사본을 넘김
+        (dx, dy), _ = cv2.phaseCorrelate(key.copy(), current.copy(), self._window)
+        if 0 < max(abs(dx), abs(dy)) <= self.max_shift * thumb.shape[1]:
+            matrix = np.float32([[1, 0, dx], [0, 1, dy]])
+            aligned = cv2.warpAffine(self._key_thumb, matrix, thumb.shape[::-1], borderMode=cv2.BORDER_REPLICATE)
+            diff = float(cv2.absdiff(aligned[region], current).mean())
+            if diff < best[2]:
+                best = (dx, dy, diff)
+        return best
+
+    def mask(self, rgb):
+        """프레임 → (알파 uint8 HxW, 추론 여부). 반환한 알파는 호출자 소유 (제자리 수정해도 키 마스크에 영향 없음)"""
+        thumb, scale = self._thumb(rgb)
+        if self._key_mask is not None and self._since_key < self.keyframe_interval \
+                and self._key_mask.shape == rgb.shape[:2]:
+            dx, dy, diff = self._align(thumb)
+            if diff <= self.diff_threshold:
+                self._since_key += 1
+                self.reused += 1
+                if dx == 0 and dy == 0:
+                    return self._key_mask.copy(), False
+                h, w = self._key_mask.shape
+                matrix = np.float32([[1, 0, dx / scale], [0, 1, dy / scale]])
+                return cv2.warpAffine(self._key_mask, matrix, (w, h), flags=cv2.INTER_LINEAR,
+                                      borderMode=cv2.BORDER_REPLICATE), False
+
+        alpha = self.infer(rgb)
+        self._key_thumb = thumb
+        self._key_mask = alpha.copy()
+        self._key_box = self._subject_box(alpha, thumb.shape)
+        self._since_key = 1
+        self.inferred += 1
+        return alpha, True
+
+    def stats(self):
+        frames = self.inferred + self.reused
+        return {
+            'frames': frames,
+            'inferred': self.inferred,
+            'reused': self.reused,
+            'inference_ratio': round(self.inferred / frames, 4) if frames else 0.0,
+        }
+
+
+def read_ppm_frames(stream):
+    """FFmpeg image2pipe PPM(P6) 스트림 → RGB 프레임(uint8 HxWx3) 제너레이터"""
+    while True:
+        magic = stream.readline()
+        if not magic:
+            return
+        if magic.strip() != b'P6':
+            raise ValueError(f'Unexpected frame header: {magic[:16]!r}')
+        width, height = (int(v) for v in stream.readline().split())
+        if int(stream.readline()) != 255:
+            raise ValueError('Only 8-bit PPM frames are supported')
+        size = width * height * 3
+        data = stream.read(size)
+        if len(data) < size:
+            raise ValueError('Truncated frame in decoder output')
+        yield np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+
+
+def decoder_command(ffmpeg_path, input_path, width, fps, max_frames):
+    """입력 영상 → fps/폭으로 맞춘 PPM 프레임 스트림 (stdout)"""
+    return [ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-i', input_path, '-an',
+            '-vf', f'fps={fps},scale={width}:-2:flags=lanczos', '-frames:v', str(max_frames),
+            '-f', 'image2pipe', '-c:v', 'ppm', 'pipe:1']
+
+
+def encoder_command(ffmpeg_path, width, height, fps, output_path, quality=75):
+    """RGBA rawvideo (stdin) → 무한 반복 애니메이션 WebP (알파 유지)"""
+    return [ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-y',
+            '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}', '-r', str(fps), '-i', 'pipe:0',
+            '-c:v', 'libwebp_anim', '-pix_fmt', 'yuva420p', '-lossless', '0', '-quality', str(quality),
+            '-loop', '0', output_path]
+
+
+def _drain_stderr(proc, tail):
+    """stderr 파이프가 가득 차서 멈추지 않도록 계속 읽고 마지막 부분만 보관"""
+    for line in iter(proc.stderr.readline, b''):
+        tail.append(line)
+
+
+def _stderr_text(tail):
+    return b''.join(tail).decode('utf-8', 'replace').strip()
+
+
+def cutout_video(input_path, output_path, masker, ffmpeg_path='ffmpeg', width=480, fps=12, max_frames=600,
+                 quality=75, timeout=600):
+    """영상 → 투명 배경 애니메이션 WebP (output_path). 프레임 수/추론 수/단계 시간 dict 반환"""
+    width = max(2, int(width) // 2 * 2)  # yuva420p는 짝수 크기만 가능
+    decoder = subprocess.Popen(decoder_command(ffmpeg_path, input_path, width, fps, max_frames),
+                               stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    decoder_tail = deque(maxlen=50)
+    threading.Thread(target=_drain_stderr, args=(decoder, decoder_tail), daemon=True).start()
+    encoder = None
+    encoder_tail = deque(maxlen=50)
+    processes = [decoder]
+    timed_out = threading.Event()
+
+    def failure(stage, proc, tail):
+        if timed_out.is_set():
+            return RuntimeError(f'Video cutout timed out after {timeout}s')
+        return RuntimeError(f"FFmpeg {stage} error: {_stderr_text(tail) or proc.returncode}")
+
+    def kill_all():
+        for proc in processes:
+            if proc.poll() is None:
+                proc.kill()
+
+    # 디코더/인코더가 멈추면 파이프 읽기/쓰기가 풀리도록 시간 초과 시 프로세스를 종료
+    watchdog = threading.Timer(timeout, lambda: (timed_out.set(), kill_all()))
+    watchdog.daemon = True
+    watchdog.start()
+    start = time.perf_counter()
+    mask_seconds = 0.0
+    size = None
+    try:
+        try:
+            for rgb in read_ppm_frames(decoder.stdout):
+                if encoder is None:
+                    size = (rgb.shape[1], rgb.shape[0])
+                    encoder = subprocess.Popen(encoder_command(ffmpeg_path, *size, fps, output_path, quality),
+                                               stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                    processes.append(encoder)
+                    threading.Thread(target=_drain_stderr, args=(encoder, encoder_tail), daemon=True).start()
+                mask_start = time.perf_counter()
+                alpha, _ = masker.mask(rgb)
+                mask_seconds += time.perf_counter() - mask_start
+                try:
+                    encoder.stdin.write(np.dstack((rgb, alpha)))
+                except BrokenPipeError:
+                    # 인코더가 먼저 종료됨 (디코더는 finally에서 정리)
+                    encoder.wait()
+                    raise failure('encode', encoder, encoder_tail)
+        except ValueError:
+            # 디코더가 도중에 종료되면 프레임이 잘림 → 디코더 오류(또는 시간 초과)로 보고
+            # (마스크 단계의 ValueError면 디코더는 아직 실행 중 → 그대로 전파, 디코더는 finally에서 정리)
+            try:
+                decoder_failed = decoder.wait(timeout=5) != 0
+            except subprocess.TimeoutExpired:
+                decoder_failed = False
+            if decoder_failed:
+                raise failure('decode', decoder, decoder_tail) from None
+            raise
+
+        if decoder.wait() != 0:
+            raise failure('decode', decoder, decoder_tail)
+        if encoder is None:
+            raise ValueError('No video frames decoded')
+        try:
+            encoder.stdin.close()
+        except BrokenPipeError:
+            pass
+        if encoder.wait() != 0:
+            raise failure('encode', encoder, encoder_tail)
+    finally:
+        watchdog.cancel()
+        kill_all()
+        for proc in processes:
+            proc.wait()
+            for stream in (proc.stdin, proc.stdout):
+                if stream is not None:
+                    try:
+                        stream.close()
+                    except BrokenPipeError:
+                        pass
+
+    return {
+        **masker.stats(),
+        'width': size[0],
+        'height': size[1],
+        'fps': fps,
+        'mask_seconds': round(mask_seconds, 3),
+        'total_seconds': round(time.perf_counter() - start, 3),
+    }
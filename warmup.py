@@ -0,0 +1,93 @@
+"""시작 시 1회 수행하는 기능 확인 / 모델 워밍업
+
+헬스 체크가 매번 ffmpeg 프로세스를 띄우거나, 첫 사용자 요청이 모델 로딩 비용을 치르지 않도록
+결과를 캐시해 두고 상태만 보고한다.
+"""
+import subprocess
+import threading
+import time
+import traceback
+
+
+def probe_ffmpeg(ffmpeg_path, timeout=10):
+    """FFmpeg 버전/사용 가능한 인코더 확인 (프로세스 시작 시 1회)"""
+    info = {'available': False, 'version': None, 'encoders': [], 'error': None, 'probed_at': time.time()}
+    try:
+        result = subprocess.run([ffmpeg_path, '-hide_banner', '-version'],
+                                capture_output=True, text=True, timeout=timeout)
+        if result.returncode != 0:
+            info['error'] = result.stderr.strip() or f'exit code {result.returncode}'
+            return info
+        info['available'] = True
+        info['version'] = result.stdout.splitlines()[0] if result.stdout else None
+
+        result = subprocess.run([ffmpeg_path, '-hide_banner', '-encoders'],
+                                capture_output=True, text=True, timeout=timeout)
+        # 형식: " V....D libwebp_anim         libwebp WebP image (codec webp)"
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if len(parts) >= 2 and len(parts[0]) == 6 and parts[0][0] in 'VAS' and parts[1] != '=':
+                info['encoders'].append(parts[1])
+    except Exception as e:
+        info['error'] = str(e)
+    return info
+
+
+class ModelWarmup:
+    """모델 세션(또는 세션 풀 전체) 로딩 + 세션별 더미 추론 1회 (중복 호출해도 1번만 실행)"""
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.ready = False
+        self.error = None
+        self.load_seconds = None
+        self.warm_seconds = None
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """세션 로딩 후 더미 입력으로 추론해 메모리 할당/그래프 최적화를 미리 끝냄"""
+        # FFmpeg 백엔드는 probe_ffmpeg만 쓰므로 추론 관련 import는 여기서
+        import numpy as np
+        from bg_pipeline import U2NET_INPUT_SIZE, predict_mask
+
+        with self._lock:
+            if self.ready:
+                return True
+            try:
+                start = time.perf_counter()
+                sessions = self.loader()
+                self.load_seconds = round(time.perf_counter() - start, 3)
+
+                # loader는 세션 하나, 세션 목록(세션 풀) 또는 None(워커 프로세스가 각자 워밍업)을 반환
+                if sessions is None:
+                    sessions = []
+                elif not isinstance(sessions, (list, tuple)):
+                    sessions = [sessions]
+                start = time.perf_counter()
+                dummy = np.full(U2NET_INPUT_SIZE[::-1] + (3,), 128, dtype=np.uint8)
+                for session in sessions:
+                    predict_mask(dummy, session)
+                self.warm_seconds = round(time.perf_counter() - start, 3)
+
+                self.ready = True
+                self.error = None
+                print(f"모델 워밍업 완료 (로딩 {self.load_seconds}s, 추론 {self.warm_seconds}s)")
+            except Exception as e:
+                self.error = str(e)
+                print(f"모델 워밍업 실패: {str(e)}")
+                print(traceback.format_exc())
+            return self.ready
+
+    def warm_in_background(self):
+        """워밍업을 백그라운드 스레드로 실행 (서버는 바로 뜨고 헬스 체크는 준비 전까지 starting)"""
+        thread = threading.Thread(target=self.warm, name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def state(self):
+        return {
+            'ready': self.ready,
+            'error': self.error,
+            'load_seconds': self.load_seconds,
+            'warm_seconds': self.warm_seconds,
+        }